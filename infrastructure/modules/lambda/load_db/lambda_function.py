@@ -3,12 +3,19 @@
 ####################################################################
 
 import os
+import boto3
 import psycopg2
-import awswrangler as wr
-from sqlalchemy import create_engine
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from pyarrow import fs
+from sqlalchemy import create_engine, text
 import urllib.parse
 import json
 
+# Packaged next to this file from src/pipelines/tasks/pg_copy.py (see ../main.tf)
+from pg_copy import create_staging_table, insert_staged_rows
+
 
 ####################################################################
 #                     CUSTOM EXCEPTION CLASSES                     #
@@ -22,6 +29,10 @@ class DatabaseWriteError(Exception):
     """Exception raised when there's an error writing to the database."""
     pass
 
+class ViewRefreshError(Exception):
+    """Exception raised when the rows are loaded but the materialized views are not refreshed."""
+    pass
+
 
 ####################################################################
 #                          GLOBAL VARIABLES                        #
@@ -41,6 +52,61 @@ CONN_STR = f'postgresql://{DB_USERNAME}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NA
 DB_SCHEMA = 'public'
 DB_TABLE  = 'nba_stats'
 
+# S3 object metadata of the snapshots the scraper loads into the database itself
+DB_SINK_METADATA = {'db-sink': 'direct'}
+
+# Rows read from the Parquet file and copied at a time. The memory of the function is bound
+# by one batch (and the row group it comes from), not by the size of the file.
+BATCH_ROWS = int(os.environ.get('LOAD_BATCH_ROWS', 10000))
+
+
+####################################################################
+#                         HELPER FUNCTIONS                         #
+####################################################################
+
+def copy_parquet_file(parquet_file, engine):
+    """
+    Streams a Parquet file into the database table, one batch at a time, each one piped
+    into COPY through a staging table and inserted with ON CONFLICT DO NOTHING, so a
+    retry of an already loaded file skips its rows instead of failing on the primary key.
+    The rows replace the earlier snapshots of the same day (the daily file is rewritten
+    by each intraday refresh), so the table keeps one snapshot per day. The season
+    partitions are created as their rows show up. Everything runs in one transaction,
+    committed once at the end.
+
+    Args:
+        parquet_file (pq.ParquetFile): The Parquet file.
+        engine (sqlalchemy.engine.Engine): The database engine.
+
+    Returns:
+        int: The number of rows inserted.
+    """
+    seasons = set()
+    n_rows = 0
+
+    connection = engine.raw_connection()
+    try:
+        with connection.cursor() as cursor:
+            staging_table = create_staging_table(cursor, DB_SCHEMA, DB_TABLE)
+
+            for batch in parquet_file.iter_batches(batch_size=BATCH_ROWS):
+                # Create the season partitions (the schema is managed by the `db_ingestion` flow)
+                for season in set(pc.unique(batch.column('season')).to_pylist()) - seasons:
+                    cursor.execute(f"SELECT {DB_SCHEMA}.{DB_TABLE}_ensure_partition(%s)", (str(season),))
+                    seasons.add(season)
+
+                n_rows += insert_staged_rows(
+                    cursor, pa.Table.from_batches([batch]), DB_SCHEMA, DB_TABLE, staging_table, replace_day=True
+                )
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        connection.close()
+
+    return n_rows
+
 
 ####################################################################
 #                            MAIN FUNCTION                         #
@@ -62,28 +128,44 @@ def lambda_handler(event, context):
     
     # Get S3 key from event
     s3_key = urllib.parse.unquote_plus(event['Records'][0]['s3']['object']['key'], encoding='utf-8')
+
+    # Skip the snapshots already loaded by the scraper
+    metadata = boto3.client('s3').head_object(Bucket='nba-mvp-pipeline', Key=s3_key)['Metadata']
+    if DB_SINK_METADATA.items() <= metadata.items():
+        print(f"{s3_key} is loaded into the database by the scraper, skipping it.")
+        return
     
     try:
-        # Read Parquet file from S3
-        df = wr.s3.read_parquet(path=f's3://nba-mvp-pipeline/{s3_key}')
+        # Open the Parquet file from S3, only its footer is read
+        s3, path = fs.FileSystem.from_uri(f's3://nba-mvp-pipeline/{s3_key}')
+        parquet_file = pq.ParquetFile(s3.open_input_file(path))
     except Exception as e:
         raise S3ReadError(f"Error reading from S3: {e}")
     else:
         print("Read from S3 successfully!")
-        print(df.head())
+        print(f"{parquet_file.metadata.num_rows} rows in {parquet_file.num_row_groups} row groups.")
 
     print("Writing to database...")
-    
+
+    engine = create_engine(CONN_STR)
+
     try:
-        # Write to PostgreSQL database
-        df.to_sql(
-            name=DB_TABLE,
-            schema=DB_SCHEMA,
-            con=create_engine(CONN_STR),
-            if_exists='append',
-            index=False
-        )
+        # Stream the file to PostgreSQL database
+        n_rows = copy_parquet_file(parquet_file, engine)
+    except OSError as e:
+        # Arrow I/O errors while streaming the batches
+        raise S3ReadError(f"Error reading from S3: {e}")
     except Exception as e:
         raise DatabaseWriteError(f"Error writing to database: {e}")
     else:
-        print("Wrote to database successfully!")
\ No newline at end of file
+        print(f"Wrote {n_rows} rows to database successfully!")
+
+    try:
+        # Refresh the latest snapshot and leaderboard materialized views. The rows are
+        # committed at this point: a retry skips them and only refreshes the views.
+        with engine.begin() as conn:
+            conn.execute(text(f"SELECT {DB_SCHEMA}.{DB_TABLE}_refresh_views()"))
+    except Exception as e:
+        raise ViewRefreshError(f"Rows loaded, but error refreshing the materialized views: {e}")
+    else:
+        print("Refreshed the materialized views successfully!")
@@ -17,7 +17,7 @@ resource "aws_lambda_function" "load_db" {
   handler       = "lambda_function.lambda_handler"
   runtime       = "python3.9"
   timeout       = 300
-  memory_size   = 500
+  memory_size   = 256 # The file is streamed in batches, memory does not grow with its size
 
   # Set environment variables for the Lambda function
   environment {
@@ -27,6 +27,9 @@ resource "aws_lambda_function" "load_db" {
       DB_NAME     = var.db_database
       DB_USERNAME = var.db_username
       DB_PASSWORD = var.db_password
+
+      # Rows streamed from the Parquet file into COPY at a time
+      LOAD_BATCH_ROWS = "10000"
     }
   }
 
@@ -161,8 +164,18 @@ resource "aws_lambda_layer_version_permission" "sqlalchemy" {
 
 data "archive_file" "load_db" {
   type        = "zip"
-  source_file  = "${path.module}/load_db/lambda_function.py"
   output_path = "${path.module}/load_db_function.zip"
+
+  source {
+    content  = file("${path.module}/load_db/lambda_function.py")
+    filename = "lambda_function.py"
+  }
+
+  # COPY helpers shared with the pipelines (src/pipelines/tasks/pg_copy.py)
+  source {
+    content  = file("${path.module}/../../../src/pipelines/tasks/pg_copy.py")
+    filename = "pg_copy.py"
+  }
 }
 
 data "archive_file" "psycopg2" {
@@ -0,0 +1,414 @@
+import argparse
+import hashlib
+import json
+import os
+import pickle
+import platform
+import shutil
+import numpy as np
+import pandas as pd
+import lightgbm
+import sklearn
+from datetime import datetime
+from scipy.spatial.distance import cdist
+from sklearn.svm import SVR
+from inference import MODELS, NODE_ARRAYS, PATH_MODELS, CompiledEnsemble, load_models, verify
+
+PATH_BUNDLE = os.path.join(PATH_MODELS, "bundle")
+FORMAT_VERSION = 1
+
+#############################################
+# Array-backed models
+
+class KernelSVR:
+    """An SVR rebuilt from its support vectors, dual coefficients and kernel parameters."""
+
+    def __init__(self, support_vectors, dual_coef, intercept, kernel, gamma, coef0, degree):
+        self.support_vectors = support_vectors
+        self.dual_coef = dual_coef
+        self.intercept = intercept
+        self.kernel = kernel
+        self.gamma = gamma
+        self.coef0 = coef0
+        self.degree = degree
+
+    def predict(self, X):
+        X = np.asarray(X, dtype=np.float64)
+
+        if self.kernel == "rbf":
+            K = np.exp(-self.gamma * cdist(X, self.support_vectors, "sqeuclidean"))
+        elif self.kernel == "linear":
+            K = X @ self.support_vectors.T
+        elif self.kernel == "poly":
+            K = (self.gamma * (X @ self.support_vectors.T) + self.coef0) ** self.degree
+        else:
+            K = np.tanh(self.gamma * (X @ self.support_vectors.T) + self.coef0)
+
+        return K @ self.dual_coef + self.intercept
+
+
+class Bundle:
+    """A validated artifact bundle: features, scaler parameters and the compiled models."""
+
+    def __init__(self, path, manifest, mean, scale, ensemble):
+        self.path = path
+        self.manifest = manifest
+        self.version = manifest["version"]
+        self.features = manifest["features"]
+        self.mean = mean
+        self.scale = scale
+        self.ensemble = ensemble
+
+    def transform(self, X):
+        """
+        Scales a feature matrix like the StandardScaler of the training run.
+
+        Args:
+            X (pd.DataFrame or np.ndarray): Features, in the order of `features` if an array.
+
+        Returns:
+            np.ndarray: The scaled features.
+
+        Raises:
+            ValueError: If features are missing or the number of columns does not match.
+        """
+        if isinstance(X, pd.DataFrame):
+            missing = [feature for feature in self.features if feature not in X.columns]
+            if missing:
+                raise ValueError(f"Features missing from the data of bundle {self.version}: {missing}")
+            X = X[self.features]
+
+        X = np.asarray(X, dtype=np.float64)
+        if X.shape[1] != len(self.features):
+            raise ValueError(f"Expected {len(self.features)} features, got {X.shape[1]}.")
+
+        return (X - self.mean) / self.scale
+
+    def predict(self, X):
+        """
+        Predicts with every model of the bundle.
+
+        Args:
+            X (np.ndarray): Scaled feature matrix.
+
+        Returns:
+            dict: The predictions of each model, by name.
+        """
+        return self.ensemble.predict(X)
+
+#############################################
+# Writing
+
+def _slug(name):
+    return name.lower().replace(" ", "_")
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def library_versions():
+    """
+    Versions of the libraries the models were trained with.
+
+    Returns:
+        dict: Library versions, by name.
+    """
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "scikit-learn": sklearn.__version__,
+        "lightgbm": lightgbm.__version__,
+    }
+
+
+def write_bundle(path, features, scaler, models, version=None):
+    """
+    Writes an artifact bundle: a `manifest.json` and one `.npy` file per array. Tree
+    ensembles are stored as one flat forest (see inference.CompiledEnsemble), the SVR as
+    its support vectors and dual coefficients, and the scaler as its mean and scale.
+    No pickles are involved, so loading never runs stored code.
+
+    Args:
+        path (str): Directory of the bundle. Replaced if it exists.
+        features (List[str]): Feature columns.
+        scaler (StandardScaler): The fitted scaler.
+        models (dict): Fitted models by name.
+        version (str, optional): Version of the bundle (defaults to a timestamp).
+
+    Returns:
+        str: The directory of the bundle.
+
+    Raises:
+        TypeError: If a model is neither a supported tree ensemble nor an SVR.
+    """
+    ensemble = CompiledEnsemble.from_models(models)
+    arrays = {"scaler_mean": scaler.mean_, "scaler_scale": scaler.scale_, "forest_roots": ensemble.roots}
+    arrays.update({f"forest_{key}": ensemble.nodes[key] for key in NODE_ARRAYS})
+
+    manifest_models = {}
+    for name, aggregation in ensemble.aggregations.items():
+        entry = {
+            "kind": "trees",
+            "how": aggregation["how"],
+            "scale": aggregation["scale"],
+            "offset": aggregation["offset"],
+            "trees": [aggregation["trees"].start, aggregation["trees"].stop],
+            "weights": None,
+        }
+        if aggregation["weights"] is not None:
+            entry["weights"] = f"{_slug(name)}_weights"
+            arrays[entry["weights"]] = aggregation["weights"]
+        manifest_models[name] = entry
+
+    for name, model in ensemble.fallback.items():
+        if not isinstance(model, SVR):
+            raise TypeError(f"Unsupported model {type(model).__name__}.")
+        manifest_models[name] = {
+            "kind": "svr",
+            "kernel": model.kernel,
+            "gamma": float(model._gamma),
+            "coef0": float(model.coef0),
+            "degree": int(model.degree),
+            "intercept": float(model.intercept_[0]),
+            "support_vectors": f"{_slug(name)}_support_vectors",
+            "dual_coef": f"{_slug(name)}_dual_coef",
+        }
+        arrays[f"{_slug(name)}_support_vectors"] = model.support_vectors_
+        arrays[f"{_slug(name)}_dual_coef"] = model.dual_coef_[0]
+
+    # Written to a temporary directory, so readers never see a partial bundle
+    tmp_path = path.rstrip(os.sep) + ".tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    manifest_arrays = {}
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        filename = f"{name}.npy"
+        np.save(os.path.join(tmp_path, filename), array)
+        manifest_arrays[name] = {
+            "file": filename,
+            "dtype": array.dtype.str,
+            "shape": list(array.shape),
+            "sha256": _sha256(os.path.join(tmp_path, filename)),
+        }
+
+    manifest = {
+        "format_version": FORMAT_VERSION,
+        "version": version or datetime.today().strftime("%Y_%m_%d_%H%M%S"),
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "features": list(features),
+        "libraries": library_versions(),
+        "models": manifest_models,
+        "arrays": manifest_arrays,
+    }
+    with open(os.path.join(tmp_path, "manifest.json"), "w") as file:
+        json.dump(manifest, file, indent=2)
+
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp_path, path)
+
+    print(f"Bundle {manifest['version']} written to {path}.")
+    return path
+
+#############################################
+# Loading
+
+def _validate(manifest, arrays, required_models):
+    # Every problem of the bundle, checked at once
+    errors = []
+    n_features = len(manifest["features"])
+
+    referenced = ["scaler_mean", "scaler_scale", "forest_roots"] + [f"forest_{key}" for key in NODE_ARRAYS]
+    referenced += [
+        model[key] for model in manifest["models"].values()
+        for key in ["weights", "support_vectors", "dual_coef"] if model.get(key)
+    ]
+    missing_arrays = sorted(set(name for name in referenced if name not in arrays))
+    if missing_arrays:
+        return [f"Arrays missing from the manifest: {missing_arrays}"]
+
+    for name in ["scaler_mean", "scaler_scale"]:
+        if arrays[name].shape != (n_features,):
+            errors.append(f"{name} has shape {arrays[name].shape}, expected ({n_features},).")
+
+    n_nodes = len(arrays["forest_feature"])
+    n_trees = len(arrays["forest_roots"])
+    for key in NODE_ARRAYS:
+        if len(arrays[f"forest_{key}"]) != n_nodes:
+            errors.append(f"forest_{key} has {len(arrays[f'forest_{key}'])} nodes, expected {n_nodes}.")
+
+    if n_nodes:
+        # Splits read the float32-rounded and the float64 copies of the features
+        if arrays["forest_feature"].min() < 0 or arrays["forest_feature"].max() >= 2 * n_features:
+            errors.append("forest_feature references features outside the feature list.")
+        for key in ["left", "right"]:
+            if arrays[f"forest_{key}"].min() < 0 or arrays[f"forest_{key}"].max() >= n_nodes:
+                errors.append(f"forest_{key} references nodes outside the forest.")
+    if n_trees and (arrays["forest_roots"].min() < 0 or arrays["forest_roots"].max() >= n_nodes):
+        errors.append("forest_roots references nodes outside the forest.")
+
+    for name, model in manifest["models"].items():
+        if model["kind"] == "trees":
+            start, stop = model["trees"]
+            if not 0 <= start < stop <= n_trees:
+                errors.append(f"{name}: trees [{start}, {stop}) outside the forest of {n_trees} trees.")
+            if model["how"] == "median" and (model["weights"] is None or len(arrays[model["weights"]]) != stop - start):
+                errors.append(f"{name}: expected one weight per tree.")
+        elif model["kind"] == "svr":
+            support_vectors = arrays[model["support_vectors"]]
+            if support_vectors.ndim != 2 or support_vectors.shape[1] != n_features:
+                errors.append(f"{name}: support vectors of shape {support_vectors.shape}, expected (n, {n_features}).")
+            elif len(arrays[model["dual_coef"]]) != len(support_vectors):
+                errors.append(f"{name}: expected one dual coefficient per support vector.")
+            if model["kernel"] not in ["rbf", "linear", "poly", "sigmoid"]:
+                errors.append(f"{name}: unsupported kernel '{model['kernel']}'.")
+        else:
+            errors.append(f"{name}: unknown model kind '{model['kind']}'.")
+
+    missing = [name for name in required_models if name not in manifest["models"]]
+    if missing:
+        errors.append(f"Missing models: {missing}")
+
+    return errors
+
+
+def load_bundle(path=PATH_BUNDLE, models=MODELS, verify_hashes=True):
+    """
+    Loads and validates an artifact bundle. Arrays are opened as read-only memory maps.
+    Files are checked against the hashes, shapes and dtypes of the manifest, and the
+    arrays against each other, and every problem found is reported in one error.
+
+    Args:
+        path (str): Directory of the bundle.
+        models (List[str]): Models the bundle must contain.
+        verify_hashes (bool): Whether to check the hash of each file.
+
+    Returns:
+        Bundle: The loaded bundle.
+
+    Raises:
+        FileNotFoundError: If the bundle has no manifest.
+        ValueError: If the bundle is invalid.
+    """
+    with open(os.path.join(path, "manifest.json")) as file:
+        manifest = json.load(file)
+
+    if manifest.get("format_version") != FORMAT_VERSION:
+        raise ValueError(f"Bundle format {manifest.get('format_version')} of {path} is not supported (expected {FORMAT_VERSION}).")
+
+    errors, arrays = [], {}
+    for name, entry in manifest["arrays"].items():
+        file_path = os.path.join(path, entry["file"])
+        if not os.path.exists(file_path):
+            errors.append(f"{entry['file']} is missing.")
+            continue
+        if verify_hashes and _sha256(file_path) != entry["sha256"]:
+            errors.append(f"{entry['file']} does not match its hash.")
+            continue
+
+        array = np.load(file_path, mmap_mode="r", allow_pickle=False)
+        if array.dtype.str != entry["dtype"] or list(array.shape) != entry["shape"]:
+            errors.append(f"{entry['file']} is {array.dtype.str} {list(array.shape)}, expected {entry['dtype']} {entry['shape']}.")
+            continue
+        arrays[name] = array
+
+    if not errors:
+        errors = _validate(manifest, arrays, models)
+
+    if errors:
+        raise ValueError(f"Invalid bundle {path}:\n" + "\n".join(f"  - {error}" for error in errors))
+
+    nodes = {key: arrays[f"forest_{key}"] for key in NODE_ARRAYS}
+    aggregations, fallback = {}, {}
+    for name, model in manifest["models"].items():
+        if model["kind"] == "trees":
+            aggregations[name] = {
+                "how": model["how"],
+                "scale": model["scale"],
+                "offset": model["offset"],
+                "weights": arrays[model["weights"]] if model["weights"] else None,
+                "trees": slice(*model["trees"]),
+            }
+        else:
+            fallback[name] = KernelSVR(
+                support_vectors=arrays[model["support_vectors"]],
+                dual_coef=arrays[model["dual_coef"]],
+                intercept=model["intercept"],
+                kernel=model["kernel"],
+                gamma=model["gamma"],
+                coef0=model["coef0"],
+                degree=model["degree"],
+            )
+
+    ensemble = CompiledEnsemble(nodes, arrays["forest_roots"], aggregations, fallback)
+
+    return Bundle(path, manifest, arrays["scaler_mean"], arrays["scaler_scale"], ensemble)
+
+#############################################
+
+def convert_pickles(pickles_path=PATH_MODELS, bundle_path=PATH_BUNDLE, n_rows=1000, seed=42):
+    """
+    Converts the pickled features, scaler and models into a bundle and checks the
+    bundle's predictions against the pickled models.
+
+    Args:
+        pickles_path (str): Directory of the pickles.
+        bundle_path (str): Directory of the bundle.
+        n_rows (int): Number of random scaled rows to check the predictions on.
+        seed (int): Seed of the random rows.
+
+    Returns:
+        str: The directory of the bundle.
+    """
+    with open(os.path.join(pickles_path, "features.dat"), "rb") as file:
+        features = pickle.load(file)
+    with open(os.path.join(pickles_path, "standard_scaler.dat"), "rb") as file:
+        scaler = pickle.load(file)
+    models = load_models(pickles_path)
+
+    write_bundle(bundle_path, features, scaler, models)
+
+    X = np.random.default_rng(seed).standard_normal((n_rows, len(features)))
+    verify(load_bundle(bundle_path), models, X)
+
+    return bundle_path
+
+
+def ensure_bundle(bundle_path=PATH_BUNDLE, pickles_path=PATH_MODELS):
+    """
+    Converts the pickled models into a bundle if there is none yet, e.g., the first run
+    after upgrading from the pickled artifacts. Existing bundles are left as they are.
+
+    Args:
+        bundle_path (str): Directory of the bundle.
+        pickles_path (str): Directory of the pickles.
+
+    Returns:
+        str: The directory of the bundle.
+
+    Raises:
+        FileNotFoundError: If there is neither a bundle nor the pickles to convert.
+    """
+    if os.path.exists(os.path.join(bundle_path, "manifest.json")):
+        return bundle_path
+
+    if not os.path.exists(os.path.join(pickles_path, "features.dat")):
+        raise FileNotFoundError(f"No bundle in {bundle_path} and no pickled models in {pickles_path} to convert.")
+
+    print(f"No bundle in {bundle_path}, converting the pickled models of {pickles_path}...")
+    return convert_pickles(pickles_path, bundle_path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert pickled models into an artifact bundle.")
+    parser.add_argument("--pickles", default=PATH_MODELS, help="Directory of the pickled models.")
+    parser.add_argument("--out", default=PATH_BUNDLE, help="Directory of the bundle.")
+    args = parser.parse_args()
+
+    convert_pickles(args.pickles, args.out)
@@ -0,0 +1,160 @@
+import argparse
+import glob
+import os
+import time
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from artifacts import PATH_BUNDLE, ensure_bundle, load_bundle
+from features import filter_candidates, join_daily_league_features, project_season
+from get_scores import PATH_DATA, modelos
+from score_cache import PATH_SCORE_CACHE, predict_incremental
+
+PATH_RANK_HISTORY = os.path.join("machine_learning", "predictions", "rank_history")
+
+SNAPSHOT_FORMAT = '%d_%m_%y'
+
+#############################################
+
+def list_snapshots(start, end, data_path=os.path.dirname(PATH_DATA)):
+    """
+    Lists the daily snapshot files (`{dd_mm_yy}.parquet`) between two dates.
+
+    Args:
+        start (str): First date, in the format "YYYY-MM-DD".
+        end (str): Last date, in the format "YYYY-MM-DD".
+        data_path (str): Directory of the snapshots.
+
+    Returns:
+        pd.Series: The file of each snapshot, indexed by snapshot date.
+    """
+    files = pd.Series(glob.glob(os.path.join(data_path, '*.parquet')), dtype="string")
+    dates = pd.to_datetime(files.str.extract(r'(\d{2}_\d{2}_\d{2})\.parquet$')[0], format=SNAPSHOT_FORMAT, errors='coerce')
+
+    snapshots = pd.Series(files.values, index=dates).dropna()
+    snapshots = snapshots[(snapshots.index >= pd.Timestamp(start)) & (snapshots.index <= pd.Timestamp(end))]
+
+    return snapshots.sort_index()
+
+
+def read_snapshots(snapshots):
+    """
+    Reads the snapshots and stacks them, each file with its date attached. Columns are
+    unified across the files: a column added to the snapshots later is null in the
+    earlier ones, and a column whose type changed is upcast.
+
+    Args:
+        snapshots (pd.Series): The file of each snapshot, indexed by snapshot date.
+
+    Returns:
+        pd.DataFrame: The stacked snapshots, with a 'SNAPSHOT_DATE' column.
+    """
+    return pd.concat(
+        [
+            pq.read_table(path).to_pandas().assign(SNAPSHOT_DATE=date)
+            for date, path in zip(snapshots.index.strftime('%Y-%m-%d'), snapshots.values)
+        ],
+        ignore_index=True,
+    )
+
+
+def score_snapshots(df, bundle, cache_path=PATH_SCORE_CACHE):
+    """
+    Scores the candidates of every snapshot in one stacked pass per model, and ranks
+    them per snapshot by the mean predicted share of the models. The league features of
+    the bundle, if any, are those of each snapshot date.
+
+    Args:
+        df (pd.DataFrame): The stacked snapshots.
+        bundle (Bundle): The artifact bundle.
+        cache_path (str): Directory of the prediction cache.
+
+    Returns:
+        pd.DataFrame: One row per candidate and snapshot, with the share and rank of each
+            model and the consensus 'MVP SHARE' and 'MVP RANK'.
+    """
+    df = project_season(filter_candidates(df))
+    df = join_daily_league_features(df, bundle.features, df['SNAPSHOT_DATE'])
+
+    # Players who did not play between two snapshots are only scored once
+    predictions = predict_incremental(df, bundle, cache_path)
+
+    results = df[['SNAPSHOT_DATE', 'PLAYER']].copy()
+    for modelo in modelos:
+        results['PREDICTED MVP SHARE '+modelo] = predictions[modelo]
+        results['MVP RANK '+modelo] = (
+            results.groupby('SNAPSHOT_DATE')['PREDICTED MVP SHARE '+modelo]
+            .rank(method='first', ascending=False).astype(int)
+        )
+
+    results['MVP SHARE'] = np.mean([predictions[modelo] for modelo in modelos], axis=0)
+    results['MVP RANK'] = results.groupby('SNAPSHOT_DATE')['MVP SHARE'].rank(method='first', ascending=False).astype(int)
+    results['BUNDLE VERSION'] = bundle.version
+
+    return results.sort_values(['SNAPSHOT_DATE', 'MVP RANK']).reset_index(drop=True)
+
+
+def write_rank_history(results, path=PATH_RANK_HISTORY):
+    """
+    Writes the ranks to the rank-history dataset, partitioned by snapshot date. The
+    partitions of the scored snapshots are replaced, the others are kept.
+
+    Args:
+        results (pd.DataFrame): The output of score_snapshots.
+        path (str): Directory of the dataset.
+
+    Returns:
+        None
+    """
+    ds.write_dataset(
+        pa.Table.from_pandas(results, preserve_index=False),
+        path,
+        format="parquet",
+        partitioning=ds.partitioning(pa.schema([("SNAPSHOT_DATE", pa.string())]), flavor="hive"),
+        existing_data_behavior="delete_matching",
+        basename_template="part-{i}.parquet",
+    )
+
+
+def batch_scores(start, end, data_path=os.path.dirname(PATH_DATA), bundle_path=PATH_BUNDLE, output_path=PATH_RANK_HISTORY):
+    """
+    Rescores every daily snapshot between two dates and writes the rank history.
+
+    Args:
+        start (str): First date, in the format "YYYY-MM-DD".
+        end (str): Last date, in the format "YYYY-MM-DD".
+        data_path (str): Directory of the snapshots.
+        bundle_path (str): Directory of the artifact bundle.
+        output_path (str): Directory of the rank-history dataset.
+
+    Returns:
+        pd.DataFrame: The ranks of every snapshot.
+    """
+    snapshots = list_snapshots(start, end, data_path)
+    if snapshots.empty:
+        print(f"No snapshots between {start} and {end}.")
+        return pd.DataFrame()
+
+    bundle = load_bundle(ensure_bundle(bundle_path), models=modelos)
+
+    results = score_snapshots(read_snapshots(snapshots), bundle)
+    write_rank_history(results, output_path)
+
+    print(f"{len(snapshots)} snapshots scored, {len(results)} ranks written to {output_path}.")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rescore the daily snapshots of a date range.")
+    parser.add_argument("start", help='First date, in the format "YYYY-MM-DD".')
+    parser.add_argument("end", help='Last date, in the format "YYYY-MM-DD".')
+    parser.add_argument("--data", default=os.path.dirname(PATH_DATA), help="Directory of the snapshots.")
+    parser.add_argument("--bundle", default=PATH_BUNDLE)
+    parser.add_argument("--out", default=PATH_RANK_HISTORY, help="Directory of the rank-history dataset.")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    batch_scores(args.start, args.end, data_path=args.data, bundle_path=args.bundle, output_path=args.out)
+    print(f"Done in {time.perf_counter() - start:.1f} s")
@@ -0,0 +1,223 @@
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from typing import NamedTuple
+from numpy.lib.format import open_memmap
+from sklearn.preprocessing import StandardScaler
+from features import MODEL_FEATURES
+
+PATH_MATRICES = os.path.join("machine_learning", "matrices")
+
+TARGET = "Share"
+# In the scoring schema (see features.to_scoring_schema)
+ID_COLUMNS = ["PLAYER", "player_id", "TEAM", "POS", "season", "snapshot_date"]
+INDEX_COLUMNS = ["season", "PLAYER"]
+
+# Part of the version: matrices of an older layout (e.g., the scaled float32 X) are not reused
+MATRIX_FORMAT = 2
+
+# Width of the fixed-width unicode index
+INDEX_DTYPE = "<U64"
+
+
+class FeatureMatrix(NamedTuple):
+    """A feature matrix opened from the store. Arrays are read-only memory maps, X is unscaled."""
+    path: str
+    schema: dict
+    X: np.ndarray
+    y: np.ndarray
+    index: np.ndarray
+
+#############################################
+
+def select_features(df, features=MODEL_FEATURES):
+    """
+    Feature columns of a dataset: the listed features it has, without nulls. Missing
+    features and features with nulls (whose mean and scale would be NaN) are left out
+    and reported.
+
+    Args:
+        df (pd.DataFrame): The processed dataset, in the scoring schema.
+        features (List[str]): Candidate feature columns (defaults to features.MODEL_FEATURES).
+
+    Returns:
+        List[str]: The feature columns.
+
+    Raises:
+        ValueError: If none of the features can be used.
+    """
+    missing = [feature for feature in features if feature not in df.columns]
+    with_nulls = [feature for feature in features if feature in df.columns and df[feature].isna().any()]
+
+    if missing:
+        print(f"Features missing from the dataset, left out: {missing}")
+    if with_nulls:
+        print(f"Features with nulls, left out: {with_nulls}")
+
+    selected = [feature for feature in features if feature not in missing + with_nulls]
+    if not selected:
+        raise ValueError("None of the features can be used.")
+
+    return selected
+
+
+def feature_set_version(features, df):
+    """
+    Version of a feature matrix: a hash of the feature list and of the rows it is built from.
+
+    Args:
+        features (List[str]): Feature columns.
+        df (pd.DataFrame): The processed dataset.
+
+    Returns:
+        str: The version.
+    """
+    digest = hashlib.sha256(json.dumps({"format": MATRIX_FORMAT, "features": features}).encode("utf-8"))
+    digest.update(pd.util.hash_pandas_object(df[INDEX_COLUMNS + features + [TARGET]], index=False).values.tobytes())
+    return digest.hexdigest()[:16]
+
+
+def scaler_from_schema(schema):
+    """
+    Rebuilds the StandardScaler whose parameters are stored in a schema.
+
+    Args:
+        schema (dict): The schema of a feature matrix.
+
+    Returns:
+        StandardScaler: The fitted scaler.
+    """
+    scaler = StandardScaler()
+    scaler.mean_ = np.asarray(schema["scaler"]["mean"], dtype=np.float64)
+    scaler.scale_ = np.asarray(schema["scaler"]["scale"], dtype=np.float64)
+    scaler.var_ = scaler.scale_ ** 2
+    scaler.n_features_in_ = len(schema["features"])
+    scaler.feature_names_in_ = np.asarray(schema["features"], dtype=object)
+    scaler.n_samples_seen_ = schema["n_rows"]
+    return scaler
+
+
+def write_feature_matrix(df, features=None, root=PATH_MATRICES):
+    """
+    Writes the unscaled float64 feature matrix, the labels and the (season, player) index
+    of a dataset as `.npy` arrays, with a `schema.json` sidecar, to `{root}/{version}/`.
+    Columns are written one at a time straight into the memory-mapped file, so no copy of
+    the whole frame is held in memory. The mean and scale of each column are stored in the
+    schema (see scaler_from_schema): the models scale the features themselves, inside each
+    fold when training. A version already in the store is reused.
+
+    Args:
+        df (pd.DataFrame): The processed dataset.
+        features (List[str], optional): Feature columns (see select_features).
+        root (str): Root directory of the store.
+
+    Returns:
+        str: The version of the feature matrix.
+    """
+    features = features or select_features(df)
+    df = df.sort_values(INDEX_COLUMNS).reset_index(drop=True)
+    version = feature_set_version(features, df)
+
+    path = os.path.join(root, version)
+    if os.path.exists(os.path.join(path, "schema.json")):
+        print(f"Feature matrix {version} already in the store.")
+        _set_latest(root, version)
+        return version
+
+    # Written to a temporary directory, so readers never see a partial matrix
+    tmp_path = path + ".tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    n_rows, n_features = len(df), len(features)
+    mean = np.empty(n_features, dtype=np.float64)
+    scale = np.empty(n_features, dtype=np.float64)
+
+    X = open_memmap(os.path.join(tmp_path, "X.npy"), mode="w+", dtype=np.float64, shape=(n_rows, n_features))
+    for j, feature in enumerate(features):
+        column = df[feature].to_numpy(dtype=np.float64)
+        mean[j] = column.mean()
+        # Same convention as StandardScaler: constant columns are left unscaled
+        scale[j] = column.std() or 1.0
+        X[:, j] = column
+    X.flush()
+    del X
+
+    np.save(os.path.join(tmp_path, "y.npy"), df[TARGET].to_numpy(dtype=np.float32))
+    np.save(os.path.join(tmp_path, "index.npy"), df[INDEX_COLUMNS].astype(str).to_numpy(dtype=INDEX_DTYPE))
+
+    schema = {
+        "version": version,
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "features": features,
+        "target": TARGET,
+        "index": INDEX_COLUMNS,
+        "n_rows": n_rows,
+        "n_features": n_features,
+        "dtype": "float64",
+        "scaled": False,
+        "scaler": {"mean": mean.tolist(), "scale": scale.tolist()},
+    }
+    with open(os.path.join(tmp_path, "schema.json"), "w") as file:
+        json.dump(schema, file, indent=2)
+
+    os.replace(tmp_path, path)
+    _set_latest(root, version)
+
+    print(f"Feature matrix {version} written: {n_rows} rows, {n_features} features.")
+    return version
+
+
+def _set_latest(root, version):
+    with open(os.path.join(root, "LATEST"), "w") as file:
+        file.write(version)
+
+
+def open_feature_matrix(version=None, root=PATH_MATRICES):
+    """
+    Opens a feature matrix of the store as read-only memory maps. Nothing is read until
+    the arrays are used, and processes opening the same matrix share the OS page cache.
+
+    Args:
+        version (str, optional): The version to open (defaults to the last one written).
+        root (str): Root directory of the store.
+
+    Returns:
+        FeatureMatrix: The schema and the X, y and index arrays.
+
+    Raises:
+        FileNotFoundError: If the version is not in the store.
+    """
+    if version is None:
+        with open(os.path.join(root, "LATEST")) as file:
+            version = file.read().strip()
+
+    path = os.path.join(root, version)
+    with open(os.path.join(path, "schema.json")) as file:
+        schema = json.load(file)
+
+    return FeatureMatrix(
+        path=path,
+        schema=schema,
+        X=np.load(os.path.join(path, "X.npy"), mmap_mode="r"),
+        y=np.load(os.path.join(path, "y.npy"), mmap_mode="r"),
+        index=np.load(os.path.join(path, "index.npy"), mmap_mode="r"),
+    )
+
+
+if __name__ == "__main__":
+    from features import to_scoring_schema
+    from train import PROCESSED_DATA_PATH, load_training_data
+
+    parser = argparse.ArgumentParser(description="Write the processed dataset to the feature matrix store.")
+    parser.add_argument("--data", default=PROCESSED_DATA_PATH, help="S3 or local path of the processed dataset.")
+    parser.add_argument("--root", default=PATH_MATRICES, help="Root directory of the store.")
+    args = parser.parse_args()
+
+    df = to_scoring_schema(load_training_data(args.data))
+    write_feature_matrix(df, root=args.root)
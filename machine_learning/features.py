@@ -0,0 +1,185 @@
+import os
+import sys
+import pandas as pd
+import pyarrow.parquet as pq
+import awswrangler as wr
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "pipelines"))
+from tasks.feature_store import DAY_FORMAT, FEATURE_STORE_PATH, daily_features_path, league_feature_columns
+from tasks.scoring_schema import to_scoring_schema
+from tasks.stints import consolidate_player_stints
+
+SEASON_GAMES = 82
+
+# Advanced stats that accumulate over the season, projected like the totals
+ADVANCED_TO_PROJECT = ['OWS_ADVANCED','DWS_ADVANCED','WS_ADVANCED','VORP_ADVANCED']
+
+INT_COLUMNS = ['AGE','G','GS','EXPERIENCE','COLLEGE','NATIONALITY_US','SEED']
+
+# Columns added to the snapshots by project_season
+PROJECTION_COLUMNS = ['G_LEFT','MULT_G']
+
+# Features the models are trained on, in the scoring schema: columns of the daily
+# snapshots scored by get_scores and of the processed seasons (see to_scoring_schema)
+MODEL_FEATURES = [
+    'AGE','G','GS','MP_PERGAME','PTS_PERGAME','TRB_PERGAME','AST_PERGAME','STL_PERGAME',
+    'BLK_PERGAME','TOV_PERGAME','FGA_PERGAME','FG%','3P%','FT%','eFG%',
+    'PER_ADVANCED','TS%_ADVANCED','USG%_ADVANCED','OWS_ADVANCED','DWS_ADVANCED','WS_ADVANCED',
+    'WS/48_ADVANCED','OBPM_ADVANCED','DBPM_ADVANCED','BPM_ADVANCED','VORP_ADVANCED',
+    'PTS_TOTAL','TRB_TOTAL','AST_TOTAL','PCT','SEED',
+]
+
+#############################################
+
+def total_columns(df):
+    """
+    Columns of season totals (e.g., PTS_TOTAL).
+
+    Args:
+        df (pd.DataFrame): A snapshot of the season stats.
+
+    Returns:
+        List[str]: The total columns.
+    """
+    return [x for x in df.columns if x.endswith('_TOTAL')]
+
+
+def filter_candidates(df):
+    """
+    Keeps the players with MVP-caliber stats, the only ones the models are applied to.
+
+    Args:
+        df (pd.DataFrame): A snapshot of the season stats.
+
+    Returns:
+        pd.DataFrame: The candidates.
+    """
+    df = df.copy()
+
+    # fix types
+    df["PER_ADVANCED"] = df["PER_ADVANCED"].apply(pd.to_numeric)
+
+    return df[((df['PTS_PERGAME']>13.5)&(df['MP_PERGAME']>30)
+              &(df['SEED']<=16)&(df['AST_PERGAME']>1)&(df['TRB_PERGAME']>3)
+              &(df['FG%']>0.37)&(df['FGA_PERGAME']>10)
+              &(df['PER_ADVANCED']>18))].reset_index(drop=True)
+
+
+def project_season(df):
+    """
+    Projects the totals and accumulated advanced stats of each player to the end of
+    the season, scaling them by the games left for the team.
+
+    Args:
+        df (pd.DataFrame): The candidates.
+
+    Returns:
+        pd.DataFrame: The candidates with projected stats, 'G_LEFT' and 'MULT_G'.
+    """
+    df = df.copy()
+
+    # Projeção de vars. totais
+    df['G_LEFT'] = SEASON_GAMES - df['G_TEAM']
+    df['MULT_G'] = df['G_LEFT']/df['G']+1
+
+    cols_total = total_columns(df)
+    for col in cols_total:
+        df[col] = round(df[col] * df['MULT_G'],0)
+
+    # Alterando tipos p/int (os snapshots do pipeline não têm as colunas biográficas)
+    int_cols = cols_total + [col for col in INT_COLUMNS if col in df.columns]
+    df[int_cols] = (df[int_cols]).astype(int)
+
+    # Projeção de vars. avançadas
+    for col in ADVANCED_TO_PROJECT:
+        df[col] = round(df[col] * df['MULT_G'],1)
+
+    return df
+
+
+def read_parquet(path, columns=None):
+    """
+    Reads a parquet file or dataset from S3 or a local path.
+
+    Args:
+        path (str): S3 path or local path.
+        columns (List[str], optional): Columns to read (defaults to all).
+
+    Returns:
+        pd.DataFrame: The data.
+    """
+    if path.startswith("s3://"):
+        return wr.s3.read_parquet(path, columns=columns)
+    return pd.read_parquet(path, columns=columns)
+
+
+def read_pipeline_snapshot(path):
+    """
+    Reads a daily snapshot of the StatsScraper flow (`data/raw/players/{day}.parquet`) in
+    the scoring schema, with traded players on their TOT row.
+
+    Args:
+        path (str): S3 path or local path of the snapshot.
+
+    Returns:
+        pd.DataFrame: One row per player, in the scoring schema.
+    """
+    return to_scoring_schema(consolidate_player_stints(read_parquet(path)))
+
+
+def join_daily_league_features(df, features, days, path=FEATURE_STORE_PATH):
+    """
+    Adds the league features a bundle was trained with (e.g., PTS_PERGAME_pctl) to the
+    snapshots it scores, from the daily league features precomputed by the StatsScraper
+    flow over the whole league (see tasks.feature_store). Nothing is read if the bundle
+    has no league features.
+
+    Args:
+        df (pd.DataFrame): Snapshot rows, in the scoring schema.
+        features (List[str]): The features of the bundle.
+        days (datetime, str or pd.Series): The snapshot date of the rows, one for all
+            of them or one per row.
+        path (str): The root of the feature set.
+
+    Returns:
+        pd.DataFrame: The rows with the league features, in the same order.
+
+    Raises:
+        ValueError: If players have no league features on their snapshot date.
+    """
+    league_columns = [feature for feature in features if feature in league_feature_columns()]
+    if not league_columns:
+        return df
+
+    days = pd.Series(pd.to_datetime(days), index=df.index).dt.strftime(DAY_FORMAT)
+
+    league = pd.concat(
+        [
+            read_parquet(daily_features_path(day, path), columns=['PLAYER'] + league_columns).assign(DAY=day)
+            for day in days.unique()
+        ],
+        ignore_index=True,
+    )
+
+    df = df.drop(columns=league_columns, errors='ignore').assign(DAY=days)
+    df = df.merge(league, on=['DAY', 'PLAYER'], how='left', validate='many_to_one', indicator=True)
+
+    missing = df.loc[df['_merge'] == 'left_only', ['DAY', 'PLAYER']]
+    if len(missing):
+        raise ValueError(f"No league features for {len(missing)} players (e.g., {missing.head().values.tolist()}).")
+
+    print(f"Joined {len(league_columns)} league features of {days.nunique()} days.")
+    return df.drop(columns=['DAY', '_merge'])
+
+
+def scoring_columns(snapshot_path):
+    """
+    Columns available to the models when a snapshot is scored (see get_scores).
+
+    Args:
+        snapshot_path (str): A daily snapshot.
+
+    Returns:
+        List[str]: The columns of the snapshot and the columns added by project_season.
+    """
+    return pq.read_schema(snapshot_path).names + PROJECTION_COLUMNS
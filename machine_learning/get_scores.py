@@ -1,8 +1,15 @@
+import argparse
 import pandas as pd
-import pickle
 import os
+import sys
 from datetime import datetime
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "pipelines"))
+from tasks.profiling import profile_run
+from artifacts import ensure_bundle, load_bundle
+from features import filter_candidates, join_daily_league_features, project_season, read_pipeline_snapshot
+from score_cache import predict_incremental
+
 PATH_PICKLE = os.path.join("machine_learning", "models", "{}")
 PATH_DATA   = os.path.join("data", "{}")
 
@@ -23,70 +30,48 @@ def create_rank(results, n_rank):
 
 #############################################
 
-def get_scores():
+def get_scores(snapshot=None):
 
-    # Abrindo base
+    # Abrindo base: snapshot do dia ou, se informado, um snapshot do pipeline (p.ex., do StatsRefresh)
     today = datetime.today().strftime('%d_%m_%y')
 
-    df = pd.read_parquet(
-        PATH_DATA.format(
-            f'{today}.parquet'
-        ),
-    )
-
-    # fix types
-    df["PER_ADVANCED"] = df["PER_ADVANCED"].apply(pd.to_numeric)
-
-    # Filtrando jogadores
-    df = df[((df['PTS_PERGAME']>13.5)&(df['MP_PERGAME']>30)
-            &(df['SEED']<=16)&(df['AST_PERGAME']>1)&(df['TRB_PERGAME']>3)
-            &(df['FG%']>0.37)&(df['FGA_PERGAME']>10)
-            &(df['PER_ADVANCED']>18))].reset_index(drop=True)
+    if snapshot is None:
+        df = pd.read_parquet(
+            PATH_DATA.format(
+                f'{today}.parquet'
+            ),
+        )
+    else:
+        df = read_pipeline_snapshot(snapshot)
 
-    # Projeção de vars. totais
-    df['G_LEFT'] = 82 - df['G_TEAM']
-    df['MULT_G'] = df['G_LEFT']/df['G']+1
+    # Filtrando jogadores e projetando o fim da temporada
+    df = filter_candidates(df)
+    df = project_season(df)
 
-    cols_total = [x for x in df.columns if x.endswith('_TOTAL')]
-    for col in cols_total:
-        df[col] = round(df[col] * df['MULT_G'],0)
-
-    # Alterando tipos p/int
-    int_cols = [x for x in df.columns if x.endswith('_TOTAL')]
-    int_cols.extend(['AGE','G','GS','EXPERIENCE','COLLEGE','NATIONALITY_US','SEED'])
-    df[int_cols] = (df[int_cols]).astype(int)
-
-    # Projeção de vars. avançadas
-    vars_to_proj = ['OWS_ADVANCED','DWS_ADVANCED','WS_ADVANCED','VORP_ADVANCED']
-    for col in vars_to_proj:
-        df[col] = round(df[col] * df['MULT_G'],1)
-        
-    features = pickle.load(open(PATH_PICKLE.format("features.dat"),'rb'))
-    X = df[features]
+    # Bundle de artefatos validado (features, scaler e modelos), convertido dos pickles se ainda não existe
+    bundle = load_bundle(ensure_bundle(PATH_PICKLE.format("bundle")), models=modelos)
 
-    scaler = pickle.load(open(PATH_PICKLE.format('standard_scaler.dat'),'rb'))
-    scaled_X = scaler.transform(X)
+    # Features relativas à liga do dia, se o bundle foi treinado com elas
+    days = df['snapshot_date'] if 'snapshot_date' in df.columns else datetime.today()
+    df = join_daily_league_features(df, bundle.features, days)
 
     initial_results = df[['PLAYER']]
     results = initial_results.copy()
 
-    # Prevendo MVP Share p/cada modelo
+    # Prevendo MVP Share p/todos os modelos numa chamada, só p/jogadores cujas features mudaram
+    predictions = predict_incremental(df, bundle)
+
     for modelo in modelos:
-        try:
-            model = pickle.load(open(PATH_PICKLE.format(f"{modelo}.dat"),'rb'))
-                
-            y_pred = model.predict(scaled_X)
+        y_pred = predictions[modelo]
 
-            apoio = initial_results.copy()
-            apoio['PREDICTED MVP SHARE '+modelo] = pd.Series(y_pred).values
+        apoio = initial_results.copy()
+        apoio['PREDICTED MVP SHARE '+modelo] = pd.Series(y_pred).values
 
-            results_sorted = apoio.sort_values(by='PREDICTED MVP SHARE '+modelo,
-                                                ascending=False).reset_index(drop=True)
-            results_sorted['MVP RANK '+modelo] = results_sorted.index+1
+        results_sorted = apoio.sort_values(by='PREDICTED MVP SHARE '+modelo,
+                                            ascending=False).reset_index(drop=True)
+        results_sorted['MVP RANK '+modelo] = results_sorted.index+1
 
-            results = results.merge(results_sorted, on=['PLAYER'])
-        except:
-            continue
+        results = results.merge(results_sorted, on=['PLAYER'])
 
 
     rank = create_rank(results, 10)
@@ -169,11 +154,14 @@ def get_final_rank(rank, df):
     rank = rank.rename(columns={'MVP RANK FINAL':'PLAYER'})
     rank2 = rank[['Predicted MVP Rank','PLAYER']].merge(df,on='PLAYER',how='left',validate='1:1')
 
-    rank2 = rank2[['Predicted MVP Rank',"PLAYER",'POS',"TEAM","AGE","HEIGHT",'G','MP_PERGAME','PTS_PERGAME','TRB_PERGAME',
-                   'AST_PERGAME','STL_PERGAME','BLK_PERGAME','FG%','3P%','FT%','PER_ADVANCED','WS/48_ADVANCED','VORP_ADVANCED',
-                   'PCT','SEED']]
+    # Snapshots do pipeline não têm as colunas biográficas (p.ex., HEIGHT)
+    columns = ['Predicted MVP Rank',"PLAYER",'POS',"TEAM","AGE","HEIGHT",'G','MP_PERGAME','PTS_PERGAME','TRB_PERGAME',
+               'AST_PERGAME','STL_PERGAME','BLK_PERGAME','FG%','3P%','FT%','PER_ADVANCED','WS/48_ADVANCED','VORP_ADVANCED',
+               'PCT','SEED']
+    rank2 = rank2[[column for column in columns if column in rank2.columns]]
     
-    rank2['HEIGHT'] = round(rank2['HEIGHT'],1)
+    if 'HEIGHT' in rank2.columns:
+        rank2['HEIGHT'] = round(rank2['HEIGHT'],1)
     rank2['PCT'] = round(rank2['PCT'],3)
     rank2['WS/48_ADVANCED'] = round(rank2['WS/48_ADVANCED'],3)
     rank2[['FG%','3P%','FT%']] = round(rank2[['FG%','3P%','FT%']]*100,2)
@@ -232,5 +220,12 @@ def get_final_rank(rank, df):
 #         plt.savefig(path_data+sep+model+'_SHAP.png', format='png', dpi=700, bbox_inches='tight')
 
 
-rank = get_scores()
-print(rank)
\ No newline at end of file
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Score the MVP candidates of a snapshot.")
+    parser.add_argument("--snapshot", help="S3 or local path of a daily snapshot of the pipeline (defaults to today's snapshot in data/).")
+    parser.add_argument("--profile", action="store_true", help="Profile the run (see tasks.profiling).")
+    args = parser.parse_args()
+
+    with profile_run("get_scores", output_dir=os.path.join("machine_learning", "predictions")):
+        rank = get_scores(snapshot=args.snapshot)
+    print(rank)
@@ -0,0 +1,365 @@
+import argparse
+import os
+import pickle
+import time
+import numpy as np
+from numba import njit, prange
+from lightgbm import LGBMRegressor
+from sklearn.ensemble import AdaBoostRegressor, GradientBoostingRegressor, RandomForestRegressor
+
+PATH_MODELS = os.path.join("machine_learning", "models")
+MODELS = ['SVM', 'Random Forest', 'AdaBoost', 'Gradient Boosting', 'LGBM']
+
+# Rows traversed at once, bounds the (rows x trees) leaf value arrays
+BATCH_SIZE = int(os.environ.get("NBA_INFERENCE_BATCH_SIZE", 2048))
+
+# LightGBM missing value handling of a split
+MISSING_NONE, MISSING_ZERO, MISSING_NAN = 0, 1, 2
+LGBM_MISSING_TYPES = {"None": MISSING_NONE, "Zero": MISSING_ZERO, "NaN": MISSING_NAN}
+LGBM_ZERO_THRESHOLD = 1e-35
+
+# Arrays of the flat forest, one entry per node. Leaves point to themselves.
+NODE_ARRAYS = ["feature", "threshold", "left", "right", "value", "default_left", "missing_type"]
+
+#############################################
+# Flattening
+
+def _sklearn_tree_nodes(estimator):
+    # sklearn compares float32 inputs against float64 thresholds, leaves have children -1
+    tree = estimator.tree_
+    left = tree.children_left.astype(np.int64)
+    right = tree.children_right.astype(np.int64)
+    is_leaf = left == -1
+    nodes = np.arange(tree.node_count)
+
+    return {
+        "feature": np.where(is_leaf, 0, tree.feature).astype(np.int64),
+        "threshold": tree.threshold.astype(np.float64),
+        "left": np.where(is_leaf, nodes, left),
+        "right": np.where(is_leaf, nodes, right),
+        "value": tree.value[:, 0, 0].astype(np.float64),
+        "default_left": np.zeros(tree.node_count, dtype=bool),
+        "missing_type": np.full(tree.node_count, MISSING_NONE, dtype=np.int8),
+        "float32": True,
+    }
+
+
+def _lgbm_tree_nodes(tree_info):
+    # Nodes of a LightGBM dump, numbered in depth-first order
+    columns = {key: [] for key in NODE_ARRAYS}
+    stack = [(tree_info["tree_structure"], None, None)]
+
+    while stack:
+        node, parent, side = stack.pop()
+        index = len(columns["feature"])
+
+        if parent is not None:
+            columns[side][parent] = index
+
+        if "leaf_value" in node:
+            columns["feature"].append(0)
+            columns["threshold"].append(0.0)
+            columns["left"].append(index)
+            columns["right"].append(index)
+            columns["value"].append(node["leaf_value"])
+            columns["default_left"].append(False)
+            columns["missing_type"].append(MISSING_NONE)
+            continue
+
+        if node["decision_type"] != "<=":
+            raise ValueError(f"Unsupported LightGBM split '{node['decision_type']}' (categorical features).")
+
+        columns["feature"].append(node["split_feature"])
+        columns["threshold"].append(node["threshold"])
+        columns["left"].append(-1)
+        columns["right"].append(-1)
+        columns["value"].append(0.0)
+        columns["default_left"].append(node["default_left"])
+        columns["missing_type"].append(LGBM_MISSING_TYPES[node["missing_type"]])
+
+        stack.append((node["right_child"], index, "right"))
+        stack.append((node["left_child"], index, "left"))
+
+    return {
+        "feature": np.asarray(columns["feature"], dtype=np.int64),
+        "threshold": np.asarray(columns["threshold"], dtype=np.float64),
+        "left": np.asarray(columns["left"], dtype=np.int64),
+        "right": np.asarray(columns["right"], dtype=np.int64),
+        "value": np.asarray(columns["value"], dtype=np.float64),
+        "default_left": np.asarray(columns["default_left"], dtype=bool),
+        "missing_type": np.asarray(columns["missing_type"], dtype=np.int8),
+        "float32": False,
+    }
+
+
+def flatten_model(model):
+    """
+    Flattens a tree ensemble into its trees' node arrays and how their outputs combine.
+
+    Args:
+        model: A fitted RandomForestRegressor, GradientBoostingRegressor, AdaBoostRegressor
+            or LGBMRegressor.
+
+    Returns:
+        tuple: The node arrays of each tree and the aggregation ("mean", "sum", "median"),
+            its scale, offset and tree weights.
+
+    Raises:
+        TypeError: If the model is not a supported tree ensemble.
+    """
+    if isinstance(model, RandomForestRegressor):
+        trees = [_sklearn_tree_nodes(estimator) for estimator in model.estimators_]
+        return trees, {"how": "mean", "scale": 1.0, "offset": 0.0, "weights": None}
+
+    if isinstance(model, GradientBoostingRegressor):
+        trees = [_sklearn_tree_nodes(estimator) for estimator in model.estimators_[:, 0]]
+        if model.init_ == "zero":
+            offset = 0.0
+        else:
+            offset = float(model.init_.predict(np.zeros((1, model.n_features_in_)))[0])
+        return trees, {"how": "sum", "scale": model.learning_rate, "offset": offset, "weights": None}
+
+    if isinstance(model, AdaBoostRegressor):
+        trees = [_sklearn_tree_nodes(estimator) for estimator in model.estimators_]
+        weights = np.asarray(model.estimator_weights_[:len(trees)], dtype=np.float64)
+        return trees, {"how": "median", "scale": 1.0, "offset": 0.0, "weights": weights}
+
+    if isinstance(model, LGBMRegressor):
+        dump = model.booster_.dump_model()
+        # The average of the target is folded into the first tree
+        trees = [_lgbm_tree_nodes(tree_info) for tree_info in dump["tree_info"]]
+        return trees, {"how": "sum", "scale": 1.0, "offset": 0.0, "weights": None}
+
+    raise TypeError(f"Unsupported model {type(model).__name__}.")
+
+#############################################
+# Compiled ensemble
+
+@njit(parallel=True, cache=True)
+def _traverse(X_split, roots, feature, threshold, left, right, value, default_left, missing_type):
+    # Leaf value of every (row, tree). Trees in the outer loop keep one tree's nodes in
+    # cache while all rows go through it, like sklearn's predict does.
+    n_rows, n_trees = X_split.shape[0], roots.shape[0]
+    leaf_values = np.empty((n_trees, n_rows))
+
+    for t in prange(n_trees):
+        for i in range(n_rows):
+            node = roots[t]
+            while left[node] != node:
+                x = X_split[i, feature[node]]
+                node_missing_type = missing_type[node]
+
+                if node_missing_type == MISSING_NONE:
+                    go_left = x <= threshold[node]
+                elif node_missing_type == MISSING_NAN and np.isnan(x):
+                    go_left = default_left[node]
+                elif node_missing_type == MISSING_ZERO and (np.isnan(x) or abs(x) <= LGBM_ZERO_THRESHOLD):
+                    go_left = default_left[node]
+                else:
+                    go_left = x <= threshold[node]
+
+                node = left[node] if go_left else right[node]
+            leaf_values[t, i] = value[node]
+
+    return leaf_values.T
+
+
+class CompiledEnsemble:
+    """
+    The trees of several ensembles concatenated into one flat forest, traversed for all
+    trees and rows at once by a Numba-compiled kernel. Non-tree models (the SVM) keep
+    their own predict.
+    """
+
+    def __init__(self, nodes, roots, aggregations, fallback=None):
+        """
+        Args:
+            nodes (dict): The node arrays of the flat forest (see NODE_ARRAYS).
+            roots (np.ndarray): The root node of each tree.
+            aggregations (dict): How the trees of each model combine, by model name.
+            fallback (dict, optional): Models without trees, by name. Anything with a `predict`.
+        """
+        self.nodes = nodes
+        self.roots = roots
+        self.aggregations = aggregations
+        self.fallback = fallback or {}
+
+    @classmethod
+    def from_models(cls, models):
+        """
+        Compiles fitted models into a flat forest.
+
+        Args:
+            models (dict): Fitted models by name.
+
+        Returns:
+            CompiledEnsemble: The compiled ensemble.
+        """
+        fallback, aggregations = {}, {}
+        columns = {key: [] for key in NODE_ARRAYS}
+        roots, n_nodes = [], 0
+
+        for name, model in models.items():
+            try:
+                trees, aggregation = flatten_model(model)
+            except TypeError:
+                fallback[name] = model
+                continue
+
+            start = len(roots)
+
+            for tree in trees:
+                roots.append(n_nodes)
+                # sklearn splits read the float32-rounded inputs, LightGBM splits the float64 ones
+                offset = 0 if tree["float32"] else model.n_features_in_
+                columns["feature"].append(tree["feature"] + offset)
+                columns["left"].append(tree["left"] + n_nodes)
+                columns["right"].append(tree["right"] + n_nodes)
+                for key in ["threshold", "value", "default_left", "missing_type"]:
+                    columns[key].append(tree[key])
+                n_nodes += len(tree["feature"])
+
+            aggregations[name] = dict(aggregation, trees=slice(start, len(roots)))
+
+        nodes = {key: np.concatenate(values) if values else np.empty(0) for key, values in columns.items()}
+
+        return cls(nodes, np.asarray(roots, dtype=np.int64), aggregations, fallback)
+
+    def _leaf_values(self, X):
+        # Inputs of the sklearn splits, then of the LightGBM splits
+        X_split = np.hstack([X.astype(np.float32).astype(np.float64), X])
+        return _traverse(X_split, self.roots, *(self.nodes[key] for key in NODE_ARRAYS))
+
+    @staticmethod
+    def _aggregate(values, aggregation):
+        if aggregation["how"] == "mean":
+            return values.mean(axis=1)
+
+        if aggregation["how"] == "sum":
+            return aggregation["offset"] + aggregation["scale"] * values.sum(axis=1)
+
+        # Weighted median of AdaBoost.R2
+        rows = np.arange(len(values))
+        sorted_idx = np.argsort(values, axis=1)
+        weight_cdf = np.cumsum(aggregation["weights"][sorted_idx], axis=1)
+        median_idx = (weight_cdf >= 0.5 * weight_cdf[:, -1:]).argmax(axis=1)
+        return values[rows, sorted_idx[rows, median_idx]]
+
+    def predict(self, X):
+        """
+        Predicts with every model in one pass over the flat forest.
+
+        Args:
+            X (np.ndarray): Scaled feature matrix.
+
+        Returns:
+            dict: The predictions of each model, by name.
+        """
+        X = np.asarray(X, dtype=np.float64)
+        predictions = {name: np.empty(len(X)) for name in self.aggregations}
+
+        for start in range(0, len(X), BATCH_SIZE):
+            batch = slice(start, start + BATCH_SIZE)
+            values = self._leaf_values(X[batch])
+            for name, aggregation in self.aggregations.items():
+                predictions[name][batch] = self._aggregate(values[:, aggregation["trees"]], aggregation)
+
+        for name, model in self.fallback.items():
+            predictions[name] = model.predict(X)
+
+        return predictions
+
+#############################################
+
+def load_models(path=PATH_MODELS, names=MODELS):
+    """
+    Loads the pickled models.
+
+    Args:
+        path (str): Directory of the pickles.
+        names (List[str]): Models to load.
+
+    Returns:
+        dict: The models, by name.
+    """
+    models = {}
+    for name in names:
+        with open(os.path.join(path, f"{name}.dat"), "rb") as file:
+            models[name] = pickle.load(file)
+    return models
+
+
+def verify(ensemble, models, X, rtol=1e-6, atol=1e-9):
+    """
+    Checks the compiled predictions against the pickled models' predict.
+
+    Args:
+        ensemble (CompiledEnsemble): The compiled ensemble.
+        models (dict): The models it was compiled from.
+        X (np.ndarray): Scaled feature matrix.
+        rtol (float): Relative tolerance.
+        atol (float): Absolute tolerance.
+
+    Raises:
+        AssertionError: If the predictions of a model differ.
+    """
+    predictions = ensemble.predict(X)
+    for name, model in models.items():
+        np.testing.assert_allclose(predictions[name], model.predict(X), rtol=rtol, atol=atol, err_msg=name)
+        print(f"{name}: compiled predictions match.")
+
+
+def benchmark(models, X, batch_rows=None, repeat=3):
+    """
+    Compares the throughput of the pickled models and of the compiled ensemble.
+
+    Args:
+        models (dict): Fitted models by name.
+        X (np.ndarray): Scaled feature matrix.
+        batch_rows (int, optional): Score X in calls of this many rows (e.g. one simulation
+            or one snapshot at a time) instead of a single call.
+        repeat (int): Runs of each backend, the fastest is kept.
+
+    Returns:
+        dict: Rows per second of each backend.
+    """
+    ensemble = CompiledEnsemble.from_models(models)
+    verify(ensemble, models, X)
+
+    batches = [X] if batch_rows is None else [X[i:i + batch_rows] for i in range(0, len(X), batch_rows)]
+    backends = {
+        "pickle": lambda batch: [model.predict(batch) for model in models.values()],
+        "compiled": ensemble.predict,
+    }
+
+    timings = {backend: [] for backend in backends}
+    for _ in range(repeat):
+        for backend, predict in backends.items():
+            start = time.perf_counter()
+            for batch in batches:
+                predict(batch)
+            timings[backend].append(time.perf_counter() - start)
+
+    throughput = {backend: len(X) / min(seconds) for backend, seconds in timings.items()}
+    print(f"{len(batches)} call(s) of {len(batches[0])} rows:")
+    for backend, rows_per_second in throughput.items():
+        print(f"{backend:>8}: {rows_per_second:,.0f} rows/s")
+    print(f"Speedup: {throughput['compiled'] / throughput['pickle']:.1f}x")
+
+    return throughput
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check the compiled ensemble against the pickled models and benchmark it.")
+    parser.add_argument("--models", default=PATH_MODELS, help="Directory of the pickled models.")
+    parser.add_argument("--rows", type=int, default=10000, help="Number of random scaled rows to score.")
+    parser.add_argument("--batch-rows", type=int, default=50, help="Rows per call of the batched benchmark.")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    models = load_models(args.models)
+    n_features = next(iter(models.values())).n_features_in_
+
+    X = np.random.default_rng(args.seed).standard_normal((args.rows, n_features))
+    benchmark(models, X)
+    benchmark(models, X, batch_rows=args.batch_rows)
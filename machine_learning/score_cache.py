@@ -0,0 +1,141 @@
+import glob
+import os
+import numpy as np
+import pandas as pd
+
+PATH_SCORE_CACHE = os.path.join("machine_learning", "predictions", "score_cache")
+
+# Feature vectors not scored or read for this long are dropped, and the cache keeps at
+# most this many of the most recently used ones
+MAX_CACHE_AGE = pd.Timedelta(days=60)
+MAX_CACHE_ROWS = 200_000
+
+# Time each feature vector was last scored or read from the cache
+LAST_USED = "LAST_USED"
+
+#############################################
+
+def hash_features(X):
+    """
+    Hashes the feature vector of each row.
+
+    Args:
+        X (pd.DataFrame): Features.
+
+    Returns:
+        np.ndarray: One uint64 hash per row.
+    """
+    # Same values hash the same whatever the dtype of the snapshot (e.g., int vs float)
+    return pd.util.hash_pandas_object(X.astype("float64"), index=False).to_numpy()
+
+
+def read_cache(version, path=PATH_SCORE_CACHE):
+    """
+    Reads the cached predictions of a bundle version.
+
+    Args:
+        version (str): The bundle version.
+        path (str): Directory of the cache.
+
+    Returns:
+        pd.DataFrame: The predictions of each model, indexed by feature hash (empty if none).
+    """
+    file_path = os.path.join(path, f"{version}.parquet")
+    if not os.path.exists(file_path):
+        return pd.DataFrame(index=pd.Index([], dtype="uint64", name="HASH"))
+
+    cache = pd.read_parquet(file_path)
+    # Caches written before the size limit count as used now
+    if LAST_USED not in cache.columns:
+        cache[LAST_USED] = pd.Timestamp.now()
+    return cache
+
+
+def prune_cache(cache, now, max_age=MAX_CACHE_AGE, max_rows=MAX_CACHE_ROWS):
+    """
+    Drops the feature vectors not used for `max_age`, then the least recently used ones
+    beyond `max_rows`.
+
+    Args:
+        cache (pd.DataFrame): The predictions of each model and the last use, indexed by feature hash.
+        now (pd.Timestamp): The current time.
+        max_age (pd.Timedelta): Maximum time since the last use.
+        max_rows (int): Maximum number of feature vectors.
+
+    Returns:
+        pd.DataFrame: The pruned cache.
+    """
+    cache = cache[cache[LAST_USED] >= now - max_age]
+    if len(cache) > max_rows:
+        cache = cache.nlargest(max_rows, LAST_USED)
+    return cache
+
+
+def write_cache(cache, version, path=PATH_SCORE_CACHE):
+    """
+    Writes the cached predictions of a bundle version and drops the caches of other versions,
+    whose predictions are stale. The cache is pruned by predict_incremental before.
+
+    Args:
+        cache (pd.DataFrame): The predictions of each model, indexed by feature hash.
+        version (str): The bundle version.
+        path (str): Directory of the cache.
+
+    Returns:
+        None
+    """
+    os.makedirs(path, exist_ok=True)
+
+    tmp_path = os.path.join(path, f"{version}.parquet.tmp")
+    cache.to_parquet(tmp_path)
+    os.replace(tmp_path, os.path.join(path, f"{version}.parquet"))
+
+    for file_path in glob.glob(os.path.join(path, "*.parquet")):
+        if os.path.basename(file_path) != f"{version}.parquet":
+            os.remove(file_path)
+
+
+def predict_incremental(df, bundle, path=PATH_SCORE_CACHE):
+    """
+    Predicts with every model of the bundle, scaling and scoring only the feature vectors
+    that are not in the cache of the bundle version (e.g., players who played since the
+    last run). New predictions are added to the cache, and the cache is pruned of the
+    feature vectors not used recently (see prune_cache).
+
+    Args:
+        df (pd.DataFrame): Rows to score, with the bundle features.
+        bundle (Bundle): The artifact bundle.
+        path (str): Directory of the cache.
+
+    Returns:
+        dict: The predictions of each model, by name.
+    """
+    # Raises if features are missing
+    bundle.transform(df.iloc[:0])
+
+    X = df[bundle.features]
+    hashes = hash_features(X)
+
+    cache = read_cache(bundle.version, path)
+    now = pd.Timestamp.now()
+
+    is_new = ~np.isin(hashes, cache.index.to_numpy())
+
+    # Rows sharing a feature vector are scored once
+    new_hashes, first_rows = np.unique(hashes[is_new], return_index=True)
+
+    if len(new_hashes):
+        new_rows = np.flatnonzero(is_new)[first_rows]
+        predictions = bundle.predict(bundle.transform(X.iloc[new_rows]))
+
+        new_cache = pd.DataFrame(predictions, index=pd.Index(new_hashes, name="HASH"))
+        cache = pd.concat([cache, new_cache]) if len(cache) else new_cache
+
+    print(f"{len(new_hashes)} feature vectors scored, {(~is_new).sum()} of {len(df)} rows from the cache.")
+
+    cached = cache.loc[hashes]
+
+    # The vectors of this run are the most recently used, they survive the pruning
+    cache.loc[np.unique(hashes), LAST_USED] = now
+    write_cache(prune_cache(cache, now), bundle.version, path)
+    return {name: cached[name].to_numpy() for name in bundle.manifest["models"]}
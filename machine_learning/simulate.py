@@ -0,0 +1,174 @@
+import argparse
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from artifacts import PATH_BUNDLE, ensure_bundle, load_bundle
+from features import ADVANCED_TO_PROJECT, SEASON_GAMES, filter_candidates, join_daily_league_features, total_columns
+from get_scores import PATH_DATA, modelos
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "pipelines"))
+from tasks.profiling import profile_run
+
+PATH_PREDICTIONS = os.path.join("machine_learning", "predictions")
+
+N_SIMULATIONS = 10000
+
+# Simulations scored per call of the ensemble, bounds the (simulations x players x features) array
+BATCH_SIMULATIONS = 1000
+
+TOP_N = 5
+
+#############################################
+
+def sample_features(df, features, n_simulations, rng):
+    """
+    Samples the rest of the season of every candidate and returns the end-of-season
+    features of each simulation. Each player plays each remaining team game with the
+    probability of their games played so far, their totals grow by Poisson draws at their
+    per-game rates, accumulated advanced stats scale with the games played and each
+    team wins its remaining games with its current win percentage. League features keep
+    their values of the snapshot.
+
+    Args:
+        df (pd.DataFrame): The candidates, as filtered by filter_candidates (not projected),
+            with the league features of the models, if any.
+        features (List[str]): Feature columns of the models.
+        n_simulations (int): Number of simulations.
+        rng (np.random.Generator): Random generator.
+
+    Returns:
+        np.ndarray: The features, of shape (simulations, players, features).
+    """
+    n_players = len(df)
+    column = {feature: j for j, feature in enumerate(features)}
+
+    X = np.broadcast_to(
+        df[features].to_numpy(dtype=np.float64), (n_simulations, n_players, len(features))
+    ).copy()
+
+    games = df['G'].to_numpy(dtype=np.float64)
+    team_games = df['G_TEAM'].to_numpy(dtype=np.float64)
+    games_left = np.clip(SEASON_GAMES - team_games, 0, None).astype(np.int64)
+
+    # Jogos restantes de cada jogador: (S, P)
+    games_played = rng.binomial(games_left, np.clip(games / team_games, 0, 1), size=(n_simulations, n_players))
+    final_games = games + games_played
+
+    # Totais: (S, P, K)
+    cols_total = total_columns(df)
+    totals = df[cols_total].to_numpy(dtype=np.float64)
+    final_totals = totals + rng.poisson(games_played[:, :, None] * (totals / games[:, None])[None])
+
+    for k, col in enumerate(cols_total):
+        if col in column:
+            X[:, :, column[col]] = final_totals[:, :, k]
+        per_game = col.replace('_TOTAL', '_PERGAME')
+        if per_game in column:
+            X[:, :, column[per_game]] = final_totals[:, :, k] / final_games
+
+    if 'GS' in column:
+        starts = df['GS'].to_numpy(dtype=np.float64)
+        X[:, :, column['GS']] = starts + rng.binomial(games_played, np.clip(starts / games, 0, 1))
+    if 'G' in column:
+        X[:, :, column['G']] = final_games
+
+    for col in ADVANCED_TO_PROJECT:
+        if col in column:
+            X[:, :, column[col]] *= final_games / games
+
+    # Campanha dos times: vitórias restantes por time, (S, T)
+    if 'PCT' in column:
+        team_codes, _ = pd.factorize(df['TEAM'])
+        teams = df.groupby(team_codes)[['PCT', 'G_TEAM']].first()
+        team_left = np.clip(SEASON_GAMES - teams['G_TEAM'].to_numpy(), 0, None).astype(np.int64)
+        wins = rng.binomial(team_left, teams['PCT'].to_numpy(), size=(n_simulations, len(teams)))
+        final_pct = (teams['PCT'].to_numpy() * teams['G_TEAM'].to_numpy() + wins) / SEASON_GAMES
+        X[:, :, column['PCT']] = final_pct[:, team_codes]
+
+    return X
+
+
+def score_simulations(X, bundle):
+    """
+    Scores the simulations through every model in one call, and averages the models.
+
+    Args:
+        X (np.ndarray): Features, of shape (simulations, players, features).
+        bundle (Bundle): The artifact bundle.
+
+    Returns:
+        np.ndarray: The predicted MVP share, of shape (simulations, players).
+    """
+    n_simulations, n_players, n_features = X.shape
+
+    predictions = bundle.predict(bundle.transform(X.reshape(-1, n_features)))
+    shares = np.mean([predictions[modelo] for modelo in modelos], axis=0)
+
+    return shares.reshape(n_simulations, n_players)
+
+
+def simulate(df, bundle, n_simulations=N_SIMULATIONS, batch_size=BATCH_SIMULATIONS, seed=None):
+    """
+    Simulates the rest of the season and estimates the probability of each candidate
+    winning the MVP or finishing in the top 5 of the predicted MVP shares.
+
+    Args:
+        df (pd.DataFrame): The candidates, as filtered by filter_candidates (not projected).
+        bundle (Bundle): The artifact bundle.
+        n_simulations (int): Number of simulations.
+        batch_size (int): Simulations scored per call of the ensemble.
+        seed (int, optional): Seed of the random generator.
+
+    Returns:
+        pd.DataFrame: 'PLAYER', 'P(MVP)', 'P(TOP 5)' and 'MEAN SHARE', by descending P(MVP).
+    """
+    rng = np.random.default_rng(seed)
+    n_players = len(df)
+    top_n = min(TOP_N, n_players)
+
+    wins = np.zeros(n_players, dtype=np.int64)
+    top = np.zeros(n_players, dtype=np.int64)
+    share_sum = np.zeros(n_players)
+
+    for start in range(0, n_simulations, batch_size):
+        n_batch = min(batch_size, n_simulations - start)
+
+        shares = score_simulations(sample_features(df, bundle.features, n_batch, rng), bundle)
+
+        wins += np.bincount(shares.argmax(axis=1), minlength=n_players)
+        top += np.bincount(np.argsort(-shares, axis=1)[:, :top_n].ravel(), minlength=n_players)
+        share_sum += shares.sum(axis=0)
+
+    return pd.DataFrame({
+        'PLAYER': df['PLAYER'],
+        'P(MVP)': wins / n_simulations,
+        f'P(TOP {TOP_N})': top / n_simulations,
+        'MEAN SHARE': share_sum / n_simulations,
+    }).sort_values(by=['P(MVP)', 'MEAN SHARE'], ascending=False).reset_index(drop=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulate the rest of the season and estimate MVP probabilities.")
+    parser.add_argument("--date", default=datetime.today().strftime('%d_%m_%y'), help="Snapshot date, in the format dd_mm_yy.")
+    parser.add_argument("--simulations", type=int, default=N_SIMULATIONS)
+    parser.add_argument("--batch", type=int, default=BATCH_SIMULATIONS, help="Simulations scored per call of the ensemble.")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--bundle", default=PATH_BUNDLE)
+    args = parser.parse_args()
+
+    df = filter_candidates(pd.read_parquet(PATH_DATA.format(f'{args.date}.parquet')))
+    bundle = load_bundle(ensure_bundle(args.bundle), models=modelos)
+    df = join_daily_league_features(df, bundle.features, datetime.strptime(args.date, '%d_%m_%y'))
+
+    with profile_run("simulate", output_dir=PATH_PREDICTIONS):
+        start = time.perf_counter()
+        probabilities = simulate(df, bundle, n_simulations=args.simulations, batch_size=args.batch, seed=args.seed)
+        elapsed = time.perf_counter() - start
+
+    probabilities.to_csv(os.path.join(PATH_PREDICTIONS, f"simulation_{args.date}.csv"), index=False)
+
+    print(probabilities)
+    print(f"\n{args.simulations} simulations of {len(df)} players in {elapsed:.1f} s")
@@ -0,0 +1,367 @@
+import argparse
+import glob
+import json
+import os
+import pickle
+import shutil
+import sys
+import time
+import numpy as np
+import pandas as pd
+import awswrangler as wr
+from datetime import datetime
+from joblib import Parallel, delayed
+from lightgbm import LGBMRegressor
+from sklearn.base import clone
+from sklearn.ensemble import AdaBoostRegressor, GradientBoostingRegressor, RandomForestRegressor
+from sklearn.model_selection import GridSearchCV, GroupKFold
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+from sklearn.svm import SVR
+from artifacts import PATH_BUNDLE, write_bundle
+from feature_matrix import PATH_MATRICES, open_feature_matrix, scaler_from_schema, select_features, write_feature_matrix
+from features import MODEL_FEATURES, scoring_columns, to_scoring_schema
+from get_scores import PATH_DATA
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "pipelines"))
+from tasks.feature_store import FEATURE_STORE_PATH, HISTORICAL_ID_COLUMNS
+
+PATH_MODELS = os.path.join("machine_learning", "models")
+PROCESSED_DATA_PATH = "s3://nba-mvp-pipeline/data/processed/mvp/stats_mvp/"
+
+# League features precomputed by process_data, of the current feature set version
+LEAGUE_FEATURES_PATH = FEATURE_STORE_PATH + "historical/"
+
+RANDOM_STATE = 42
+N_SPLITS = 5
+
+# Model name (as loaded by get_scores) -> estimator and hyperparameter grid
+MODELS = {
+    "SVM": (
+        SVR(),
+        {"C": [0.1, 1, 10], "epsilon": [0.01, 0.05], "gamma": ["scale", 0.01]},
+    ),
+    "Random Forest": (
+        RandomForestRegressor(random_state=RANDOM_STATE),
+        {"n_estimators": [200, 500], "max_depth": [None, 10], "min_samples_leaf": [1, 3]},
+    ),
+    "AdaBoost": (
+        AdaBoostRegressor(random_state=RANDOM_STATE),
+        {"n_estimators": [100, 300], "learning_rate": [0.05, 0.1, 1.0]},
+    ),
+    "Gradient Boosting": (
+        GradientBoostingRegressor(random_state=RANDOM_STATE),
+        {"n_estimators": [200, 500], "learning_rate": [0.05, 0.1], "max_depth": [2, 3]},
+    ),
+    "LGBM": (
+        LGBMRegressor(random_state=RANDOM_STATE, verbose=-1),
+        {"n_estimators": [200, 500], "learning_rate": [0.05, 0.1], "num_leaves": [15, 31]},
+    ),
+}
+
+#############################################
+
+def load_training_data(path=PROCESSED_DATA_PATH):
+    """
+    Reads the processed stats + MVP share dataset.
+
+    Args:
+        path (str): S3 path or local path of the processed dataset.
+
+    Returns:
+        pd.DataFrame: One row per player, team and season.
+    """
+    if path.startswith("s3://"):
+        df = wr.s3.read_parquet(path, dataset=True)
+    else:
+        df = pd.read_parquet(path)
+
+    df["season"] = df["season"].astype(str)
+    return df.sort_values(["season", "Player", "Tm"]).reset_index(drop=True)
+
+
+def join_league_features(df, path=LEAGUE_FEATURES_PATH):
+    """
+    Adds the precomputed league features (percentiles, z-scores and league-relative stats
+    within each season) to the processed dataset.
+
+    Args:
+        df (pd.DataFrame): The processed dataset, in the scoring schema.
+        path (str): S3 path or local path of the league features.
+
+    Returns:
+        tuple: The dataset with the feature columns, in the same row order, and the feature columns.
+    """
+    if path.startswith("s3://"):
+        features = wr.s3.read_parquet(path, dataset=True)
+    else:
+        features = pd.read_parquet(path)
+
+    features["season"] = features["season"].astype(str)
+    features = features.drop(columns=[column for column in features.columns if column in df.columns and column not in HISTORICAL_ID_COLUMNS])
+
+    df = df.merge(features, on=HISTORICAL_ID_COLUMNS, how="left", validate="one_to_one")
+    print(f"Joined {features.shape[1] - len(HISTORICAL_ID_COLUMNS)} league features.")
+
+    return df, [column for column in features.columns if column not in HISTORICAL_ID_COLUMNS]
+
+
+def season_folds(seasons, n_splits=N_SPLITS):
+    """
+    Splits rows into folds that never share a season, computed once and shared by all models.
+
+    Args:
+        seasons (np.ndarray): The season of each row.
+        n_splits (int): Number of folds.
+
+    Returns:
+        List[tuple]: The (train indices, test indices) of each fold.
+    """
+    return list(GroupKFold(n_splits=n_splits).split(seasons, groups=seasons))
+
+
+def mvp_hit_rate(y, y_pred, seasons):
+    """
+    Share of seasons where the player with the highest predicted share won the MVP.
+
+    Args:
+        y (np.ndarray): Actual MVP shares.
+        y_pred (np.ndarray): Predicted MVP shares.
+        seasons (np.ndarray): The season of each row.
+
+    Returns:
+        float: The hit rate.
+    """
+    results = pd.DataFrame({"season": seasons, "y": y, "y_pred": y_pred})
+    grouped = results.groupby("season")
+    return float((grouped["y"].idxmax() == grouped["y_pred"].idxmax()).mean())
+
+
+def search_model(name, X, y, seasons, folds):
+    """
+    Runs the season-grouped hyperparameter search of one model. The features are scaled
+    inside each fold, with the statistics of its training rows only, so the CV metrics do
+    not see the held-out seasons.
+
+    Args:
+        name (str): The model name (see MODELS).
+        X (np.ndarray): Unscaled feature matrix.
+        y (np.ndarray): Target.
+        seasons (np.ndarray): The season of each row.
+        folds (List[tuple]): Precomputed cross-validation folds.
+
+    Returns:
+        tuple: The model name, the best estimator refitted on all the scaled rows and its metrics.
+    """
+    estimator, param_grid = MODELS[name]
+    start = time.perf_counter()
+
+    search = GridSearchCV(
+        Pipeline([("scaler", StandardScaler()), ("model", estimator)]),
+        {f"model__{param}": values for param, values in param_grid.items()},
+        scoring="neg_root_mean_squared_error",
+        cv=folds,
+        n_jobs=1,
+        refit=True,
+    )
+    search.fit(X, y)
+
+    # Out-of-fold predictions of the best parameters, on the same folds
+    y_oof = np.empty_like(y)
+    for train_idx, test_idx in folds:
+        model = clone(search.best_estimator_).fit(X[train_idx], y[train_idx])
+        y_oof[test_idx] = model.predict(X[test_idx])
+
+    metrics = {
+        "best_params": {param.replace("model__", "", 1): value for param, value in search.best_params_.items()},
+        "cv_rmse": float(-search.best_score_),
+        "cv_mvp_hit_rate": mvp_hit_rate(y, y_oof, seasons),
+        "search_seconds": round(time.perf_counter() - start, 1),
+    }
+    print(f"{name}: {metrics}")
+
+    # The refit scaler is fit on all the rows, as the scaler of the feature matrix
+    return name, search.best_estimator_.named_steps["model"], metrics
+
+
+def train_models(X, y, seasons, folds, n_jobs=-1):
+    """
+    Runs the hyperparameter search of every model in parallel, one model per core.
+
+    Args:
+        X (np.ndarray): Unscaled feature matrix. Memory maps are shared with the workers
+            instead of being copied to each of them.
+        y (np.ndarray): Target.
+        seasons (np.ndarray): The season of each row.
+        folds (List[tuple]): Precomputed cross-validation folds.
+        n_jobs (int): Number of parallel workers (-1 uses all cores).
+
+    Returns:
+        tuple: Dictionaries with the best estimator and the metrics of each model.
+    """
+    results = Parallel(n_jobs=n_jobs)(
+        delayed(search_model)(name, X, y, seasons, folds) for name in MODELS
+    )
+
+    models = {name: model for name, model, _ in results}
+    metrics = {name: model_metrics for name, _, model_metrics in results}
+
+    return models, metrics
+
+
+def check_promotable(features, data_path=os.path.dirname(PATH_DATA)):
+    """
+    Checks that get_scores can score with the features: they must be columns of the daily
+    snapshots it reads (e.g., PTS_PERGAME), not only of the processed dataset (e.g., PTS_per_game).
+
+    Args:
+        features (List[str]): Feature columns.
+        data_path (str): Directory of the snapshots scored by get_scores.
+
+    Raises:
+        ValueError: If there is no snapshot to check against, or features are missing from it.
+    """
+    snapshots = sorted(glob.glob(os.path.join(data_path, "*.parquet")), key=os.path.getmtime)
+    if not snapshots:
+        raise ValueError(f"Cannot promote: no snapshot in {data_path} to check the features against.")
+
+    columns = set(scoring_columns(snapshots[-1]))
+    missing = [feature for feature in features if feature not in columns]
+    if missing:
+        raise ValueError(
+            f"Cannot promote: {len(missing)} features are not in the snapshots scored by get_scores "
+            f"(e.g., {missing[:5]}). Train without --promote, or on a dataset with the scoring schema."
+        )
+
+
+def save_artifacts(version, features, scaler, models, metrics, promote=False):
+    """
+    Writes the artifacts of a training run to `machine_learning/models/{version}/`:
+    the pickled models, their metrics and an artifact bundle (see artifacts.py).
+
+    Args:
+        version (str): The version of the run.
+        features (List[str]): Feature columns.
+        scaler (StandardScaler): The fitted scaler.
+        models (dict): The best estimator of each model.
+        metrics (dict): Training metadata and the metrics of each model.
+        promote (bool): Whether to also copy the artifacts to `machine_learning/models/`,
+            where get_scores loads them from.
+
+    Returns:
+        str: The directory of the artifacts.
+    """
+    path = os.path.join(PATH_MODELS, version)
+    os.makedirs(path, exist_ok=True)
+
+    artifacts = {"features.dat": features, "standard_scaler.dat": scaler}
+    artifacts.update({f"{name}.dat": model for name, model in models.items()})
+
+    for filename, artifact in artifacts.items():
+        with open(os.path.join(path, filename), "wb") as file:
+            pickle.dump(artifact, file)
+
+    with open(os.path.join(path, "metrics.json"), "w") as file:
+        json.dump(metrics, file, indent=2, default=str)
+
+    # Bundle loaded by get_scores, the pickles are kept for analysis (e.g., SHAP)
+    write_bundle(os.path.join(path, "bundle"), features, scaler, models, version=version)
+
+    if promote:
+        for filename in list(artifacts) + ["metrics.json"]:
+            shutil.copy(os.path.join(path, filename), os.path.join(PATH_MODELS, filename))
+        write_bundle(PATH_BUNDLE, features, scaler, models, version=version)
+        print(f"Artifacts promoted to {PATH_MODELS}.")
+
+    print(f"Artifacts saved to {path}.")
+    return path
+
+#############################################
+
+def train(data_path=PROCESSED_DATA_PATH, version=None, n_jobs=-1, promote=False, matrix_version=None, league_features=None):
+    """
+    Trains the five MVP share models and saves their artifacts. The processed dataset is
+    converted to the scoring schema first, so the models are trained on the columns of the
+    snapshots get_scores scores (see features.MODEL_FEATURES). The hyperparameters of each
+    model are searched in parallel, on folds that never share a season.
+
+    Args:
+        data_path (str): S3 or local path of the processed dataset.
+        version (str, optional): Version of the run (defaults to a timestamp).
+        n_jobs (int): Number of parallel workers (-1 uses all cores).
+        promote (bool): Whether to promote the artifacts to get_scores (see check_promotable).
+        matrix_version (str, optional): Version of a feature matrix of the store to train on
+            instead of the processed dataset.
+        league_features (str, optional): S3 or local path of the league features to join
+            (see join_league_features).
+
+    Returns:
+        str: The directory of the artifacts.
+
+    Raises:
+        ValueError: If the feature matrix is scaled (written by an older version of the store),
+            or the features cannot be promoted.
+    """
+    version = version or datetime.today().strftime("%Y_%m_%d_%H%M%S")
+
+    # Feature matrix of the store, written from the processed dataset unless a version is given
+    if matrix_version is None:
+        df = to_scoring_schema(load_training_data(data_path))
+        features = MODEL_FEATURES
+
+        # League features, precomputed within each season
+        if league_features:
+            df, league_columns = join_league_features(df, league_features)
+            features = features + league_columns
+
+        matrix_version = write_feature_matrix(df, select_features(df, features))
+    matrix = open_feature_matrix(matrix_version)
+
+    if matrix.schema.get("scaled", True):
+        raise ValueError(f"Feature matrix {matrix_version} is scaled, write it again from the processed dataset.")
+
+    features = matrix.schema["features"]
+
+    # Checked before training, which takes long
+    if promote:
+        check_promotable(features)
+
+    # Unscaled features, the scaler is fit inside each fold
+    scaler = scaler_from_schema(matrix.schema)
+    X = matrix.X
+    y, seasons = np.asarray(matrix.y, dtype=np.float64), matrix.index[:, 0]
+
+    # Season folds, computed once
+    folds = season_folds(seasons)
+
+    print(f"Training on {X.shape[0]} rows, {X.shape[1]} features, {len(np.unique(seasons))} seasons.")
+
+    models, model_metrics = train_models(X, y, seasons, folds, n_jobs=n_jobs)
+
+    metrics = {
+        "version": version,
+        "data_path": data_path,
+        "feature_matrix": matrix_version,
+        "league_features": league_features,
+        "n_rows": int(X.shape[0]),
+        "n_features": int(X.shape[1]),
+        "seasons": sorted(np.unique(seasons).tolist()),
+        "n_splits": N_SPLITS,
+        "random_state": RANDOM_STATE,
+        "models": model_metrics,
+    }
+
+    return save_artifacts(version, features, scaler, models, metrics, promote=promote)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the five MVP share models.")
+    parser.add_argument("--data", default=PROCESSED_DATA_PATH, help="S3 or local path of the processed dataset.")
+    parser.add_argument("--matrix", help=f"Version of a feature matrix in {PATH_MATRICES} to train on instead of --data.")
+    parser.add_argument("--league-features", nargs="?", const=LEAGUE_FEATURES_PATH, help="Join the precomputed league features (S3 or local path).")
+    parser.add_argument("--version", help="Version of the run (defaults to a timestamp).")
+    parser.add_argument("--n-jobs", type=int, default=-1, help="Number of parallel workers.")
+    parser.add_argument("--promote", action="store_true", help="Copy the artifacts to machine_learning/models/ (the features must be columns of the snapshots scored by get_scores).")
+    args = parser.parse_args()
+
+    train(data_path=args.data, version=args.version, n_jobs=args.n_jobs, promote=args.promote, matrix_version=args.matrix, league_features=args.league_features)
@@ -0,0 +1,172 @@
+#########################################################
+#                IMPORT LIBRARIES                       #
+#########################################################
+
+from prefect import flow, task
+from datetime import datetime, timedelta
+from typing import Dict, List
+from tasks.compaction import (
+    compacted_sources,
+    delete_files,
+    list_daily_files,
+    read_compaction_manifest,
+    read_snapshots_by_season,
+    snapshot_day,
+    write_compacted_season,
+    write_compaction_manifest,
+    MANIFEST_VERSION,
+)
+from tasks.lake import LAKE_ROOT
+from tasks.profiling import profile_run
+
+
+#########################################################
+#                 GLOBAL VARIABLES                      #
+#########################################################
+
+# Recent daily snapshots are left alone: the StatsRefresh flow rewrites the current day
+# and the StatsScraper flow compares each snapshot with the previous one
+MIN_AGE_DAYS = 2
+
+
+#########################################################
+#                 HELPER FUNCTIONS                      #
+#########################################################
+
+def flow_run_name_generator():
+    """
+    Generates a flow run name for the Prefect flow.
+
+    Returns:
+        str: The flow run name in the format "Compact-YYYY_MM_DD-HHhMM"
+    """
+    return "Compact-" + datetime.now().strftime("%Y_%m_%d-%Hh%M")
+
+
+#########################################################
+#                  TASKS DEFINITION                     #
+#########################################################
+
+@task(
+    name="Find Snapshots to Compact",
+    description="List the daily snapshots that are old enough and not compacted yet",
+    tags=["NBA", "S3", "Stats", "Compaction"],
+)
+def find_snapshots_to_compact(root: str, manifest: dict, min_age_days: int) -> List[str]:
+    """
+    Lists the daily snapshots that are not in a compacted file yet, leaving out the most
+    recent ones.
+
+    Args:
+        root (str): The root of the lake.
+        manifest (dict): The compaction manifest.
+        min_age_days (int): Snapshots more recent than this number of days are left out.
+
+    Returns:
+        List[str]: The paths of the daily snapshots to compact.
+    """
+    last_day = datetime.now().date() - timedelta(days=min_age_days)
+    sources = compacted_sources(manifest)
+
+    paths = [path for path in list_daily_files(root) if path not in sources and snapshot_day(path) <= last_day]
+
+    print(f"{len(paths)} daily snapshots to compact.")
+    return paths
+
+
+@task(
+    name="Compact Season",
+    description="Merge the snapshots of a season into a few large sorted files",
+    tags=["NBA", "S3", "Stats", "Compaction"],
+    task_run_name="{season}",
+)
+def compact_season(season: str, new_tables: list, new_sources: List[str], manifest: dict, root: str, run_id: str) -> Dict[str, list]:
+    """
+    Rewrites the compacted files of a season with its new daily snapshots. The current
+    compacted files of the season are merged in, so each season has one set of files.
+
+    Args:
+        season (str): The season (e.g., "2023-24").
+        new_tables (List[pa.Table]): The new daily snapshots of the season.
+        new_sources (List[str]): Their paths.
+        manifest (dict): The compaction manifest.
+        root (str): The root of the lake.
+        run_id (str): The identifier of the compaction run.
+
+    Returns:
+        dict: The manifest entry of the season.
+    """
+    entry = manifest.get("seasons", {}).get(season, {"files": [], "sources": [], "retired": []})
+
+    previous_tables = read_snapshots_by_season(entry["files"], root).get(season, ([], []))[0]
+    files = write_compacted_season(previous_tables + new_tables, season, run_id, root)
+
+    print(f"Season {season}: {len(entry['sources'])} + {len(new_sources)} daily snapshots merged into {len(files)} files.")
+
+    return {
+        "files": files,
+        "sources": sorted(set(entry["sources"]) | set(new_sources)),
+        # Kept until the next compaction, for readers that listed them before the swap
+        "retired": entry["files"],
+        "run_id": run_id,
+        "rows": sum(table.num_rows for table in previous_tables + new_tables),
+    }
+
+
+#########################################################
+#                   FLOW DEFINITION                     #
+#########################################################
+
+@flow(name="CompactSnapshots", flow_run_name=flow_run_name_generator, log_prints=True)
+def compact_snapshots(root: str = LAKE_ROOT, min_age_days: int = MIN_AGE_DAYS, delete_sources: bool = False) -> None:
+    """
+    Compacts the daily snapshots of `data/raw/players/` into a few large Parquet files per
+    season under `data/compacted/players/`, sorted and with large row groups.
+
+    New files are written under a new run directory and swapped in by rewriting the
+    manifest in one PUT: readers that list files through `tasks.compaction.live_snapshot_files`
+    see either the previous or the new files, never partial results. Files replaced by the
+    previous compaction are deleted.
+
+    Args:
+        root (str): The root of the lake, an S3 bucket path or a local directory.
+        min_age_days (int): Snapshots more recent than this number of days are left out.
+        delete_sources (bool): Whether to delete the compacted daily snapshots. They stay by default.
+
+    Returns:
+        None
+    """
+    manifest = read_compaction_manifest(root)
+    paths = find_snapshots_to_compact(root, manifest, min_age_days)
+
+    if not paths:
+        print("Nothing to compact.")
+        return
+
+    run_id = datetime.now().strftime("%Y%m%dT%H%M%S")
+
+    entries = {
+        season: compact_season(season, tables, sources, manifest, root, run_id)
+        for season, (tables, sources) in read_snapshots_by_season(paths, root).items()
+    }
+
+    # Swap the new files in
+    seasons = manifest.get("seasons", {})
+    retired = [path for season in entries if season in seasons for path in seasons[season]["retired"]]
+    write_compaction_manifest({**manifest, "version": MANIFEST_VERSION, "seasons": {**seasons, **entries}}, root)
+
+    # Files no reader can list anymore
+    delete_files(retired, root)
+
+    if delete_sources:
+        delete_files(paths, root)
+        print(f"Deleted {len(paths)} compacted daily snapshots.")
+
+
+#########################################################
+#                       MAIN                            #
+#########################################################
+
+if __name__ == "__main__":
+    with profile_run("compact_snapshots"):
+        compact_snapshots()
@@ -3,7 +3,12 @@ from prefect_sqlalchemy.credentials import DatabaseCredentials
 import pandas as pd
 from prefect.filesystems import S3
 import io
+import pyarrow.parquet as pq
 from datetime import datetime
+from tasks.arrow_backend import arrow_backend_enabled, from_arrow_table, to_arrow_table
+from tasks.db_schema import DB_SCHEMA, DB_TABLE, apply_schema, prepare_partitions, refresh_views
+from tasks.pg_copy import copy_arrow_table
+from tasks.profiling import profile_run
 
 # Custom exception classes
 class DBWriteError(Exception):
@@ -12,8 +17,6 @@ class DBWriteError(Exception):
 
 # Constants for database and S3
 CURRENT_DAY = datetime.now().strftime("%Y_%m_%d")
-DB_TABLE = 'nba_stats'
-DB_SCHEMA = 'public'
 S3_BLOCK = S3.load("nba-mvp-pipeline")
 DB_BLOCK = DatabaseCredentials.load('lk-rds-credentials')
 
@@ -32,21 +35,30 @@ def read_raw_data():
     # Read Parquet data from S3
     pq_bytes = S3_BLOCK.read_path(f"data/raw/players/{CURRENT_DAY}.parquet")
     pq_file = io.BytesIO(pq_bytes)
+
+    # Arrow backend: Arrow-backed columns, loaded by COPY without converting them
+    if arrow_backend_enabled():
+        return from_arrow_table(pq.read_table(pq_file))
+
     df = pd.read_parquet(pq_file)
     return df
 
 @task
-def load_data(df):
+def load_data(df, engine):
     print("Loading data into the database...")
     # Write DataFrame to PostgreSQL database
     try:
-        df.to_sql(
-            name=DB_TABLE,
-            schema=DB_SCHEMA,
-            con=DB_BLOCK.get_engine(),
-            if_exists='append',
-            index=False
-        )
+        if arrow_backend_enabled():
+            # Bulk-load the Arrow buffers with COPY
+            copy_arrow_table(to_arrow_table(df), engine, DB_SCHEMA, DB_TABLE)
+        else:
+            df.to_sql(
+                name=DB_TABLE,
+                schema=DB_SCHEMA,
+                con=engine,
+                if_exists='append',
+                index=False
+            )
         print("Data successfully loaded into the database.")
     except Exception as e:
         raise DBWriteError(f"Error writing to database: {e}")
@@ -54,13 +66,25 @@ def load_data(df):
 @flow(name="IngestDB", flow_run_name=flow_run_name_generator, log_prints=True)
 def ingest_data():
     print("Starting data ingestion...")
+    engine = DB_BLOCK.get_engine()
+
+    # Create or update the partitioned table, indexes and materialized views
+    apply_schema(engine)
+
     # Read raw data from S3
     df = read_raw_data()
+
+    # Create the season partitions
+    prepare_partitions(df, engine)
     
     # Load data into database
-    load_data(df)
+    load_data(df, engine)
+
+    # Refresh the latest snapshot and leaderboards
+    refresh_views(engine)
     print("Data ingestion completed.")
 
 if __name__ == "__main__":
     # Run the flow
-    ingest_data()
+    with profile_run("db_ingestion"):
+        ingest_data()
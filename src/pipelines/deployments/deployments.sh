@@ -1,3 +1,4 @@
 prefect deployment build ".\src\pipelines\stats_current.py:scrap_current_season_stats" --name "BasketballReference-2023" --version 1.0.0 --tag "ETL" --tag "BRef" -q default  -p default-agent-pool --infra process --storage-block github/gh-master --cron "0 10 * * *" --output ".\src\pipelines\deployments\bref-2023.yaml" --apply
 prefect deployment build ".\src\pipelines\stats_current.py:scrap_current_season_stats" --name "BasketballReference-2022" --version 1.0.0 --tag "ETL" --tag "BRef" -q default  -p default-agent-pool --infra process --storage-block github/gh-master --cron "0 10 * * *" --output ".\src\pipelines\deployments\bref-2022.yaml" --param season=2022 --apply
-prefect deployment build ".\src\pipelines\db_ingestion.py:ingest_data" --name "Raw_to_Stats" --version 1.0.0 --tag "DB" -q default  -p default-agent-pool --infra process --storage-block github/gh-master --output ".\src\pipelines\deployments\ingestdb.yaml" --apply
\ No newline at end of file
+prefect deployment build ".\src\pipelines\db_ingestion.py:ingest_data" --name "Raw_to_Stats" --version 1.0.0 --tag "DB" -q default  -p default-agent-pool --infra process --storage-block github/gh-master --output ".\src\pipelines\deployments\ingestdb.yaml" --apply
+prefect deployment build ".\src\pipelines\stats_refresh.py:refresh_current_season" --name "BasketballReference-Refresh" --version 1.0.0 --tag "ETL" --tag "BRef" -q default  -p default-agent-pool --infra process --storage-block github/gh-master --cron "*/20 0-6,19-23 * * *" --output ".\src\pipelines\deployments\bref-refresh.yaml" --apply
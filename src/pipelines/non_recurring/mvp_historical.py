@@ -6,6 +6,9 @@ from prefect import flow, task
 import pandas as pd
 import awswrangler as wr
 import time
+from tasks.cache import cached
+from tasks.html_tables import SLUG_COLUMN, read_html_table
+from tasks.profiling import profile_run
 
 
 #########################################################
@@ -27,6 +30,7 @@ SEASONS = [str(i) for i in range(2007, 2024)]  # Seasons from 2006-07 to 2022-23
     tags=["NBA", "Basketball-Reference", "MVP", "Extraction"],
     task_run_name="{season}",
 )
+@cached()
 def get_mvp_data(award: str = 'mvp', season: str = None):
     """
     Retrieve MVP award data for a specific season.
@@ -47,14 +51,11 @@ def get_mvp_data(award: str = 'mvp', season: str = None):
     # Construct the URL to fetch data
     url = AWARD_URL.format(season)
 
-    # Read data from the URL and select the first table
-    df = pd.read_html(url)[0]
+    # Read only the MVP voting table from the URL
+    df = read_html_table(url, award)
 
-    # Adjust columns to remove level 0 header
-    df.columns = df.columns.droplevel(0)
-
-    # Extract relevant columns
-    df_mvp = df[['Rank', 'Player', 'Share']]
+    # Extract relevant columns (and the player slug, the stable identifier of the player)
+    df_mvp = df[['Rank', 'Player', 'Share'] + ([SLUG_COLUMN] if SLUG_COLUMN in df.columns else [])].copy()
 
     # Extract the rank from 'Rank' column and update it
     df_mvp.loc[:, 'Rank'] = df_mvp['Rank'].astype(str).str.split('T', expand=True)[0]
@@ -124,4 +125,5 @@ def mvp_data_scraper():
 
 if __name__ == "__main__":
     # Run flow
-    mvp_data_scraper()
\ No newline at end of file
+    with profile_run("mvp_historical"):
+        mvp_data_scraper()
\ No newline at end of file
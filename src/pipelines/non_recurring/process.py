@@ -3,14 +3,38 @@
 #########################################################
 
 import pandas as pd
-import awswrangler as wr
 import time
 from prefect import task, flow
 from prefect.runtime import flow_run
 from datetime import datetime
-from typing import List
+from typing import Dict, List
 from tasks.tasks_br_scraper import define_column_data_types
+from tasks.arrow_backend import read_parquet, write_partitioned
+from tasks.duckdb_process import (
+    connect_engine,
+    create_player_ids_view,
+    create_stats_mvp_view,
+    create_stats_view,
+    fetch_stats_mvp,
+    get_player_names,
+    get_stats_keys,
+)
 from tasks.data_types import data_types
+from tasks.cache import cached
+from tasks.feature_store import HISTORICAL_ID_COLUMNS, build_league_features, load_league_features
+from tasks.manifest import get_object_versions, hash_dataframe, read_manifest, write_manifest
+from tasks.html_tables import SLUG_COLUMN
+from tasks.player_identity import (
+    assign_player_ids,
+    identity_rules_hash,
+    lookup_player_ids,
+    player_columns,
+    read_player_index,
+    update_player_index,
+    write_player_index,
+)
+from tasks.profiling import profile_run
+from tasks.stints import consolidate_player_stints
 
 
 #########################################################
@@ -19,6 +43,16 @@ from tasks.data_types import data_types
 
 BUCKET_PATH = "s3://nba-mvp-pipeline/{}"
 SEASONS = [str(i) for i in range(2007, 2024)]  # Seasons from 2006-07 to 2022-23
+PROCESSED_DATA_PATH = BUCKET_PATH.format("data/processed/mvp/stats_mvp/")
+MANIFEST_PATH = BUCKET_PATH.format("data/processed/mvp/_manifest.json")
+PROCESSING_VERSION = "2"  # Bump to force a full rebuild when the processing logic changes
+
+# Engines of the processing: eager pandas steps, or one lazy DuckDB query plan
+ENGINES = ["pandas", "duckdb"]
+
+# Data types of the processed data. A copy: `tasks.data_types.data_types` is the schema
+# of the nba_stats table (see `tasks.db_schema`), which has no MVP share.
+PROCESSED_DATA_TYPES = {**data_types, "Share": "float64", "player_id": "int32"}
 
 
 #########################################################
@@ -37,6 +71,48 @@ def generate_flow_run_name():
     return today.strftime("%Y-%m-%d-%Hh-%Mmin-%Ss")
 
 
+def format_season(season: str) -> str:
+    """
+    Formats a season as it appears in the data.
+
+    Args:
+        season (str): The NBA season in the format "YYYY" (e.g., "2023").
+
+    Returns:
+        str: The season in the format "YYYY-YY" (e.g., "2022-23").
+    """
+    return f"{str(int(season)-1)}-{season[2:]}"
+
+
+def stats_raw_path(season: str) -> str:
+    """
+    Builds the S3 path of the raw historical stats for a season.
+
+    Args:
+        season (str): The NBA season in the format "YYYY" (e.g., "2023").
+
+    Returns:
+        str: The S3 path to the Parquet file.
+    """
+    return BUCKET_PATH.format(f"data/raw/historical/{season[:4]}.parquet")
+
+
+def players_fingerprint(df_mvp_season: pd.DataFrame, index: pd.DataFrame) -> str:
+    """
+    Hashes the player IDs the player index gives to the MVP players of a season, so a
+    change of the index that changes their match with the stats is detected. IDs already
+    in the index never change, so players added for other seasons leave it unchanged.
+
+    Args:
+        df_mvp_season (pd.DataFrame): The MVP data of a season.
+        index (pd.DataFrame): The player index.
+
+    Returns:
+        str: The content hash of the IDs (null for players not in the index yet).
+    """
+    return hash_dataframe(lookup_player_ids(df_mvp_season.reset_index(drop=True), index).to_frame())
+
+
 #########################################################
 #                  TASKS DEFINITION                     #
 #########################################################
@@ -57,7 +133,7 @@ def read_mvp_data():
         pd.DataFrame: The DataFrame containing the data from the Parquet file.
     """
     # Read MVP data from S3
-    df_mvp = wr.s3.read_parquet(BUCKET_PATH.format(f"data/raw/mvp/mvp.parquet"))
+    df_mvp = read_parquet(BUCKET_PATH.format(f"data/raw/mvp/mvp.parquet"))
 
     print(df_mvp.head())
     print(df_mvp.shape)
@@ -79,43 +155,80 @@ def read_stats_from_s3(path):
     Returns:
         pd.DataFrame: The DataFrame containing the data from the Parquet file.
     """
-    df_stats = wr.s3.read_parquet(path)
+    df_stats = read_parquet(path)
     print("This is the shape of the DataFrame: ", df_stats.shape)
 
     return df_stats
 
 
 @task(
-    name="Filter Players",
-    description="Filters players that played for more than one team in a given season",
+    name="Consolidate Player Stints",
+    description="Consolidates the stints of players that played for more than one team in a given season",
     tags=["NBA", "Stats", "Transform"]
 )
-def filter_players(df_stats):
+def consolidate_stints(df_stats):
     """
-    Filter out Tm='TOT.
+    Keeps one row per player-season. Players that played for more than one team keep
+    their season totals (Tm='TOT') with the team context (W/L%, SRS, Seed, ...) averaged
+    over their stints, weighted by minutes played.
 
     Args:
         df_stats (pd.DataFrame): DataFrame containing historical stats data.
 
     Returns:
-        pd.DataFrame: Filtered DataFrame.
+        pd.DataFrame: Consolidated DataFrame.
     """
-    # Filter out Tm='TOT'
-    df_stats_filtered = df_stats[df_stats['Tm'] != 'TOT']
+    df_stats_consolidated = consolidate_player_stints(df_stats)
 
-    print("This is the shape of the filtered DataFrame: ", df_stats_filtered.shape, "\n")
+    print("This is the shape of the consolidated DataFrame: ", df_stats_consolidated.shape, "\n")
 
-    return df_stats_filtered
+    return df_stats_consolidated
+
+
+@task(
+    name="Resolve Player IDs",
+    description="Resolve player names to stable player IDs using the player index",
+    tags=["NBA", "Stats", "MVP", "Transform"]
+)
+def resolve_player_ids(df_stats, df_mvp):
+    """
+    Adds a 'player_id' column to the stats and MVP DataFrames.
+
+    Players are looked up in the persisted player index by their basketball-reference
+    slug, or by their normalized name (accents, punctuation, known aliases) in data
+    scraped without slugs. Players seen for the first time are added to the index.
+
+    Args:
+        df_stats (pd.DataFrame): DataFrame containing historical stats data.
+        df_mvp (pd.DataFrame): DataFrame containing MVP data.
+
+    Returns:
+        tuple: The stats and MVP DataFrames with the added 'player_id' column.
+    """
+    index = read_player_index()
+
+    # Add new players to the index
+    index, n_new_players = update_player_index(index, pd.concat([df_stats[player_columns(df_stats)], df_mvp[player_columns(df_mvp)]]))
+
+    if n_new_players:
+        print(f"Adding or updating {n_new_players} players of the player index.")
+        write_player_index(index)
+
+    df_stats = assign_player_ids(df_stats, index)
+    df_mvp = assign_player_ids(df_mvp, index)
+
+    return df_stats, df_mvp
 
 
 @task(
     name="Merge DataFrames",
-    description="Merges the MVP data with historical stats data using a left join on 'Player' and 'Season'",
+    description="Merges the MVP data with historical stats data using a left join on 'player_id' and 'Season'",
     tags=["NBA", "Stats", "MVP", "Transform"]
 )
+@cached()
 def merge_stats_with_mvp(df_stats, df_mvp):
     """
-    Merges the MVP data with the historical stats data using a left join on 'Player' and 'Season'.
+    Merges the MVP data with the historical stats data using a left join on 'player_id' and 'Season'.
     
     Args:
         df_mvp (pd.DataFrame): DataFrame containing MVP data.
@@ -127,12 +240,12 @@ def merge_stats_with_mvp(df_stats, df_mvp):
     print("This is the shape of the MVP DataFrame: ", df_mvp.shape)
     print("This is the shape of the stats DataFrame: ", df_stats.shape)
 
-    # Merge DataFrames
+    # Merge DataFrames (the stats spelling of the player name is kept)
     merged_df = pd.merge(
         df_stats,
-        df_mvp,
-        left_on=["Player", "season"],
-        right_on=["Player", "Season"],
+        df_mvp.drop(columns=["Player", SLUG_COLUMN], errors="ignore"),
+        left_on=["player_id", "season"],
+        right_on=["player_id", "Season"],
         how="left"
     )
 
@@ -142,41 +255,6 @@ def merge_stats_with_mvp(df_stats, df_mvp):
 
     return merged_df
 
-@task(
-    name="Find Missing Players",
-    description="Finds the 'Player' and 'Season' from df_mvp that do not have a match in df_stats",
-    tags=["NBA", "Stats", "MVP", "Data Quality"]
-)
-def find_missing_players(df_stats, df_mvp):
-    """
-    Finds the "Player" and "Season" from df_mvp that do not have a match in df_stats.
-    Only runs if the merge was unsuccessful.
-
-    Args:
-        df_stats (pd.DataFrame): The DataFrame containing the merged data.
-        df_mvp (pd.DataFrame): The DataFrame containing the MVP data.
-
-    Returns:
-        pd.DataFrame: The DataFrame containing the missing "Player" and "Season" values.
-    """
-    # Merge DataFrames
-    merged_df = pd.merge(
-        df_mvp,
-        df_stats,
-        left_on=["Player", "Season"],
-        right_on=["Player", "season"],
-        how="outer",
-        indicator=True
-    )
-
-    # Get missing values
-    missing_df = merged_df[merged_df['_merge'] == 'left_only'][['Player', 'Season']]
-
-    print("These are the missing 'Player' and 'Season' values:")
-    print(missing_df)
-
-    return missing_df
-
 @task(
     name="Handle Null Values",
     description="Handle null values in a merged statistics DataFrame",
@@ -213,37 +291,166 @@ def handle_null_values(df_stats):
 
 
 @task(
-    name="Check Player Name Matches",
-    description="Check if all MVP award recipients for a specified season have corresponding statistics data",
+    name="Find Missing Players",
+    description="Finds the 'Player' and 'Season' from df_mvp that do not have a match in df_stats",
     tags=["NBA", "Stats", "MVP", "Data Quality"]
 )
-def check_player_name_matches(df_mvp, df_stats, seasons):
+def find_missing_players(df_mvp, df_stats, seasons):
     """
-    Check if names in MVP dataframe have matched in the stats dataframe.
+    Finds the "Player" and "Season" pairs from df_mvp that do not have a match in df_stats.
 
-    This function compares the player names between an MVP DataFrame and a statistics DataFrame
-    to determine whether all players who received the MVP award for a specified season have
-    corresponding statistics data in the player statistics DataFrame.
+    A single hash anti-join on (player_id, Season) is used, so each MVP player is only
+    matched against the stats of the same season.
 
     Args:
-        df_mvp (pandas.DataFrame): DataFrame containing MVP award data, including 'Season' and 'Player' columns.
-        df_stats (pandas.DataFrame): DataFrame containing player statistics data, including a 'Player' and 'season' columns.
-        season (List[str]): List of seasons to check (e.g., ['2020-21', '2021-22']
+        df_mvp (pandas.DataFrame): DataFrame containing MVP award data, including 'Season', 'Player' and 'player_id' columns.
+        df_stats (pandas.DataFrame): DataFrame containing player statistics data, including 'player_id' and 'season' columns.
+        seasons (List[str]): List of seasons to check (e.g., ['2020-21', '2021-22']).
 
     Returns:
-        bool: True if all seasons have matches, False otherwise.
+        pd.DataFrame: The DataFrame containing the missing "Player" and "Season" values.
     """
-    bool_list = []
+    # MVP keys for the given seasons
+    mvp_keys = df_mvp.loc[df_mvp['Season'].isin(seasons), ['player_id', 'Season', 'Player']]
+    mvp_keys = mvp_keys.drop_duplicates(subset=['player_id', 'Season'])
+
+    # Anti-join against the stats keys
+    stats_keys = pd.MultiIndex.from_arrays([df_stats['player_id'], df_stats['season'].astype(str)])
+    is_matched = pd.MultiIndex.from_arrays([mvp_keys['player_id'], mvp_keys['Season'].astype(str)]).isin(stats_keys)
+
+    missing_df = mvp_keys.loc[~is_matched, ['Player', 'Season']].reset_index(drop=True)
+
+    print("These are the missing 'Player' and 'Season' values:")
+    print(missing_df)
+
+    return missing_df
+
+
+@task(
+    name="Get Season Fingerprints",
+    description="Fingerprint the inputs of each season to detect which ones changed",
+    tags=["NBA", "S3", "Stats", "MVP", "Read"]
+)
+def get_season_fingerprints(seasons: List[str], df_mvp: pd.DataFrame, index: pd.DataFrame) -> Dict[str, dict]:
+    """
+    Fingerprints the inputs of each season: the ETag of the raw stats object, a content
+    hash of the season's MVP rows, the hash of the name normalization rules (known
+    aliases included) and the hash of the player IDs of the season's MVP players (see
+    players_fingerprint). Stats objects are not downloaded.
+
+    Args:
+        seasons (List[str]): List of seasons in the format "YYYY" (e.g., ['2021', '2022']).
+        df_mvp (pd.DataFrame): DataFrame containing MVP data for all seasons.
+        index (pd.DataFrame): The player index.
+
+    Returns:
+        dict: A dictionary mapping each season with raw stats available to its fingerprint.
+    """
+    stats_versions = get_object_versions([stats_raw_path(season) for season in seasons])
+    identity = identity_rules_hash()
+
+    fingerprints = {}
 
     for season in seasons:
-        # Get MVP players for the given season
-        mvp_players = df_mvp[df_mvp['Season'] == season]['Player'].unique()
-        # Get players in the stats DataFrame
-        stats_players = df_stats['Player'].unique()
-        # Check if all MVP players for the given season have matches in the stats DataFrame
-        bool_list.append(all(player in stats_players for player in mvp_players))
+        stats_version = stats_versions.get(stats_raw_path(season))
+
+        if stats_version is None:
+            print(f"No raw stats found for {season} season, skipping it.")
+            continue
+
+        df_mvp_season = df_mvp[df_mvp['Season'] == format_season(season)]
+
+        fingerprints[season] = {
+            "stats": stats_version,
+            "mvp": hash_dataframe(df_mvp_season.reset_index(drop=True)),
+            "identity": identity,
+            "players": players_fingerprint(df_mvp_season, index),
+        }
+
+    return fingerprints
+
+
+@task(
+    name="Get Changed Seasons",
+    description="Compare season fingerprints with the manifest of the last run",
+    tags=["NBA", "Stats", "MVP"]
+)
+def get_changed_seasons(fingerprints: Dict[str, dict], manifest: dict, full_refresh: bool = False) -> List[str]:
+    """
+    Finds the seasons whose inputs changed since they were last processed.
+
+    Args:
+        fingerprints (dict): The current fingerprint of each season.
+        manifest (dict): The manifest written by the last run.
+        full_refresh (bool): Whether to reprocess every season regardless of the manifest.
+
+    Returns:
+        List[str]: The seasons to reprocess.
+    """
+    if full_refresh or manifest.get("version") != PROCESSING_VERSION:
+        print("Reprocessing all seasons.")
+        return list(fingerprints)
+
+    processed = manifest.get("seasons", {})
+    changed_seasons = [season for season, fingerprint in fingerprints.items() if processed.get(season) != fingerprint]
+
+    print(f"Seasons with changed inputs: {changed_seasons}")
+
+    return changed_seasons
+
+
+@task(
+    name="Plan Stats Query",
+    description="Plan a lazy DuckDB scan of the season files with one row per player-season",
+    tags=["NBA", "S3", "Stats", "DuckDB"]
+)
+def plan_stats_query(seasons):
+    """
+    Opens a DuckDB connection with a lazy view over the raw stats of the seasons, with the
+    stints of players that played for more than one team consolidated as in
+    `consolidate_stints`. Nothing is read yet.
+
+    Args:
+        seasons (List[str]): List of seasons in the format "YYYY" (e.g., ['2021', '2022']).
+
+    Returns:
+        duckdb.DuckDBPyConnection: The connection, with the `stats` view.
+    """
+    paths = [stats_raw_path(season) for season in seasons]
+
+    con = connect_engine(paths)
+    create_stats_view(con, paths)
+
+    return con
+
+
+@task(
+    name="Run Stats Query",
+    description="Join the MVP shares, fill nulls and cast the stats in one DuckDB query",
+    tags=["NBA", "Stats", "MVP", "Transform", "DuckDB"]
+)
+def run_stats_query(con, df_mvp, column_data_types):
+    """
+    Merges the MVP shares with the stats on 'player_id' and 'season', fills the null
+    shares and casts the columns in one multithreaded DuckDB query. The result is the
+    same as the one of `merge_stats_with_mvp`, `handle_null_values` and
+    `define_column_data_types`.
+
+    Args:
+        con (duckdb.DuckDBPyConnection): The connection of `plan_stats_query`, with the `stats_ids` view.
+        df_mvp (pd.DataFrame): DataFrame containing MVP data, with 'player_id'.
+        column_data_types (dict): A dictionary mapping column names to their intended data types.
+
+    Returns:
+        pd.DataFrame: The processed DataFrame.
+    """
+    create_stats_mvp_view(con, df_mvp, column_data_types)
+    df_stats_processed = fetch_stats_mvp(con, column_data_types)
+
+    print("Shape of the processed DataFrame: ", df_stats_processed.shape)
+    print(df_stats_processed.head())
 
-    return all(bool_list)
+    return df_stats_processed
 
 
 @task(
@@ -253,20 +460,18 @@ def check_player_name_matches(df_mvp, df_stats, seasons):
 )
 def load_processed_data(df_stats_processed, path):
     """
-    Saves processed data DataFrame to an S3 bucket in Parquet format.
+    Saves processed data DataFrame to an S3 bucket as a Parquet dataset partitioned by season.
+    Only the partitions of the seasons present in the DataFrame are overwritten.
 
     Args:
         df_stats_processed (pd.DataFrame): The DataFrame containing processed data.
-        path (str): The S3 path to save the Parquet file.
+        path (str): The S3 path of the Parquet dataset.
 
     Returns:
         None
     """
     try:
-        wr.s3.to_parquet(
-            df=df_stats_processed,
-            path=path,
-        )
+        write_partitioned(df_stats_processed, path, partition_cols=["season"])
     except Exception as e:
         print(e)
         raise Exception("Error loading data to S3.")
@@ -300,13 +505,11 @@ def read_and_filter_stats(seasons:List[str])->pd.DataFrame:
 
         print(f"Reading data for {season} season...")
 
-        stats_raw_path = BUCKET_PATH.format(f"data/raw/historical/{season[:4]}.parquet")
-        
         # Read data from S3
-        df_stats_season = read_stats_from_s3(stats_raw_path)
+        df_stats_season = read_stats_from_s3(stats_raw_path(season))
 
-        # Filter players that played for more than one team
-        df_stats_filtered = filter_players(df_stats_season)
+        # Consolidate players that played for more than one team
+        df_stats_filtered = consolidate_stints(df_stats_season)
 
         # Append to list of DataFrames
         all_dataframes.append(df_stats_filtered)
@@ -331,53 +534,97 @@ def read_and_filter_stats(seasons:List[str])->pd.DataFrame:
     flow_run_name=generate_flow_run_name,
     log_prints=True
 )
-def process_data():
+def process_data(full_refresh: bool = False, engine: str = "pandas"):
     """
     Gets historical data from S3, processes it, and saves it back to S3.
 
     This prefect.flow performs the following operations:
-    1. Reads data from S3.
-    2. Filters players that played for more than one team.
-    3. Merges the MVP data with the current season data.
-    4. Handles null values.
-    5. Saves the processed data to S3.
+    1. Finds the seasons whose inputs changed since the last run (see `_manifest.json`).
+    2. Reads data from S3 for those seasons.
+    3. Consolidates players that played for more than one team into their season totals.
+    4. Merges the MVP data with the current season data.
+    5. Handles null values.
+    6. Saves the processed data to S3, overwriting only the partitions of those seasons.
+    7. Builds the league features of those seasons and saves them to the feature set
+       (see `tasks.feature_store`).
+
+    With the "duckdb" engine, steps 2 to 5 run as one lazy DuckDB query plan over the
+    season files. Only the player names and keys are read before the final query.
 
     Args:
-        None
+        full_refresh (bool): Whether to reprocess every season regardless of the manifest.
+        engine (str): The processing engine, "pandas" or "duckdb".
     
     Returns:
         None
     """
-    
-    processed_data_path = BUCKET_PATH.format(f"data/processed/mvp/stats_mvp.parquet")
-
-    # Call subflow for reading and filtering
-    df_stats = read_and_filter_stats(SEASONS)
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine '{engine}'. Available engines: {ENGINES}")
 
     # Read MVP data from S3
     df_mvp   = read_mvp_data()
+
+    # Find seasons whose inputs changed since the last run
+    fingerprints = get_season_fingerprints(SEASONS, df_mvp, read_player_index())
+    manifest = read_manifest(MANIFEST_PATH)
+    seasons = get_changed_seasons(fingerprints, manifest, full_refresh)
+
+    if not seasons:
+        print("No season inputs changed since the last run. Nothing to process.")
+        return
+
+    if engine == "duckdb":
+        # Plan the scan of the season files
+        con = plan_stats_query(seasons)
+
+        # Resolve the distinct player names to player IDs
+        df_players, df_mvp = resolve_player_ids(get_player_names(con), df_mvp)
+        create_player_ids_view(con, df_players)
+
+        # Only the keys are needed to check the MVP players
+        df_stats = get_stats_keys(con)
+    else:
+        # Call subflow for reading and filtering
+        df_stats = read_and_filter_stats(seasons)
+
+        # Resolve player names to player IDs
+        df_stats, df_mvp = resolve_player_ids(df_stats, df_mvp)
     
-    # Check if MVP player names for the given season have matches in the stats DataFrame
-    result = check_player_name_matches(df_mvp, df_stats, SEASONS)
+    # Check if MVP player names for the given seasons have matches in the stats DataFrame
+    missing_players = find_missing_players(df_mvp, df_stats, [format_season(season) for season in seasons])
 
-    if result:
-        print("All MVP players for the given season have matches in the stats DataFrame.")
+    if missing_players.empty:
+        print("All MVP players for the given seasons have matches in the stats DataFrame.")
     else:
-        print("Not all MVP players for the given season have matches in the stats DataFrame.")
-        raise Exception("Not all MVP players for the given season have matches in the stats DataFrame.")
+        raise Exception(f"Not all MVP players for the given seasons have matches in the stats DataFrame:\n{missing_players}")
     
-    # Merge DataFrames
-    df_stats_merged = merge_stats_with_mvp(df_stats, df_mvp)
+    if engine == "duckdb":
+        # Merge, handle null values and define data types in one query
+        df_stats_processed = run_stats_query(con, df_mvp, PROCESSED_DATA_TYPES)
+    else:
+        # Merge DataFrames
+        df_stats_merged = merge_stats_with_mvp(df_stats, df_mvp)
 
-    # Handle null values
-    df_stats_processed = handle_null_values(df_stats_merged)
+        # Handle null values
+        df_stats_processed = handle_null_values(df_stats_merged)
 
-    # Define data types
-    data_types["Share"] = "float64"
-    df_stats_processed = define_column_data_types(df_stats_processed, data_types)
+        df_stats_processed = define_column_data_types(df_stats_processed, PROCESSED_DATA_TYPES)
 
     # Save processed data to S3
-    load_processed_data(df_stats_processed, processed_data_path)
+    load_processed_data(df_stats_processed, PROCESSED_DATA_PATH)
+
+    # Percentiles, z-scores and league-relative stats within each season
+    df_features = build_league_features(df_stats_processed, HISTORICAL_ID_COLUMNS)
+    load_league_features(df_features)
+
+    # Record the inputs of the processed seasons, with the players added to the index by this run
+    index = read_player_index()
+    for season in seasons:
+        fingerprints[season]["players"] = players_fingerprint(df_mvp[df_mvp['Season'] == format_season(season)], index)
+
+    processed_seasons = {} if manifest.get("version") != PROCESSING_VERSION else manifest.get("seasons", {})
+    processed_seasons.update({season: fingerprints[season] for season in seasons})
+    write_manifest({"version": PROCESSING_VERSION, "seasons": processed_seasons}, MANIFEST_PATH)
 
 
 #########################################################
@@ -386,4 +633,5 @@ def process_data():
 
 if __name__ == "__main__":
     # Process data
-    process_data()
\ No newline at end of file
+    with profile_run("process"):
+        process_data()
\ No newline at end of file
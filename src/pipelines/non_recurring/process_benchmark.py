@@ -0,0 +1,253 @@
+#########################################################
+#                IMPORT LIBRARIES                       #
+#########################################################
+
+import argparse
+import os
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+import awswrangler as wr
+from non_recurring.process import (
+    PROCESSED_DATA_TYPES,
+    SEASONS,
+    consolidate_stints,
+    handle_null_values,
+    merge_stats_with_mvp,
+)
+from tasks.cache import DISABLED_ENV
+from tasks.duckdb_process import (
+    connect_engine,
+    create_player_ids_view,
+    create_stats_mvp_view,
+    create_stats_view,
+    fetch_stats_mvp,
+    get_player_names,
+)
+from tasks.player_identity import assign_player_ids, empty_player_index, player_columns, update_player_index
+from tasks.tasks_br_scraper import define_column_data_types
+
+
+#########################################################
+#                 GLOBAL VARIABLES                      #
+#########################################################
+
+# Root of the raw data: the S3 bucket or a local mirror of it (e.g. `aws s3 sync`)
+DEFAULT_ROOT = "s3://nba-mvp-pipeline"
+
+COLUMN_DATA_TYPES = PROCESSED_DATA_TYPES
+
+
+#########################################################
+#                 HELPER FUNCTIONS                      #
+#########################################################
+
+def read_parquet(path: str) -> pd.DataFrame:
+    return wr.s3.read_parquet(path) if path.startswith("s3://") else pd.read_parquet(path)
+
+
+def build_player_index(paths, df_mvp: pd.DataFrame) -> pd.DataFrame:
+    """
+    Builds an in-memory player index of every player of the files, shared by both engines.
+    The persisted index is neither read nor updated.
+
+    Args:
+        paths (List[str]): The Parquet files of the seasons.
+        df_mvp (pd.DataFrame): DataFrame containing MVP data.
+
+    Returns:
+        pd.DataFrame: The player index.
+    """
+    players = [read_parquet(path) for path in paths] + [df_mvp]
+    players = pd.concat([df[player_columns(df)] for df in players], ignore_index=True)
+
+    return update_player_index(empty_player_index(), players)[0]
+
+
+#########################################################
+#                      ENGINES                          #
+#########################################################
+
+def run_pandas(paths, df_mvp: pd.DataFrame, index: pd.DataFrame) -> pd.DataFrame:
+    """
+    Runs the steps of the pandas engine of `process_data`.
+    """
+    df_stats = pd.concat([consolidate_stints.fn(read_parquet(path)) for path in paths], ignore_index=True)
+    df_stats = assign_player_ids(df_stats, index)
+    df_mvp = assign_player_ids(df_mvp, index)
+
+    df_stats_merged = merge_stats_with_mvp.fn(df_stats, df_mvp)
+    df_stats_processed = handle_null_values.fn(df_stats_merged)
+
+    return define_column_data_types.fn(df_stats_processed, COLUMN_DATA_TYPES)
+
+
+def run_duckdb(paths, df_mvp: pd.DataFrame, index: pd.DataFrame) -> pd.DataFrame:
+    """
+    Runs the query plan of the DuckDB engine of `process_data`.
+    """
+    con = connect_engine(paths)
+    create_stats_view(con, paths)
+
+    create_player_ids_view(con, assign_player_ids(get_player_names(con), index))
+    df_mvp = assign_player_ids(df_mvp, index)
+
+    create_stats_mvp_view(con, df_mvp, COLUMN_DATA_TYPES)
+
+    return fetch_stats_mvp(con, COLUMN_DATA_TYPES)
+
+
+ENGINE_RUNNERS = {"pandas": run_pandas, "duckdb": run_duckdb}
+
+
+#########################################################
+#                   EQUALITY CHECK                      #
+#########################################################
+
+def write_fixtures(root: str) -> list:
+    """
+    Writes two small seasons and their MVP data under `root`, with the layout of the
+    bucket. They cover a traded player (TOT row and stints, with team context to average),
+    players with no MVP share or a null one, integer columns stored as floats (with
+    nulls and fractions, truncated by the cast) and rows without player slug.
+
+    Args:
+        root (str): The local directory.
+
+    Returns:
+        List[str]: The seasons in the format "YYYY".
+    """
+    os.makedirs(os.path.join(root, "data", "raw", "historical"))
+    os.makedirs(os.path.join(root, "data", "raw", "mvp"))
+
+    seasons = {
+        "2022": pd.DataFrame({
+            "Player": ["Nikola Jokić", "Jrue Holiday", "Jrue Holiday", "Jrue Holiday", "Joel Embiid"],
+            "player_slug": ["jokicni01", "holidjr01", "holidjr01", "holidjr01", None],
+            "Tm": ["DEN", "TOT", "MIL", "NOP", "PHI"],
+            "Pos": ["C", "PG", "PG", "PG", "C"],
+            "Age": [26.0, 31.0, 31.0, 31.0, np.nan],
+            "G_advanced": [74.0, 67.0, 40.0, 27.5, 68.0],
+            "MP_advanced": [2476.0, 2184.0, 1300.0, 884.0, 2297.0],
+            "PTS_per_game": [27.1, 17.7, 18.3, 16.8, np.nan],
+            "W/L%_team": [0.585, np.nan, 0.622, 0.439, 0.622],
+            "Seed_team": [6, 0, 3, 11, 4],
+            "season": "2021-22",
+        }),
+        "2023": pd.DataFrame({
+            "Player": ["Nikola Jokić", "Joel Embiid", "Luka Dončić"],
+            "player_slug": ["jokicni01", "embiijo01", "doncilu01"],
+            "Tm": ["DEN", "PHI", "DAL"],
+            "Pos": ["C", "C", "PG"],
+            "Age": [27.0, 28.0, 23.0],
+            "G_advanced": [69.0, 66.0, 66.0],
+            "MP_advanced": [2323.0, 2284.0, 2391.0],
+            "PTS_per_game": [24.5, 33.1, 32.4],
+            "W/L%_team": [0.646, 0.659, 0.463],
+            "Seed_team": [1, 3, 11],
+            "season": "2022-23",
+        }),
+    }
+    for season, df in seasons.items():
+        df.to_parquet(os.path.join(root, "data", "raw", "historical", f"{season}.parquet"), index=False)
+
+    pd.DataFrame({
+        "Rank": ["1", "2", "1", "2", "3"],
+        "Player": ["Nikola Jokić", "Joel Embiid", "Joel Embiid", "Nikola Jokić", "Luka Dončić"],
+        "Share": [0.875, 0.706, 0.915, 0.674, np.nan],
+        "Season": ["2021-22", "2021-22", "2022-23", "2022-23", "2022-23"],
+    }).to_parquet(os.path.join(root, "data", "raw", "mvp", "mvp.parquet"), index=False)
+
+    return list(seasons)
+
+
+def check_engines() -> pd.DataFrame:
+    """
+    Runs both engines on small local fixtures (see write_fixtures) and checks that they
+    produce the same DataFrame. Needs neither S3 nor the persisted player index.
+
+    Returns:
+        pd.DataFrame: The processed fixtures.
+
+    Raises:
+        AssertionError: If the engines produce different DataFrames.
+    """
+    os.environ[DISABLED_ENV] = "1"
+
+    with tempfile.TemporaryDirectory() as root:
+        seasons = write_fixtures(root)
+        paths = [os.path.join(root, "data", "raw", "historical", f"{season}.parquet") for season in seasons]
+        df_mvp = read_parquet(os.path.join(root, "data", "raw", "mvp", "mvp.parquet"))
+        index = build_player_index(paths, df_mvp)
+
+        results = {engine: runner(paths, df_mvp, index) for engine, runner in ENGINE_RUNNERS.items()}
+
+    pd.testing.assert_frame_equal(results["pandas"], results["duckdb"])
+    print(f"Both engines produce the same DataFrame {results['pandas'].shape} on the fixtures.")
+
+    return results["pandas"]
+
+
+#########################################################
+#                     BENCHMARK                         #
+#########################################################
+
+def benchmark(seasons, root: str = DEFAULT_ROOT, repeat: int = 3) -> pd.DataFrame:
+    """
+    Runs both engines on the same seasons, checks that they produce the same DataFrame
+    and times them.
+
+    Args:
+        seasons (List[str]): List of seasons in the format "YYYY" (e.g., ['2021', '2022']).
+        root (str): Root of the raw data, an S3 bucket path or a local directory.
+        repeat (int): Runs of each engine, the best one is reported.
+
+    Returns:
+        pd.DataFrame: The best and mean time of each engine, in seconds.
+
+    Raises:
+        AssertionError: If the engines produce different DataFrames.
+    """
+    # Timings must not come from the task cache
+    os.environ[DISABLED_ENV] = "1"
+
+    root = root.rstrip("/")
+    paths = [f"{root}/data/raw/historical/{season}.parquet" for season in seasons]
+    df_mvp = read_parquet(f"{root}/data/raw/mvp/mvp.parquet")
+    index = build_player_index(paths, df_mvp)
+
+    results, timings = {}, {}
+    for engine, runner in ENGINE_RUNNERS.items():
+        timings[engine] = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            results[engine] = runner(paths, df_mvp, index)
+            timings[engine].append(time.perf_counter() - start)
+
+    pd.testing.assert_frame_equal(results["pandas"], results["duckdb"])
+    print(f"Both engines produce the same DataFrame {results['pandas'].shape}.")
+
+    return pd.DataFrame({
+        "best (s)": {engine: min(times) for engine, times in timings.items()},
+        "mean (s)": {engine: sum(times) / len(times) for engine, times in timings.items()},
+    })
+
+
+#########################################################
+#                       MAIN                            #
+#########################################################
+
+if __name__ == "__main__":
+    # Run from src/pipelines: python -m non_recurring.process_benchmark
+    parser = argparse.ArgumentParser(description="Compare the pandas and DuckDB engines of the processing flow.")
+    parser.add_argument("--seasons", nargs="+", default=SEASONS, help='Seasons in the format "YYYY".')
+    parser.add_argument("--root", default=DEFAULT_ROOT, help="S3 bucket path or local mirror of the raw data.")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--check", action="store_true", help="Only check that both engines agree on local fixtures (offline).")
+    args = parser.parse_args()
+
+    if args.check:
+        print(check_engines())
+    else:
+        print(benchmark(args.seasons, root=args.root, repeat=args.repeat))
@@ -14,6 +14,7 @@ from tasks.tasks_br_scraper import (
     merge_standings_and_stats
 )
 from tasks.data_types import data_types
+from tasks.profiling import profile_run
 
 
 #########################################################
@@ -109,5 +110,6 @@ def historical_data_scraper(season: str):
 if __name__ == "__main__":
 
     # Run flow for each season
-    for season in SEASONS:
-        historical_data_scraper(season=season)
+    with profile_run("stats_historical"):
+        for season in SEASONS:
+            historical_data_scraper(season=season)
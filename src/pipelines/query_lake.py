@@ -0,0 +1,102 @@
+#########################################################
+#                IMPORT LIBRARIES                       #
+#########################################################
+
+import argparse
+import time
+import duckdb
+import pandas as pd
+from tasks.lake import DATASET_VIEWS, DERIVED_VIEWS, LAKE_ROOT, QUERIES, connect, run_query
+
+
+#########################################################
+#                 HELPER FUNCTIONS                      #
+#########################################################
+
+def check_views(con: duckdb.DuckDBPyConnection) -> pd.DataFrame:
+    """
+    Runs a smoke query on each view of the lake, so views that `connect` skipped or that
+    fail when scanned are reported.
+
+    Args:
+        con (duckdb.DuckDBPyConnection): A connection returned by `connect`.
+
+    Returns:
+        pd.DataFrame: The status of each view ("ok" or the first line of the error).
+    """
+    statuses = {}
+
+    for view in list(DATASET_VIEWS) + list(DERIVED_VIEWS):
+        try:
+            con.execute(f"SELECT * FROM {view} LIMIT 1").fetchall()
+            statuses[view] = "ok"
+        except duckdb.Error as e:
+            statuses[view] = str(e).splitlines()[0]
+
+    return pd.DataFrame({"view": list(statuses), "status": list(statuses.values())})
+
+
+def parse_args():
+    """
+    Parses the command line arguments.
+
+    Returns:
+        argparse.Namespace: The parsed arguments.
+    """
+    parser = argparse.ArgumentParser(
+        description="Query the Parquet lake with DuckDB.",
+        epilog="Queries:\n" + "\n".join(f"  {name:<20} {query['description']}" for name, query in QUERIES.items()),
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("query", nargs="?", choices=list(QUERIES), help="Named query to run.")
+    parser.add_argument("--sql", help="Run an ad hoc SQL statement against the lake views instead.")
+    parser.add_argument("--season", help='Season in the format "YYYY-YY" (e.g., "2022-23").')
+    parser.add_argument("--player", help="Player name as published by basketball-reference.com.")
+    parser.add_argument("--stat", help="Column to rank by (e.g., PTS_per_game, WS_advanced).")
+    parser.add_argument("--limit", type=int, help="Number of rows to return.")
+    parser.add_argument("--root", default=LAKE_ROOT, help="Lake root, an S3 bucket path or a local mirror.")
+    parser.add_argument("--check", action="store_true", help="Run a smoke query on each view and report the failing ones.")
+    parser.add_argument("--csv", help="Write the result to this CSV file instead of printing it.")
+
+    args = parser.parse_args()
+
+    if args.query is None and args.sql is None and not args.check:
+        parser.error("either a query name, --sql or --check is required")
+
+    return args
+
+
+#########################################################
+#                       MAIN                            #
+#########################################################
+
+if __name__ == "__main__":
+    args = parse_args()
+    con = connect(args.root)
+
+    if args.check:
+        statuses = check_views(con)
+        print(statuses.to_string(index=False))
+        raise SystemExit(int((statuses["status"] != "ok").any()))
+
+    start = time.perf_counter()
+
+    if args.sql:
+        result = con.execute(args.sql).df()
+    else:
+        params = {
+            param: getattr(args, param)
+            for param in QUERIES[args.query]["params"]
+            if getattr(args, param) is not None
+        }
+        result = run_query(con, args.query, **params)
+
+    elapsed = time.perf_counter() - start
+
+    if args.csv:
+        result.to_csv(args.csv, index=False)
+    else:
+        with pd.option_context("display.max_rows", None, "display.max_columns", None, "display.width", None):
+            print(result)
+
+    print(f"\n{len(result)} rows in {elapsed * 1000:.0f} ms")
@@ -3,12 +3,14 @@
 #########################################################
 
 from prefect import flow
+from prefect_sqlalchemy.credentials import DatabaseCredentials
 from tasks.tasks_br_scraper import (
     get_stats,
     merge_dfs,
     add_date_column,
     load_data,
     check_players_and_duplicates,
+    get_previous_snapshot_size,
     add_season_column,
     define_column_data_types,
     get_standings,
@@ -16,6 +18,9 @@ from tasks.tasks_br_scraper import (
 )
 from datetime import datetime
 from tasks.data_types import data_types
+from tasks.db_sink import sink_snapshot
+from tasks.feature_store import DAILY_ID_COLUMNS, build_league_features, load_league_features
+from tasks.profiling import profile_run
 
 
 
@@ -26,6 +31,7 @@ from tasks.data_types import data_types
 CURRENT_SEASON = "2024" # "2022-23"
 CURRENT_DAY    = datetime.now()
 BUCKET_NAME    = "nba-mvp-pipeline"
+DB_BLOCK_NAME  = "lk-rds-credentials"
 
 #########################################################
 #                 HELPER FUNCTIONS                      #
@@ -46,15 +52,21 @@ def flow_run_name_generator():
 #########################################################
 
 @flow(name="StatsScraper", flow_run_name=flow_run_name_generator, log_prints=True)
-def scrap_current_season_stats(season:str = CURRENT_SEASON) -> None:
+def scrap_current_season_stats(season:str = CURRENT_SEASON, db_sink: bool = False) -> None:
     """
     Scrapes current NBA player statistics from Basketball Reference.
     Makes three requests to the website, one for each type of statistics (advanced, totals, per game).
     Apply simple data cleaning and transformation.
     Loads the data into an S3 `nba-mvp-pipeline/data/raw/{date}.parquet`.
+    Builds the league features of the snapshot (percentiles, z-scores and league-relative
+    stats) and saves them to the feature set (see `tasks.feature_store`).
+    With `db_sink`, the data is also loaded into the database, concurrently and from the
+    same Arrow table, and the S3-triggered load_db Lambda skips the file (it still loads
+    it if the database load fails).
     
     Args:
         season (str): The season to scrape. Format: "YYYY", e.g. "2023" for season 2022-23.
+        db_sink (bool): Whether to load the data into the database directly.
         
     Returns:
         None
@@ -67,8 +79,9 @@ def scrap_current_season_stats(season:str = CURRENT_SEASON) -> None:
     df_advanced = get_stats(season=season, info="totals")
     df_pergame  = get_stats(season=season, info="per_game")
 
-    # Check for players and duplicates
-    dataframes = check_players_and_duplicates([df_totals, df_advanced, df_pergame])
+    # Data quality checks, including the drift against the previous snapshot
+    previous_row_count = get_previous_snapshot_size(BUCKET_NAME, season, CURRENT_DAY.strftime("%Y_%m_%d"))
+    dataframes = check_players_and_duplicates([df_totals, df_advanced, df_pergame], previous_row_count=previous_row_count)
 
     # Merge DataFrames
     merged_stats = merge_dfs(dataframes)
@@ -88,8 +101,17 @@ def scrap_current_season_stats(season:str = CURRENT_SEASON) -> None:
     # Column data types
     df_transformed = define_column_data_types(df_with_season, data_types)
 
-    # Load data into S3 bucket
-    load_data(df_transformed, BUCKET_NAME, CURRENT_DAY.strftime("%Y_%m_%d"))
+    if db_sink:
+        # Load data into S3 bucket and database
+        engine = DatabaseCredentials.load(DB_BLOCK_NAME).get_engine()
+        sink_snapshot(df_transformed, BUCKET_NAME, CURRENT_DAY.strftime("%Y_%m_%d"), engine)
+    else:
+        # Load data into S3 bucket
+        load_data(df_transformed, BUCKET_NAME, CURRENT_DAY.strftime("%Y_%m_%d"))
+
+    # League features of the snapshot
+    df_features = build_league_features(df_transformed, DAILY_ID_COLUMNS)
+    load_league_features(df_features, day=CURRENT_DAY.strftime("%Y_%m_%d"))
 
 
 #########################################################
@@ -97,4 +119,5 @@ def scrap_current_season_stats(season:str = CURRENT_SEASON) -> None:
 #########################################################
 
 if __name__ == "__main__":
-    scrap_current_season_stats(season=CURRENT_SEASON)
+    with profile_run("stats_current"):
+        scrap_current_season_stats(season=CURRENT_SEASON)
@@ -0,0 +1,186 @@
+#########################################################
+#                IMPORT LIBRARIES                       #
+#########################################################
+
+import hashlib
+import os
+import requests
+import subprocess
+import sys
+from prefect import flow, task
+from datetime import datetime
+from stats_current import scrap_current_season_stats, CURRENT_DAY, CURRENT_SEASON, BUCKET_NAME
+from tasks.cache import refresh_cache
+from tasks.html_tables import BREF_STATS_URL, REQUEST_HEADERS, REQUEST_TIMEOUT, extract_table_markup
+from tasks.manifest import read_manifest, write_manifest
+from tasks.profiling import profile_run
+
+
+#########################################################
+#                 GLOBAL VARIABLES                      #
+#########################################################
+
+# Kept outside `data/raw/players/`, which triggers the database load
+FINGERPRINTS_PATH = f"s3://{BUCKET_NAME}/data/state/stats_current_fingerprints.json"
+
+# Pages scraped by the StatsScraper flow. Standings only change when games are played,
+# which also changes these tables, so they are not polled.
+STATS_INFO = ["advanced", "totals", "per_game"]
+
+# The scoring script reads and writes paths relative to the root of the repository
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+SCORES_SCRIPT = os.path.join("machine_learning", "get_scores.py")
+
+
+#########################################################
+#                 HELPER FUNCTIONS                      #
+#########################################################
+
+def flow_run_name_generator():
+    """
+    Generates a flow run name for the Prefect flow.
+
+    Returns:
+        str: The flow run name in the format "Refresh-YYYY_MM_DD-HHhMM"
+    """
+    return "Refresh-" + datetime.now().strftime("%Y_%m_%d-%Hh%M")
+
+
+#########################################################
+#                  TASKS DEFINITION                     #
+#########################################################
+
+@task(
+    name="Get Page Fingerprint",
+    description="Fingerprint a basketball-reference.com stats table",
+    tags=["NBA", "Basketball-Reference", "Stats", "Extraction"],
+    task_run_name="{info}",
+)
+def get_page_fingerprint(season: str, info: str, previous: dict) -> dict:
+    """
+    Fingerprints the stats table of a page. The request is conditional on the validators
+    of the previous poll, so an unchanged page costs a 304 and no download. Otherwise only
+    the stats table is hashed, ignoring ads and timestamps elsewhere on the page.
+
+    Args:
+        season (str): The season in the format "YYYY", e.g. "2024" for season 2023-24.
+        info (str): The type of statistics ("per_game", "totals" or "advanced").
+        previous (dict): The fingerprint of the previous poll (empty on first run).
+
+    Returns:
+        dict: The 'etag', 'last_modified' and 'table_hash' of the page.
+    """
+    headers = dict(REQUEST_HEADERS)
+    if previous.get("etag"):
+        headers["If-None-Match"] = previous["etag"]
+    if previous.get("last_modified"):
+        headers["If-Modified-Since"] = previous["last_modified"]
+
+    response = requests.get(BREF_STATS_URL.format(season=season, info=info), headers=headers, timeout=REQUEST_TIMEOUT)
+
+    if response.status_code == 304:
+        print(f"{info}: not modified.")
+        return previous
+
+    response.raise_for_status()
+    response.encoding = "utf-8"
+
+    table = extract_table_markup(response.text, f"{info}_stats")
+
+    fingerprint = {
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified"),
+        "table_hash": hashlib.sha256(table.encode("utf-8")).hexdigest(),
+    }
+
+    print(f"{info}: {'unchanged' if fingerprint['table_hash'] == previous.get('table_hash') else 'changed'}.")
+
+    return fingerprint
+
+
+@task(
+    name="Score Snapshot",
+    description="Score the MVP candidates of the refreshed snapshot",
+    tags=["NBA", "Stats", "Scoring"],
+)
+def score_snapshot(snapshot_path: str) -> None:
+    """
+    Scores the MVP candidates of a snapshot with the promoted models
+    (machine_learning/get_scores.py), which writes the predictions to
+    `machine_learning/predictions/`. Runs in its own process, from the root of the repository.
+
+    Args:
+        snapshot_path (str): The S3 path of the snapshot.
+
+    Returns:
+        None
+
+    Raises:
+        subprocess.CalledProcessError: If the scoring fails.
+    """
+    subprocess.run([sys.executable, SCORES_SCRIPT, "--snapshot", snapshot_path], cwd=REPO_ROOT, check=True)
+
+    print(f"Scored {snapshot_path}.")
+
+
+#########################################################
+#                   FLOW DEFINITION                     #
+#########################################################
+
+@flow(name="StatsRefresh", flow_run_name=flow_run_name_generator, log_prints=True)
+def refresh_current_season(season: str = CURRENT_SEASON, force: bool = False, db_sink: bool = False, score: bool = True) -> bool:
+    """
+    Polls basketball-reference.com for changes in the current season stats and runs the
+    StatsScraper flow, then the scoring of the MVP candidates, only when they changed.
+    The snapshot it writes to S3 then triggers the database load. Meant to be scheduled
+    every few minutes during game nights.
+
+    Each refresh rewrites the snapshot of the day, and its rows replace the earlier rows
+    of the day in the database (see tasks.pg_copy.delete_replaced_snapshots), so the
+    table keeps one snapshot per day however often the stats change.
+
+    Args:
+        season (str): The season to poll. Format: "YYYY", e.g. "2024" for season 2023-24.
+        force (bool): Whether to run the StatsScraper flow even if nothing changed.
+        db_sink (bool): Whether the StatsScraper flow loads the snapshot into the database directly.
+        score (bool): Whether to score the refreshed snapshot (see score_snapshot).
+
+    Returns:
+        bool: Whether the StatsScraper flow ran.
+    """
+    manifest = read_manifest(FINGERPRINTS_PATH)
+    previous = manifest.get(season, {})
+
+    # Fingerprint each stats page
+    fingerprints = {info: get_page_fingerprint(season, info, previous.get(info, {})) for info in STATS_INFO}
+
+    changed = [info for info in STATS_INFO if fingerprints[info].get("table_hash") != previous.get(info, {}).get("table_hash")]
+
+    if not changed and not force:
+        print("Stats did not change since the last poll.")
+        return False
+
+    print(f"Stats changed ({changed}), refreshing the season snapshot...")
+
+    # Cached pages from an earlier run today would be stale
+    with refresh_cache():
+        scrap_current_season_stats(season=season, db_sink=db_sink)
+
+    if score:
+        score_snapshot(f"s3://{BUCKET_NAME}/data/raw/players/{CURRENT_DAY.strftime('%Y_%m_%d')}.parquet")
+
+    # Only record the new fingerprints once the snapshot is written and scored, so a
+    # failed run is retried by the next poll
+    manifest[season] = fingerprints
+    write_manifest(manifest, FINGERPRINTS_PATH)
+
+    return True
+
+
+#########################################################
+#                       MAIN                            #
+#########################################################
+
+if __name__ == "__main__":
+    with profile_run("stats_refresh"):
+        refresh_current_season(season=CURRENT_SEASON)
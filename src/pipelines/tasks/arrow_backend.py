@@ -0,0 +1,165 @@
+#########################################################
+#                IMPORT LIBRARIES                       #
+#########################################################
+
+import os
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+import awswrangler as wr
+from pyarrow import fs
+from typing import List, Optional
+
+
+#########################################################
+#                 GLOBAL VARIABLES                      #
+#########################################################
+
+# NBA_ARROW_BACKEND=1 keeps the frames Arrow-backed (`pd.ArrowDtype` columns) from the
+# extraction to the Parquet write, and reads Parquet straight into Arrow-backed frames.
+# Read at call time, the default is the NumPy-backed path through awswrangler.
+ARROW_BACKEND_ENV = "NBA_ARROW_BACKEND"
+
+# Arrow type of each data type of `tasks.data_types`
+ARROW_TYPES = {
+    "string": pa.string(),
+    "float64": pa.float64(),
+    "int64": pa.int64(),
+    "int32": pa.int32(),
+    "bool": pa.bool_(),
+    "datetime64[ns]": pa.timestamp("ns"),
+}
+
+
+#########################################################
+#                 HELPER FUNCTIONS                      #
+#########################################################
+
+def arrow_backend_enabled() -> bool:
+    """
+    Whether the Arrow backend is enabled (see ARROW_BACKEND_ENV).
+
+    Returns:
+        bool: True if NBA_ARROW_BACKEND is set to 1, true or yes.
+    """
+    return os.environ.get(ARROW_BACKEND_ENV, "0").strip().lower() in ("1", "true", "yes")
+
+
+def arrow_dtype(data_type: str) -> pd.ArrowDtype:
+    """
+    Maps a data type of `tasks.data_types` to its Arrow-backed pandas dtype.
+
+    Args:
+        data_type (str): The data type (e.g., "float64").
+
+    Returns:
+        pd.ArrowDtype: The Arrow-backed dtype (e.g., "double[pyarrow]").
+
+    Raises:
+        ValueError: If the data type has no Arrow equivalent.
+    """
+    if data_type not in ARROW_TYPES:
+        raise ValueError(f"No Arrow type for '{data_type}'. Available types: {list(ARROW_TYPES)}")
+    return pd.ArrowDtype(ARROW_TYPES[data_type])
+
+
+def to_arrow_table(df: pd.DataFrame) -> pa.Table:
+    """
+    Converts a DataFrame to an Arrow table. The buffers of Arrow-backed columns are reused.
+
+    Args:
+        df (pd.DataFrame): The DataFrame.
+
+    Returns:
+        pa.Table: The table, without the index.
+    """
+    return pa.Table.from_pandas(df, preserve_index=False)
+
+
+def from_arrow_table(table: pa.Table) -> pd.DataFrame:
+    """
+    Converts an Arrow table to a DataFrame of Arrow-backed columns, without copying the buffers.
+
+    Args:
+        table (pa.Table): The table.
+
+    Returns:
+        pd.DataFrame: The DataFrame.
+    """
+    return table.to_pandas(types_mapper=pd.ArrowDtype)
+
+
+#########################################################
+#                  READ/WRITE PARQUET                   #
+#########################################################
+
+def read_parquet(path: str, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Reads a Parquet file from S3 (or a local path). With the Arrow backend the file is read
+    by pyarrow into Arrow-backed columns, otherwise through awswrangler.
+
+    Args:
+        path (str): The path of the Parquet file.
+        columns (List[str], optional): The columns to read, all of them by default.
+
+    Returns:
+        pd.DataFrame: The DataFrame.
+    """
+    if not arrow_backend_enabled():
+        return wr.s3.read_parquet(path, columns=columns)
+
+    filesystem, file_path = fs.FileSystem.from_uri(path)
+    return from_arrow_table(pq.read_table(file_path, columns=columns, filesystem=filesystem))
+
+
+def write_parquet(df: pd.DataFrame, path: str) -> None:
+    """
+    Writes a DataFrame to a Parquet file in S3 (or a local path). With the Arrow backend the
+    Arrow-backed columns are written by pyarrow as they are, otherwise through awswrangler.
+
+    Args:
+        df (pd.DataFrame): The DataFrame.
+        path (str): The path of the Parquet file.
+
+    Returns:
+        None
+    """
+    if not arrow_backend_enabled():
+        wr.s3.to_parquet(df=df, path=path)
+        return
+
+    filesystem, file_path = fs.FileSystem.from_uri(path)
+    pq.write_table(to_arrow_table(df), file_path, filesystem=filesystem)
+
+
+def write_partitioned(df: pd.DataFrame, path: str, partition_cols: List[str]) -> None:
+    """
+    Writes a DataFrame to a hive-partitioned Parquet dataset. Only the partitions present in
+    the DataFrame are replaced, the others are kept.
+
+    Args:
+        df (pd.DataFrame): The DataFrame.
+        path (str): The root path of the dataset.
+        partition_cols (List[str]): The partition columns.
+
+    Returns:
+        None
+    """
+    if not arrow_backend_enabled():
+        wr.s3.to_parquet(df=df, path=path, dataset=True, partition_cols=partition_cols, mode="overwrite_partitions")
+        return
+
+    table = to_arrow_table(df)
+    filesystem, root = fs.FileSystem.from_uri(path)
+
+    ds.write_dataset(
+        table,
+        root.rstrip("/"),
+        filesystem=filesystem,
+        format="parquet",
+        partitioning=ds.partitioning(table.select(partition_cols).schema, flavor="hive"),
+        existing_data_behavior="delete_matching",
+        basename_template="part-{i}.parquet",
+    )
+
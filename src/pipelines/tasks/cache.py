@@ -0,0 +1,353 @@
+#########################################################
+#                IMPORT LIBRARIES                       #
+#########################################################
+
+import contextlib
+import functools
+import hashlib
+import inspect
+import os
+import pickle
+import time
+import uuid
+import numpy as np
+import pandas as pd
+from datetime import timedelta
+from tasks.manifest import hash_dataframe
+
+
+#########################################################
+#                 GLOBAL VARIABLES                      #
+#########################################################
+
+# Cache settings, all of them can be overridden with environment variables
+CACHE_DIR          = os.environ.get("NBA_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "nba-mvp-pipeline"))
+CACHE_MAX_BYTES    = int(os.environ.get("NBA_CACHE_MAX_BYTES", 2 * 1024**3))  # 2 GB
+CACHE_EXPIRATION   = timedelta(hours=float(os.environ.get("NBA_CACHE_EXPIRATION_HOURS", 12)))
+
+# Switches read at call time: NBA_CACHE_DISABLED=1 skips the cache entirely,
+# NBA_CACHE_REFRESH=1 ignores cached results but still stores fresh ones
+DISABLED_ENV = "NBA_CACHE_DISABLED"
+REFRESH_ENV  = "NBA_CACHE_REFRESH"
+
+# Modules under this directory are hashed into the code version of the tasks using them
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Constants referenced by a task are hashed by value (e.g., a column name imported from another module)
+CONSTANT_TYPES = (str, int, float, bool, tuple, list, dict, frozenset, set, type(None))
+
+
+#########################################################
+#                 HELPER FUNCTIONS                      #
+#########################################################
+
+def _env_flag(name: str) -> bool:
+    return os.environ.get(name, "0").strip().lower() in ("1", "true", "yes")
+
+
+def hash_value(value) -> str:
+    """
+    Hashes a task input. DataFrames, Series and arrays are hashed by content (their repr
+    elides the middle of large values), containers element by element.
+
+    Args:
+        value: The value to hash.
+
+    Returns:
+        str: The SHA-256 hex digest of the value.
+    """
+    if isinstance(value, pd.DataFrame):
+        schema = repr([(str(column), str(dtype)) for column, dtype in value.dtypes.items()])
+        content = hash_dataframe(value) + schema
+    elif isinstance(value, (pd.Series, pd.Index)):
+        row_hashes = pd.util.hash_pandas_object(value, index=isinstance(value, pd.Series)).values
+        content = hashlib.sha256(row_hashes.tobytes()).hexdigest() + repr((type(value).__name__, value.name, str(value.dtype)))
+    elif isinstance(value, np.ndarray):
+        # Object arrays hold pointers: hash their values instead of their bytes
+        data = pd.util.hash_array(value.ravel()).tobytes() if value.dtype == object else np.ascontiguousarray(value).tobytes()
+        content = hashlib.sha256(data).hexdigest() + repr((value.shape, str(value.dtype)))
+    elif isinstance(value, (list, tuple)):
+        content = type(value).__name__ + "".join(hash_value(item) for item in value)
+    elif isinstance(value, dict):
+        content = "".join(f"{key!r}:{hash_value(item)}" for key, item in sorted(value.items(), key=lambda kv: repr(kv[0])))
+    else:
+        content = repr(value)
+
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def _referenced_names(code) -> set:
+    # Global names used by a code object and the functions, lambdas and comprehensions inside it
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if inspect.iscode(const):
+            names |= _referenced_names(const)
+    return names
+
+
+def _project_module(value):
+    # The module of this project a function, class or module comes from (None for libraries)
+    module = value if inspect.ismodule(value) else inspect.getmodule(value)
+    path = getattr(module, "__file__", None)
+
+    if path and os.path.abspath(path).startswith(PROJECT_DIR + os.sep):
+        return module
+    return None
+
+
+def dependency_modules(fn) -> list:
+    """
+    Finds the modules of this project a function depends on: the modules of the
+    functions, classes and modules it references, and the ones those modules use in turn.
+
+    Args:
+        fn (callable): The function.
+
+    Returns:
+        List[module]: The modules, sorted by name.
+    """
+    pending = [fn.__globals__[name] for name in _referenced_names(fn.__code__) if name in fn.__globals__]
+    modules = {}
+
+    while pending:
+        value = pending.pop()
+        if not (inspect.ismodule(value) or inspect.isfunction(value) or inspect.isclass(value)):
+            continue
+
+        module = _project_module(value)
+        if module is None or module.__name__ in modules:
+            continue
+
+        modules[module.__name__] = module
+        pending.extend(vars(module).values())
+
+    return [modules[name] for name in sorted(modules)]
+
+
+def code_version(fn) -> str:
+    """
+    Computes the version of a function's code, so that editing a task invalidates its cache.
+    Besides the function itself, the modules of this project it depends on (e.g., the
+    helpers it calls and their constants) and the constants it references are hashed,
+    so editing a helper invalidates the cache of the tasks calling it too.
+
+    Args:
+        fn (callable): The function.
+
+    Returns:
+        str: The SHA-256 hex digest of the function source and its dependencies.
+    """
+    digest = hashlib.sha256(inspect.getsource(fn).encode("utf-8"))
+
+    for module in dependency_modules(fn):
+        digest.update(inspect.getsource(module).encode("utf-8"))
+
+    for name in sorted(_referenced_names(fn.__code__)):
+        value = fn.__globals__.get(name)
+        if isinstance(value, CONSTANT_TYPES) and name in fn.__globals__:
+            digest.update(f"{name}={value!r}".encode("utf-8"))
+
+    return digest.hexdigest()
+
+
+def cache_key(fn, args, kwargs, version: str) -> str:
+    """
+    Builds the cache key of a call from the task name, its inputs and its code version.
+
+    Args:
+        fn (callable): The function being called.
+        args (tuple): Positional arguments of the call.
+        kwargs (dict): Keyword arguments of the call.
+        version (str): The code version of the function (see code_version).
+
+    Returns:
+        str: The cache key.
+    """
+    bound = inspect.signature(fn).bind(*args, **kwargs)
+    bound.apply_defaults()
+
+    inputs = hash_value(dict(bound.arguments))
+    content = f"{fn.__module__}.{fn.__qualname__}|{inputs}|{version}"
+
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+#########################################################
+#                  CACHE STORAGE                        #
+#########################################################
+
+def _entry_paths(key: str):
+    base = os.path.join(CACHE_DIR, key)
+    return f"{base}.parquet", f"{base}.pkl"
+
+
+def read_entry(key: str, expiration: timedelta):
+    """
+    Reads a cached result if it exists and has not expired.
+
+    Args:
+        key (str): The cache key.
+        expiration (timedelta): How long results stay valid after being written.
+
+    Returns:
+        tuple: Whether the entry was found and the cached result.
+    """
+    for path in _entry_paths(key):
+        if not os.path.exists(path):
+            continue
+
+        written_at = os.path.getmtime(path)
+
+        if time.time() - written_at > expiration.total_seconds():
+            os.remove(path)
+            return False, None
+
+        # Record the access time for LRU eviction, keep the write time for expiration
+        os.utime(path, (time.time(), written_at))
+
+        if path.endswith(".parquet"):
+            return True, pd.read_parquet(path)
+        with open(path, "rb") as file:
+            return True, pickle.load(file)
+
+    return False, None
+
+
+def write_entry(key: str, result) -> None:
+    """
+    Stores a result in the cache: DataFrames as Parquet, anything else pickled.
+
+    Args:
+        key (str): The cache key.
+        result: The result to store.
+
+    Returns:
+        None
+    """
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    parquet_path, pickle_path = _entry_paths(key)
+
+    path = parquet_path if isinstance(result, pd.DataFrame) else pickle_path
+
+    # Unique per writer: concurrent tasks computing the same entry do not share a file
+    tmp_path = f"{path}.{os.getpid()}.{uuid.uuid4().hex}.tmp"
+
+    try:
+        if isinstance(result, pd.DataFrame):
+            result.to_parquet(tmp_path)
+        else:
+            with open(tmp_path, "wb") as file:
+                pickle.dump(result, file)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    # Readers never see a partially written entry
+    os.replace(tmp_path, path)
+
+
+def evict(max_bytes: int = CACHE_MAX_BYTES) -> None:
+    """
+    Removes the least recently used entries until the cache fits in `max_bytes`.
+
+    Args:
+        max_bytes (int): The maximum size of the cache directory.
+
+    Returns:
+        None
+    """
+    if not os.path.isdir(CACHE_DIR):
+        return
+
+    entries = []
+    for entry in os.scandir(CACHE_DIR):
+        if entry.is_file() and not entry.name.endswith(".tmp"):
+            stat = entry.stat()
+            entries.append((stat.st_atime, stat.st_size, entry.path))
+
+    total_bytes = sum(size for _, size, _ in entries)
+
+    for _, size, path in sorted(entries):
+        if total_bytes <= max_bytes:
+            break
+        os.remove(path)
+        total_bytes -= size
+
+
+@contextlib.contextmanager
+def refresh_cache():
+    """
+    Ignores cached results (and stores fresh ones) for the calls made inside the block,
+    as NBA_CACHE_REFRESH=1 does. The previous value of the switch is restored on exit, so
+    later tasks of the same process use the cache again.
+
+    Yields:
+        None
+    """
+    previous = os.environ.get(REFRESH_ENV)
+    os.environ[REFRESH_ENV] = "1"
+    try:
+        yield
+    finally:
+        if previous is None:
+            os.environ.pop(REFRESH_ENV, None)
+        else:
+            os.environ[REFRESH_ENV] = previous
+
+
+#########################################################
+#                  CACHE DECORATOR                      #
+#########################################################
+
+def cached(expiration: timedelta = CACHE_EXPIRATION):
+    """
+    Caches the results of a task on local disk, keyed on the task name, a hash of its
+    inputs and a hash of its code and of the project modules it depends on (see
+    code_version). Apply it below `@task`. The cache is best-effort: a call whose inputs
+    cannot be hashed or whose result cannot be stored runs or returns uncached.
+
+    Args:
+        expiration (timedelta): How long results stay valid after being written.
+
+    Returns:
+        callable: The decorator.
+    """
+    def decorator(fn):
+        # Computed on the first call, once the modules it depends on are imported
+        versions = []
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if _env_flag(DISABLED_ENV):
+                return fn(*args, **kwargs)
+
+            try:
+                if not versions:
+                    versions.append(code_version(fn))
+                key = cache_key(fn, args, kwargs, versions[0])
+            except Exception as e:
+                print(f"Could not compute the cache key of {fn.__name__}, running it uncached: {e}")
+                return fn(*args, **kwargs)
+
+            if not _env_flag(REFRESH_ENV):
+                found, result = read_entry(key, expiration)
+                if found:
+                    print(f"Using cached result of {fn.__name__} ({key[:12]}).")
+                    return result
+
+            result = fn(*args, **kwargs)
+
+            # The cache is best-effort: a failed write (e.g., unsupported dtype, full disk)
+            # must not fail the task
+            try:
+                write_entry(key, result)
+                evict()
+            except Exception as e:
+                print(f"Could not cache the result of {fn.__name__} ({key[:12]}): {e}")
+
+            return result
+
+        return wrapper
+
+    return decorator
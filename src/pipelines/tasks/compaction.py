@@ -0,0 +1,356 @@
+#########################################################
+#                IMPORT LIBRARIES                       #
+#########################################################
+
+import json
+import re
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+from datetime import date, datetime
+from pyarrow import fs
+from typing import Dict, List, Tuple
+
+
+#########################################################
+#                 GLOBAL VARIABLES                      #
+#########################################################
+
+# Daily snapshots written by the StatsScraper flow, one `{YYYY_MM_DD}.parquet` per day
+DAILY_PREFIX = "data/raw/players"
+
+# Compacted snapshots, `season={season}/{run_id}/part-{i}.parquet`. Only the files listed
+# in the manifest are live: files of a run being written are not listed yet.
+COMPACTED_PREFIX = "data/compacted/players"
+COMPACTION_MANIFEST = f"{COMPACTED_PREFIX}/_manifest.json"
+MANIFEST_VERSION = 1
+
+# Rows are sorted so that readers filtering on a date or a player skip row groups
+SORT_KEYS = ["snapshot_date", "Player", "Tm"]
+ROW_GROUP_ROWS = 64 * 1024
+FILE_ROWS = 1024 * 1024
+
+DAILY_FILE_NAME = re.compile(r"^(\d{4}_\d{2}_\d{2})\.parquet$")
+
+
+#########################################################
+#                 HELPER FUNCTIONS                      #
+#########################################################
+
+def resolve_root(root: str) -> Tuple[fs.FileSystem, str]:
+    """
+    Resolves the root of the lake into a filesystem and a base path.
+
+    Args:
+        root (str): An S3 bucket path ("s3://bucket") or a local directory.
+
+    Returns:
+        tuple: The pyarrow filesystem and the base path in it.
+    """
+    filesystem, base = fs.FileSystem.from_uri(root) if "://" in root else (fs.LocalFileSystem(), root)
+    return filesystem, base.rstrip("/")
+
+
+def resolve_path(root: str, path: str) -> str:
+    """
+    Resolves a path relative to the root of the lake, as stored in the manifest.
+
+    Args:
+        root (str): The root of the lake.
+        path (str): The path relative to the root (e.g., "data/raw/players/2024_01_01.parquet").
+
+    Returns:
+        str: The path under the root (e.g., "s3://bucket/data/raw/players/2024_01_01.parquet").
+    """
+    return f"{root.rstrip('/')}/{path}"
+
+
+def relative_path(base: str, path: str) -> str:
+    """
+    Turns a path of the filesystem of `resolve_root` into a path relative to the root.
+    Relative paths keep the manifest valid on a local mirror of the bucket.
+
+    Args:
+        base (str): The base path of `resolve_root`.
+        path (str): The path in the filesystem (e.g., "bucket/data/raw/players/2024_01_01.parquet").
+
+    Returns:
+        str: The path relative to the root (e.g., "data/raw/players/2024_01_01.parquet").
+    """
+    return path[len(base):].lstrip("/")
+
+
+def snapshot_day(path: str) -> date:
+    """
+    Parses the day of a daily snapshot from its file name.
+
+    Args:
+        path (str): The path of the daily snapshot.
+
+    Returns:
+        date: The day, or None if the file is not a daily snapshot.
+    """
+    match = DAILY_FILE_NAME.match(path.rsplit("/", 1)[-1])
+    return datetime.strptime(match.group(1), "%Y_%m_%d").date() if match else None
+
+
+#########################################################
+#                      MANIFEST                         #
+#########################################################
+
+def read_compaction_manifest(root: str) -> dict:
+    """
+    Reads the manifest of the compacted snapshots.
+
+    Args:
+        root (str): The root of the lake.
+
+    Returns:
+        dict: The manifest, or an empty dictionary if nothing was compacted yet.
+    """
+    filesystem, base = resolve_root(root)
+
+    try:
+        with filesystem.open_input_stream(f"{base}/{COMPACTION_MANIFEST}") as stream:
+            return json.loads(stream.read())
+    except FileNotFoundError:
+        return {}
+
+
+def write_compaction_manifest(manifest: dict, root: str) -> None:
+    """
+    Writes the manifest of the compacted snapshots. The object is replaced as a whole, so
+    readers see either the previous or the new set of files.
+
+    Args:
+        manifest (dict): The manifest.
+        root (str): The root of the lake.
+
+    Returns:
+        None
+    """
+    filesystem, base = resolve_root(root)
+    path = f"{base}/{COMPACTION_MANIFEST}"
+
+    # S3 objects only appear once complete, local manifests are renamed into place
+    if root.startswith("s3://"):
+        tmp_path = path
+    else:
+        filesystem.create_dir(f"{base}/{COMPACTED_PREFIX}", recursive=True)
+        tmp_path = f"{path}.tmp"
+
+    with filesystem.open_output_stream(tmp_path) as stream:
+        stream.write(json.dumps(manifest, indent=2, sort_keys=True).encode("utf-8"))
+
+    if tmp_path != path:
+        filesystem.move(tmp_path, path)
+
+    print(f"Compaction manifest written to {resolve_path(root, COMPACTION_MANIFEST)}.")
+
+
+#########################################################
+#                     LIVE FILES                        #
+#########################################################
+
+def list_daily_files(root: str) -> List[str]:
+    """
+    Lists the daily snapshot files.
+
+    Args:
+        root (str): The root of the lake.
+
+    Returns:
+        List[str]: The paths of the daily snapshots relative to the root, in day order.
+    """
+    filesystem, base = resolve_root(root)
+    infos = filesystem.get_file_info(fs.FileSelector(f"{base}/{DAILY_PREFIX}", allow_not_found=True))
+
+    return sorted(relative_path(base, info.path) for info in infos if info.is_file and snapshot_day(info.path))
+
+
+def compacted_files(manifest: dict) -> List[str]:
+    """
+    Lists the live compacted files of a manifest.
+
+    Args:
+        manifest (dict): The compaction manifest.
+
+    Returns:
+        List[str]: The paths of the compacted files relative to the root.
+    """
+    return [path for season in sorted(manifest.get("seasons", {})) for path in manifest["seasons"][season]["files"]]
+
+
+def compacted_sources(manifest: dict) -> set:
+    """
+    Lists the daily snapshots already merged into compacted files.
+
+    Args:
+        manifest (dict): The compaction manifest.
+
+    Returns:
+        set: The paths of the daily snapshots relative to the root.
+    """
+    return {path for entry in manifest.get("seasons", {}).values() for path in entry["sources"]}
+
+
+def live_snapshot_files(root: str) -> List[str]:
+    """
+    Lists the files that hold every daily snapshot exactly once: the compacted files of the
+    manifest, and the daily files not compacted yet.
+
+    Args:
+        root (str): The root of the lake.
+
+    Returns:
+        List[str]: The paths of the files under the root.
+    """
+    manifest = read_compaction_manifest(root)
+    sources = compacted_sources(manifest)
+
+    paths = compacted_files(manifest) + [path for path in list_daily_files(root) if path not in sources]
+
+    return [resolve_path(root, path) for path in paths]
+
+
+#########################################################
+#                     COMPACTION                        #
+#########################################################
+
+def read_snapshots_by_season(paths: List[str], root: str) -> Dict[str, Tuple[List[pa.Table], List[str]]]:
+    """
+    Reads snapshot files and groups them by the season of their rows.
+
+    Args:
+        paths (List[str]): The paths of the files relative to the root.
+        root (str): The root of the lake.
+
+    Returns:
+        dict: The tables and the paths of the files of each season.
+    """
+    filesystem, base = resolve_root(root)
+    seasons = {}
+
+    for path in paths:
+        table = ds.dataset(f"{base}/{path}", format="parquet", filesystem=filesystem).to_table()
+
+        for season in pc.unique(table.column("season")).to_pylist():
+            tables, files = seasons.setdefault(season, ([], []))
+            tables.append(table.filter(pc.equal(table.column("season"), season)))
+            files.append(path)
+
+    return seasons
+
+
+def unified_schema(tables: List[pa.Table]) -> pa.Schema:
+    """
+    Unifies the schemas of daily snapshots whose column types differ from one day to
+    another (e.g., int64 and double for a stat that was null on some days). Integers of
+    different widths are widened to int64, integers and floats to double, all-null
+    columns take the type of the other days and other conflicts fall back to string.
+
+    Args:
+        tables (List[pa.Table]): The snapshots.
+
+    Returns:
+        pa.Schema: The schema, with the columns in order of appearance.
+    """
+    types = {}
+    for table in tables:
+        for field in table.schema:
+            types.setdefault(field.name, []).append(field.type)
+
+    fields = []
+    for name, column_types in types.items():
+        distinct = {column_type for column_type in column_types if not pa.types.is_null(column_type)}
+
+        if not distinct:
+            column_type = pa.null()
+        elif len(distinct) == 1:
+            column_type = distinct.pop()
+        elif all(pa.types.is_integer(column_type) for column_type in distinct):
+            column_type = pa.int64()
+        elif all(pa.types.is_integer(column_type) or pa.types.is_floating(column_type) for column_type in distinct):
+            column_type = pa.float64()
+        else:
+            column_type = pa.string()
+
+        fields.append(pa.field(name, column_type))
+
+    return pa.schema(fields)
+
+
+def cast_to_schema(table: pa.Table, schema: pa.Schema) -> pa.Table:
+    """
+    Casts a table to a schema, filling the columns it does not have with nulls.
+
+    Args:
+        table (pa.Table): The table.
+        schema (pa.Schema): The schema (see unified_schema).
+
+    Returns:
+        pa.Table: The table with the columns and types of the schema.
+    """
+    columns = [
+        table.column(field.name).cast(field.type) if field.name in table.column_names
+        else pa.nulls(table.num_rows, field.type)
+        for field in schema
+    ]
+    return pa.Table.from_arrays(columns, schema=schema)
+
+
+def write_compacted_season(tables: List[pa.Table], season: str, run_id: str, root: str) -> List[str]:
+    """
+    Merges the snapshots of a season into a few large files, sorted by SORT_KEYS, under a
+    new run directory. The files are not live until they are listed in the manifest.
+
+    Args:
+        tables (List[pa.Table]): The snapshots of the season, cast to one schema (see unified_schema).
+        season (str): The season (e.g., "2023-24").
+        run_id (str): The identifier of the compaction run.
+        root (str): The root of the lake.
+
+    Returns:
+        List[str]: The paths of the written files relative to the root.
+    """
+    filesystem, base = resolve_root(root)
+
+    schema = unified_schema(tables)
+    table = pa.concat_tables([cast_to_schema(table, schema) for table in tables])
+    table = table.sort_by([(key, "ascending") for key in SORT_KEYS if key in table.column_names])
+
+    written = []
+    ds.write_dataset(
+        table,
+        f"{base}/{COMPACTED_PREFIX}/season={season}/{run_id}",
+        filesystem=filesystem,
+        format="parquet",
+        basename_template="part-{i}.parquet",
+        max_rows_per_group=ROW_GROUP_ROWS,
+        min_rows_per_group=ROW_GROUP_ROWS,
+        max_rows_per_file=FILE_ROWS,
+        existing_data_behavior="error",
+        file_visitor=lambda file: written.append(relative_path(base, file.path)),
+    )
+
+    return sorted(written)
+
+
+def delete_files(paths: List[str], root: str) -> None:
+    """
+    Deletes files under the root. Missing files are ignored.
+
+    Args:
+        paths (List[str]): The paths of the files relative to the root.
+        root (str): The root of the lake.
+
+    Returns:
+        None
+    """
+    filesystem, base = resolve_root(root)
+
+    for path in paths:
+        try:
+            filesystem.delete_file(f"{base}/{path}")
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,294 @@
+#########################################################
+#                IMPORT LIBRARIES                       #
+#########################################################
+
+import pandas as pd
+from prefect import task
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from tasks.data_types import data_types
+from tasks.html_tables import SLUG_COLUMN
+
+
+#########################################################
+#                 GLOBAL VARIABLES                      #
+#########################################################
+
+DB_SCHEMA = "public"
+DB_TABLE  = "nba_stats"
+
+# Postgres type of each pandas data type
+PG_TYPES = {
+    "string": "text",
+    "float64": "double precision",
+    "int64": "bigint",
+    "int32": "integer",
+    "bool": "boolean",
+    "datetime64[ns]": "timestamp",
+    # Arrow-backed dtypes (see `tasks.arrow_backend`)
+    "string[pyarrow]": "text",
+    "double[pyarrow]": "double precision",
+    "int64[pyarrow]": "bigint",
+    "int32[pyarrow]": "integer",
+    "bool[pyarrow]": "boolean",
+    "timestamp[ns][pyarrow]": "timestamp",
+}
+
+# Columns of the snapshots left out of `data_types`, whose null filling would turn a
+# missing player slug into "0"
+UNTYPED_COLUMNS = {SLUG_COLUMN: "text"}
+
+# One row per player, team and daily snapshot
+PRIMARY_KEY = ["season", "snapshot_date", "Player", "Tm"]
+
+INDEXES_DDL = f"""
+CREATE INDEX IF NOT EXISTS {DB_TABLE}_snapshot_date_brin ON {DB_SCHEMA}.{DB_TABLE} USING brin (snapshot_date);
+CREATE INDEX IF NOT EXISTS {DB_TABLE}_player_snapshot_idx ON {DB_SCHEMA}.{DB_TABLE} ("Player", snapshot_date);
+"""
+
+FUNCTIONS_DDL = f"""
+CREATE OR REPLACE FUNCTION {DB_SCHEMA}.{DB_TABLE}_ensure_partition(p_season text) RETURNS void AS $$
+BEGIN
+    EXECUTE format(
+        'CREATE TABLE IF NOT EXISTS {DB_SCHEMA}.%I PARTITION OF {DB_SCHEMA}.{DB_TABLE} FOR VALUES IN (%L)',
+        '{DB_TABLE}_' || replace(p_season, '-', '_'),
+        p_season
+    );
+END
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION {DB_SCHEMA}.{DB_TABLE}_refresh_views() RETURNS void AS $$
+BEGIN
+    REFRESH MATERIALIZED VIEW CONCURRENTLY {DB_SCHEMA}.{DB_TABLE}_latest;
+    REFRESH MATERIALIZED VIEW CONCURRENTLY {DB_SCHEMA}.{DB_TABLE}_leaderboard;
+END
+$$ LANGUAGE plpgsql;
+"""
+
+# Concurrent refreshes need a unique index on each materialized view
+VIEWS_DDL = f"""
+CREATE MATERIALIZED VIEW IF NOT EXISTS {DB_SCHEMA}.{DB_TABLE}_latest AS
+SELECT stats.*
+FROM {DB_SCHEMA}.{DB_TABLE} AS stats
+JOIN (
+    SELECT season, max(snapshot_date) AS snapshot_date
+    FROM {DB_SCHEMA}.{DB_TABLE}
+    GROUP BY season
+) AS latest USING (season, snapshot_date);
+
+CREATE UNIQUE INDEX IF NOT EXISTS {DB_TABLE}_latest_key ON {DB_SCHEMA}.{DB_TABLE}_latest (season, "Player", "Tm");
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS {DB_SCHEMA}.{DB_TABLE}_leaderboard AS
+WITH players AS (
+    -- Traded players are ranked on their combined (TOT) row only
+    SELECT *, count(*) OVER (PARTITION BY season, "Player") AS n_rows
+    FROM {DB_SCHEMA}.{DB_TABLE}_latest
+)
+SELECT
+    season, snapshot_date, "Player", "Tm", "G_advanced", "PTS_per_game", "TRB_per_game", "AST_per_game",
+    "PER_advanced", "WS_advanced", "WS/48_advanced", "BPM_advanced", "VORP_advanced", "W/L%_team",
+    rank() OVER (PARTITION BY season ORDER BY "PTS_per_game" DESC) AS pts_rank,
+    rank() OVER (PARTITION BY season ORDER BY "PER_advanced" DESC) AS per_rank,
+    rank() OVER (PARTITION BY season ORDER BY "WS_advanced" DESC) AS ws_rank,
+    rank() OVER (PARTITION BY season ORDER BY "BPM_advanced" DESC) AS bpm_rank,
+    rank() OVER (PARTITION BY season ORDER BY "VORP_advanced" DESC) AS vorp_rank
+FROM players
+WHERE n_rows = 1 OR "Tm" = 'TOT';
+
+CREATE UNIQUE INDEX IF NOT EXISTS {DB_TABLE}_leaderboard_key ON {DB_SCHEMA}.{DB_TABLE}_leaderboard (season, "Player", "Tm");
+"""
+
+
+#########################################################
+#                 HELPER FUNCTIONS                      #
+#########################################################
+
+def quote_identifier(name: str) -> str:
+    """
+    Quotes a column name for Postgres (e.g., W/L%_team -> "W/L%_team").
+
+    Args:
+        name (str): The column name.
+
+    Returns:
+        str: The quoted column name.
+    """
+    return '"' + name.replace('"', '""') + '"'
+
+
+def build_table_ddl(column_data_types: dict) -> str:
+    """
+    Builds the CREATE TABLE statement of the stats table, partitioned by season.
+
+    Args:
+        column_data_types (dict): A dictionary mapping column names to their pandas data types.
+
+    Returns:
+        str: The DDL statement.
+    """
+    columns = ",\n".join(
+        f"    {quote_identifier(column)} {PG_TYPES[data_type]}"
+        for column, data_type in column_data_types.items()
+    )
+    primary_key = ", ".join(quote_identifier(column) for column in PRIMARY_KEY)
+
+    return (
+        f"CREATE TABLE IF NOT EXISTS {DB_SCHEMA}.{DB_TABLE} (\n{columns},\n"
+        f"    PRIMARY KEY ({primary_key})\n) PARTITION BY LIST (season);"
+    )
+
+
+def table_columns(conn, table_name: str) -> dict:
+    """
+    Lists the columns of a table of the schema.
+
+    Args:
+        conn (sqlalchemy.engine.Connection): The database connection.
+        table_name (str): The table.
+
+    Returns:
+        dict: The Postgres type of each column, in column order.
+    """
+    return {
+        row[0]: row[1] for row in conn.execute(
+            text(
+                "SELECT column_name, data_type FROM information_schema.columns "
+                "WHERE table_schema = :schema AND table_name = :table ORDER BY ordinal_position"
+            ),
+            {"schema": DB_SCHEMA, "table": table_name},
+        )
+    }
+
+
+def add_missing_columns(conn, columns: dict) -> None:
+    """
+    Adds the columns the stats table does not have yet.
+
+    Args:
+        conn (sqlalchemy.engine.Connection): The database connection.
+        columns (dict): The Postgres type of each column.
+
+    Returns:
+        None
+    """
+    existing_columns = table_columns(conn, DB_TABLE)
+
+    for column, pg_type in columns.items():
+        if column not in existing_columns:
+            conn.execute(text(
+                f"ALTER TABLE {DB_SCHEMA}.{DB_TABLE} ADD COLUMN IF NOT EXISTS {quote_identifier(column)} {pg_type}"
+            ))
+            print(f"Added column '{column}' ({pg_type}).")
+
+
+def _migrate_unpartitioned_table(conn) -> None:
+    # Tables created by `to_sql` are plain heaps: move their rows into the partitioned table
+    relkind = conn.execute(
+        text("SELECT relkind FROM pg_class WHERE oid = to_regclass(:table)"),
+        {"table": f"{DB_SCHEMA}.{DB_TABLE}"},
+    ).scalar()
+
+    if relkind != "r":
+        return
+
+    legacy_table = f"{DB_TABLE}_unpartitioned"
+    print(f"Migrating unpartitioned {DB_SCHEMA}.{DB_TABLE} into a partitioned table...")
+
+    conn.execute(text(f"ALTER TABLE {DB_SCHEMA}.{DB_TABLE} RENAME TO {legacy_table}"))
+    conn.execute(text(build_table_ddl(data_types)))
+    conn.execute(text(FUNCTIONS_DDL))
+    conn.execute(text(
+        f"SELECT {DB_SCHEMA}.{DB_TABLE}_ensure_partition(season) "
+        f"FROM (SELECT DISTINCT season FROM {DB_SCHEMA}.{legacy_table}) AS seasons"
+    ))
+
+    # Snapshots have columns that are not in `data_types` (e.g., extra standings columns)
+    legacy_columns = table_columns(conn, legacy_table)
+    add_missing_columns(conn, legacy_columns)
+
+    columns = ", ".join(quote_identifier(column) for column in legacy_columns)
+    conn.execute(text(
+        f"INSERT INTO {DB_SCHEMA}.{DB_TABLE} ({columns}) SELECT {columns} FROM {DB_SCHEMA}.{legacy_table} "
+        "ON CONFLICT DO NOTHING"
+    ))
+
+    print(f"Rows migrated, the old table is kept as {DB_SCHEMA}.{legacy_table}.")
+
+
+#########################################################
+#                  TASKS DEFINITION                     #
+#########################################################
+
+@task(
+    name="Apply Database Schema",
+    description="Create the partitioned stats table, its indexes and materialized views",
+    tags=["NBA", "Database", "Schema"]
+)
+def apply_schema(engine: Engine) -> None:
+    """
+    Creates the partitioned stats table, its indexes, helper functions and materialized
+    views. Every statement is idempotent, so this runs before each ingestion.
+
+    Args:
+        engine (Engine): The database engine.
+
+    Returns:
+        None
+    """
+    with engine.begin() as conn:
+        _migrate_unpartitioned_table(conn)
+        conn.execute(text(build_table_ddl(data_types)))
+        # Columns added after the table was created (e.g., player_slug)
+        add_missing_columns(conn, {**{column: PG_TYPES[data_type] for column, data_type in data_types.items()}, **UNTYPED_COLUMNS})
+        conn.execute(text(INDEXES_DDL))
+        conn.execute(text(FUNCTIONS_DDL))
+        conn.execute(text(VIEWS_DDL))
+
+    print(f"Schema of {DB_SCHEMA}.{DB_TABLE} is up to date.")
+
+
+@task(
+    name="Prepare Partitions",
+    description="Create the season partitions and any new columns needed by a DataFrame",
+    tags=["NBA", "Database", "Schema"]
+)
+def prepare_partitions(df: pd.DataFrame, engine: Engine) -> None:
+    """
+    Creates the partitions of the seasons in the DataFrame and adds the columns the
+    table does not have yet.
+
+    Args:
+        df (pd.DataFrame): The DataFrame about to be loaded.
+        engine (Engine): The database engine.
+
+    Returns:
+        None
+    """
+    with engine.begin() as conn:
+        add_missing_columns(conn, {column: PG_TYPES.get(str(dtype), "text") for column, dtype in df.dtypes.items()})
+
+        for season in df["season"].unique():
+            conn.execute(text(f"SELECT {DB_SCHEMA}.{DB_TABLE}_ensure_partition(:season)"), {"season": str(season)})
+            print(f"Partition for season {season} is ready.")
+
+
+@task(
+    name="Refresh Materialized Views",
+    description="Refresh the latest snapshot and leaderboard materialized views",
+    tags=["NBA", "Database"]
+)
+def refresh_views(engine: Engine) -> None:
+    """
+    Refreshes the latest snapshot and leaderboard materialized views concurrently,
+    so readers are never blocked.
+
+    Args:
+        engine (Engine): The database engine.
+
+    Returns:
+        None
+    """
+    with engine.begin() as conn:
+        conn.execute(text(f"SELECT {DB_SCHEMA}.{DB_TABLE}_refresh_views()"))
+
+    print("Materialized views refreshed.")
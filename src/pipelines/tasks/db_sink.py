@@ -0,0 +1,142 @@
+#########################################################
+#                IMPORT LIBRARIES                       #
+#########################################################
+
+import io
+import boto3
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from prefect import task
+from sqlalchemy.engine import Engine
+from tasks.arrow_backend import to_arrow_table
+from tasks.db_schema import DB_SCHEMA, DB_TABLE, prepare_partitions, refresh_views
+from tasks.manifest import split_s3_path
+from tasks.pg_copy import insert_arrow_table
+
+
+#########################################################
+#                 GLOBAL VARIABLES                      #
+#########################################################
+
+# S3 object metadata of the snapshots loaded into the database by the scraper.
+# The load_db Lambda skips them (see infrastructure/modules/lambda/load_db).
+DB_SINK_METADATA = {"db-sink": "direct"}
+
+
+#########################################################
+#                    SINK TASKS                         #
+#########################################################
+
+@task(
+    name="Write Snapshot to S3",
+    description="Save the Arrow table of the snapshot to S3 as parquet, flagged as loaded by the scraper.",
+    tags=["NBA", "S3", "Stats", "Ingestion"],
+)
+def write_snapshot_to_s3(table: pa.Table, s3_path: str) -> None:
+    """
+    Writes the snapshot to S3 as parquet, with the metadata that tells the load_db Lambda
+    the snapshot goes to the database directly.
+
+    Args:
+        table (pa.Table): The snapshot.
+        s3_path (str): The S3 path of the parquet file.
+
+    Returns:
+        None
+    """
+    buffer = io.BytesIO()
+    pq.write_table(table, buffer)
+
+    bucket, key = split_s3_path(s3_path)
+    boto3.client("s3").put_object(Bucket=bucket, Key=key, Body=buffer.getvalue(), Metadata=DB_SINK_METADATA)
+
+    print(f"Snapshot saved to {s3_path}.")
+
+
+@task(
+    name="Load Snapshot to Database",
+    description="Bulk-load the Arrow table of the snapshot into Postgres.",
+    tags=["NBA", "Postgres", "Stats", "Ingestion"],
+)
+def load_snapshot_to_db(df: pd.DataFrame, table: pa.Table, engine: Engine) -> None:
+    """
+    Loads the snapshot into the database: creates the season partitions and copies the
+    rows (skipping those already loaded). The rows replace the earlier snapshots of the
+    same day, so the intraday refreshes keep one snapshot per day. The materialized views
+    are refreshed separately, so this task only fails if the rows were not committed.
+
+    Args:
+        df (pd.DataFrame): The snapshot, for its columns and seasons.
+        table (pa.Table): The Arrow table of the snapshot.
+        engine (Engine): The database engine.
+
+    Returns:
+        None
+    """
+    prepare_partitions(df, engine)
+
+    inserted = insert_arrow_table(table, engine, DB_SCHEMA, DB_TABLE, replace_day=True)
+    print(f"{inserted} of {table.num_rows} rows loaded into {DB_SCHEMA}.{DB_TABLE}.")
+
+
+#########################################################
+#                 HELPER FUNCTIONS                      #
+#########################################################
+
+def release_to_s3_trigger(s3_path: str) -> None:
+    """
+    Removes the direct sink metadata of a snapshot. The copy of the object onto itself
+    fires the S3 event again, and the load_db Lambda loads it.
+
+    Args:
+        s3_path (str): The S3 path of the parquet file.
+
+    Returns:
+        None
+    """
+    bucket, key = split_s3_path(s3_path)
+
+    boto3.client("s3").copy_object(
+        Bucket=bucket,
+        Key=key,
+        CopySource={"Bucket": bucket, "Key": key},
+        Metadata={},
+        MetadataDirective="REPLACE",
+    )
+
+
+def sink_snapshot(df: pd.DataFrame, bucket_name: str, current_day: str, engine: Engine) -> None:
+    """
+    Fans the snapshot out to S3 and to the database concurrently, from the same Arrow
+    table, so the database does not wait for the S3 event and the Lambda does not
+    download and decode the file again. If the rows could not be loaded, the snapshot is
+    handed back to the S3-triggered load_db Lambda. Once they are committed, the
+    materialized views are refreshed; a failure there fails the flow but does not hand
+    the snapshot back, as the Lambda would load the rows twice. Must run inside a flow.
+
+    Args:
+        df (pd.DataFrame): The snapshot.
+        bucket_name (str): The S3 bucket name.
+        current_day (str): The current day for the parquet file.
+        engine (Engine): The database engine.
+
+    Returns:
+        None
+    """
+    s3_path = f"s3://{bucket_name}/data/raw/players/{current_day}.parquet"
+
+    # Converted once, both sinks read the same buffers
+    table = to_arrow_table(df)
+
+    s3_write = write_snapshot_to_s3.submit(table, s3_path)
+    db_load = load_snapshot_to_db.submit(df, table, engine)
+
+    s3_write.result()
+
+    if db_load.wait().is_failed():
+        print("Database load failed, falling back to the S3-triggered load_db Lambda.")
+        release_to_s3_trigger(s3_path)
+        return
+
+    refresh_views(engine)
@@ -0,0 +1,304 @@
+#########################################################
+#                IMPORT LIBRARIES                       #
+#########################################################
+
+import duckdb
+import pandas as pd
+import pyarrow as pa
+from typing import Dict, List
+from tasks.arrow_backend import ARROW_TYPES, arrow_backend_enabled, from_arrow_table
+from tasks.html_tables import SLUG_COLUMN
+from tasks.lake import configure_s3, quote_identifier
+from tasks.stints import MINUTES_COLUMN, STINT_KEYS, TOTAL_TEAM, team_columns
+
+
+#########################################################
+#                 GLOBAL VARIABLES                      #
+#########################################################
+
+# DuckDB type of each data type of `tasks.data_types`
+DUCKDB_TYPES = {
+    "string": "VARCHAR",
+    "float64": "DOUBLE",
+    "int64": "BIGINT",
+    "int32": "INTEGER",
+    "bool": "BOOLEAN",
+    "datetime64[ns]": "TIMESTAMP",
+}
+
+# Value of the nulls filled before a cast, by source type (0 for the numeric types),
+# as `define_column_data_types` fills them with 0
+FILL_VALUES = {
+    "VARCHAR": "'0'",
+    "BOOLEAN": "false",
+    "TIMESTAMP": "TIMESTAMP '1970-01-01'",
+}
+
+FLOAT_TYPES = ("DOUBLE", "FLOAT")
+INTEGER_TYPES = ("BIGINT", "INTEGER", "SMALLINT", "TINYINT")
+
+# Columns of the MVP data that are not carried to the processed data
+MVP_DROPPED_COLUMNS = ["Player", SLUG_COLUMN, "player_id", "Season", "Rank"]
+
+
+#########################################################
+#                 HELPER FUNCTIONS                      #
+#########################################################
+
+def connect_engine(paths: List[str]) -> duckdb.DuckDBPyConnection:
+    """
+    Opens an in-memory DuckDB connection able to read the given files.
+
+    Args:
+        paths (List[str]): The Parquet files the queries will scan, in S3 or local.
+
+    Returns:
+        duckdb.DuckDBPyConnection: The connection.
+    """
+    con = duckdb.connect()
+
+    if any(path.startswith("s3://") for path in paths):
+        configure_s3(con)
+
+    return con
+
+
+def describe(con: duckdb.DuckDBPyConnection, view: str) -> Dict[str, str]:
+    """
+    Gets the columns of a view and their DuckDB types, without running it.
+
+    Args:
+        con (duckdb.DuckDBPyConnection): The connection.
+        view (str): The view.
+
+    Returns:
+        dict: A dictionary mapping each column to its type, in column order.
+    """
+    return {row[0]: row[1] for row in con.execute(f"DESCRIBE {view}").fetchall()}
+
+
+def cast_expression(column: str, source_type: str, data_type: str) -> str:
+    """
+    Builds the expression that fills the nulls of a column with 0 and casts it, as
+    `define_column_data_types` does. Floats cast to integers are truncated, like `astype`.
+
+    Args:
+        column (str): The column.
+        source_type (str): The DuckDB type of the column.
+        data_type (str): The data type of `tasks.data_types` to cast it to.
+
+    Returns:
+        str: The SQL expression, aliased to the column name.
+    """
+    target_type = DUCKDB_TYPES[data_type]
+    expression = f"COALESCE({quote_identifier(column)}, {FILL_VALUES.get(source_type, '0')})"
+
+    if source_type in FLOAT_TYPES and target_type in INTEGER_TYPES:
+        expression = f"trunc({expression})"
+
+    return f"CAST({expression} AS {target_type}) AS {quote_identifier(column)}"
+
+
+#########################################################
+#                    QUERY PLAN                         #
+#########################################################
+
+def create_stats_view(con: duckdb.DuckDBPyConnection, paths: List[str]) -> None:
+    """
+    Creates the `stats` view: the season files with one row per player-season, as in
+    `tasks.stints.consolidate_player_stints`. Players that played for more than one team
+    keep their TOT row, with the team context averaged over their stints weighted by
+    minutes played. Files and rows are tagged to keep the order of the pandas engine
+    (files in season order, rows in file order).
+
+    Args:
+        con (duckdb.DuckDBPyConnection): The connection.
+        paths (List[str]): The Parquet files of the seasons, in season order.
+
+    Returns:
+        None
+    """
+    files = ", ".join(f"'{path}'" for path in paths)
+
+    con.execute(f"""
+        CREATE OR REPLACE VIEW stats_files AS
+        SELECT *
+        FROM read_parquet([{files}], union_by_name = true, filename = true, file_row_number = true)
+    """)
+    con.register("file_order", pd.DataFrame({"filename": paths, "file_index": range(len(paths))}))
+
+    column_types = describe(con, "stats_files")
+    columns = team_columns(column_types)
+    keys = " AND ".join(f"f.{key} = {{alias}}.{key}" for key in STINT_KEYS)
+
+    if not columns:
+        context_join, replace = "", ""
+    else:
+        weight = f"COALESCE(CAST({MINUTES_COLUMN} AS DOUBLE), 0)" if MINUTES_COLUMN in column_types else "0.0"
+        averages = ", ".join(
+            f"COALESCE(sum({weight} * {quote_identifier(column)}) / nullif(sum({weight}), 0), "
+            f"avg({quote_identifier(column)})) AS {quote_identifier(column)}"
+            for column in columns
+        )
+        context_join = f"""
+            LEFT JOIN (
+                SELECT {", ".join(STINT_KEYS)}, {averages}
+                FROM stats_files
+                WHERE Tm IS DISTINCT FROM '{TOTAL_TEAM}'
+                GROUP BY ALL
+            ) AS context ON {keys.format(alias="context")}
+        """
+        replace = "REPLACE (" + ", ".join(
+            f"CASE WHEN f.Tm = '{TOTAL_TEAM}' THEN CAST("
+            + (f"round_even(COALESCE(context.{quote_identifier(column)}, f.{quote_identifier(column)}), 0)"
+               if column_types[column] in INTEGER_TYPES
+               else f"COALESCE(context.{quote_identifier(column)}, f.{quote_identifier(column)})")
+            + f" AS {column_types[column]}) ELSE f.{quote_identifier(column)} END AS {quote_identifier(column)}"
+            for column in columns
+        ) + ")"
+
+    # Stints of the players with a TOT row are dropped
+    con.execute(f"""
+        CREATE OR REPLACE VIEW stats AS
+        SELECT f.* {replace}
+        FROM stats_files AS f
+        {context_join}
+        WHERE f.Tm = '{TOTAL_TEAM}' OR NOT EXISTS (
+            SELECT 1 FROM stats_files AS t WHERE t.Tm = '{TOTAL_TEAM}' AND {keys.format(alias="t")}
+        )
+    """)
+
+
+def stats_player_columns(con: duckdb.DuckDBPyConnection) -> List[str]:
+    """
+    Gets the columns identifying the players of the `stats` view: the name, and the
+    player slug when the files have it.
+
+    Args:
+        con (duckdb.DuckDBPyConnection): The connection.
+
+    Returns:
+        List[str]: The columns.
+    """
+    return ["Player"] + ([SLUG_COLUMN] if SLUG_COLUMN in describe(con, "stats") else [])
+
+
+def get_player_names(con: duckdb.DuckDBPyConnection) -> pd.DataFrame:
+    """
+    Gets the distinct players of the `stats` view. Only the player columns are scanned.
+
+    Args:
+        con (duckdb.DuckDBPyConnection): The connection.
+
+    Returns:
+        pd.DataFrame: The player names, and their slugs when the files have them.
+    """
+    return con.execute(f"SELECT DISTINCT {', '.join(stats_player_columns(con))} FROM stats").df()
+
+
+def create_player_ids_view(con: duckdb.DuckDBPyConnection, player_ids: pd.DataFrame) -> None:
+    """
+    Creates the `stats_ids` view: the `stats` view with the 'player_id' of each player.
+    Each distinct player is resolved once in Python, the rows get it through a join.
+
+    Args:
+        con (duckdb.DuckDBPyConnection): The connection.
+        player_ids (pd.DataFrame): The distinct players of `get_player_names` and their 'player_id'.
+
+    Returns:
+        None
+    """
+    columns = stats_player_columns(con)
+    con.register("player_ids", player_ids[columns + ["player_id"]])
+
+    # Rows of league averages have no slug
+    on = " AND ".join(f"stats.{column} IS NOT DISTINCT FROM player_ids.{column}" for column in columns)
+
+    con.execute(f"""
+        CREATE OR REPLACE VIEW stats_ids AS
+        SELECT stats.*, player_ids.player_id
+        FROM stats LEFT JOIN player_ids ON {on}
+    """)
+
+
+def get_stats_keys(con: duckdb.DuckDBPyConnection) -> pd.DataFrame:
+    """
+    Gets the distinct ('player_id', 'season') keys of the `stats_ids` view.
+
+    Args:
+        con (duckdb.DuckDBPyConnection): The connection.
+
+    Returns:
+        pd.DataFrame: The keys.
+    """
+    return con.execute("SELECT DISTINCT player_id, season FROM stats_ids").df()
+
+
+def create_stats_mvp_view(con: duckdb.DuckDBPyConnection, df_mvp: pd.DataFrame, column_data_types: Dict[str, str]) -> None:
+    """
+    Creates the `stats_mvp` view: the `stats_ids` view left-joined with the MVP shares on
+    ('player_id', 'season'), null shares filled with 0 and the columns cast to their data
+    types, in the row order of the pandas engine.
+
+    Args:
+        con (duckdb.DuckDBPyConnection): The connection.
+        df_mvp (pd.DataFrame): The MVP data, with 'player_id'.
+        column_data_types (dict): A dictionary mapping column names to their data types.
+
+    Returns:
+        None
+    """
+    mvp_columns = [column for column in df_mvp.columns if column not in MVP_DROPPED_COLUMNS]
+    con.register("mvp", df_mvp)
+
+    mvp_select = ", ".join(
+        "COALESCE(mvp.Share, 0) AS Share" if column == "Share" else f"mvp.{quote_identifier(column)}"
+        for column in mvp_columns
+    )
+
+    con.execute(f"""
+        CREATE OR REPLACE VIEW stats_mvp_merged AS
+        SELECT stats_ids.* EXCLUDE (filename), {mvp_select}, file_order.file_index
+        FROM stats_ids
+        LEFT JOIN mvp ON stats_ids.player_id = mvp.player_id AND stats_ids.season = mvp.Season
+        JOIN file_order ON stats_ids.filename = file_order.filename
+    """)
+
+    select = ", ".join(
+        cast_expression(column, source_type, column_data_types[column])
+        if column in column_data_types else quote_identifier(column)
+        for column, source_type in describe(con, "stats_mvp_merged").items()
+        if column not in ("file_index", "file_row_number")
+    )
+
+    con.execute(f"""
+        CREATE OR REPLACE VIEW stats_mvp AS
+        SELECT {select} FROM stats_mvp_merged
+        ORDER BY file_index, file_row_number
+    """)
+
+
+def fetch_stats_mvp(con: duckdb.DuckDBPyConnection, column_data_types: Dict[str, str]) -> pd.DataFrame:
+    """
+    Runs the plan of the `stats_mvp` view. Typed columns come back with the dtypes of the
+    pandas engine, Arrow-backed with the Arrow backend.
+
+    Args:
+        con (duckdb.DuckDBPyConnection): The connection.
+        column_data_types (dict): A dictionary mapping column names to their data types.
+
+    Returns:
+        pd.DataFrame: The processed data.
+    """
+    if arrow_backend_enabled():
+        table = con.execute("SELECT * FROM stats_mvp").arrow()
+        schema = pa.schema([
+            pa.field(field.name, ARROW_TYPES[column_data_types[field.name]]) if field.name in column_data_types else field
+            for field in table.schema
+        ])
+        return from_arrow_table(table.cast(schema))
+
+    df = con.execute("SELECT * FROM stats_mvp").df()
+
+    # DuckDB returns strings as objects and timestamps in its own unit
+    return df.astype({column: data_type for column, data_type in column_data_types.items() if column in df.columns})
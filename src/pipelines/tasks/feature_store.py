@@ -0,0 +1,236 @@
+#########################################################
+#                IMPORT LIBRARIES                       #
+#########################################################
+
+import pandas as pd
+from datetime import datetime
+from prefect import task
+from typing import List, Optional
+from tasks.arrow_backend import write_parquet, write_partitioned
+from tasks.manifest import write_manifest
+from tasks.scoring_schema import to_scoring_schema
+from tasks.stints import consolidate_player_stints
+
+
+#########################################################
+#                 GLOBAL VARIABLES                      #
+#########################################################
+
+# Bump when the stats or the transforms change: each version has its own prefix, so
+# consumers keep reading the version they were built with
+FEATURE_SET_VERSION = "2"
+FEATURE_STORE_PATH = f"s3://nba-mvp-pipeline/data/features/league/v{FEATURE_SET_VERSION}/"
+
+# Day of the daily features files (`daily/{day}.parquet`)
+DAY_FORMAT = "%Y_%m_%d"
+
+# Stats with league-relative features, in the scoring schema of the models (see
+# tasks.scoring_schema), so the features join the snapshots they score. Missing ones are skipped.
+FEATURE_STATS = [
+    "PTS_PERGAME",
+    "TRB_PERGAME",
+    "AST_PERGAME",
+    "STL_PERGAME",
+    "BLK_PERGAME",
+    "MP_PERGAME",
+    "PER_ADVANCED",
+    "TS%_ADVANCED",
+    "USG%_ADVANCED",
+    "WS_ADVANCED",
+    "WS/48_ADVANCED",
+    "BPM_ADVANCED",
+    "VORP_ADVANCED",
+    "PCT",
+]
+
+# Suffix of the columns of each transform (e.g., PTS_PERGAME_pctl)
+TRANSFORMS = {
+    "pctl": "Percentile of the stat in the league",
+    "z": "Standard score against the league mean and standard deviation",
+    "rel": "Ratio to the league mean",
+}
+
+# Players are compared within a season, and within a snapshot for the daily snapshots
+SEASON_KEYS = ["season"]
+SNAPSHOT_KEYS = ["season", "snapshot_date"]
+
+# Columns identifying a row of the features, in the scoring schema: a player-season of
+# the processed data, a player of a daily snapshot (traded players are on their TOT row)
+HISTORICAL_ID_COLUMNS = ["season", "player_id", "PLAYER", "TEAM"]
+DAILY_ID_COLUMNS = ["season", "snapshot_date", "PLAYER", "TEAM"]
+
+
+#########################################################
+#                 HELPER FUNCTIONS                      #
+#########################################################
+
+def group_keys(df: pd.DataFrame) -> List[str]:
+    """
+    Keys of the league a player is compared with: the snapshot if the data has snapshot
+    dates, the season otherwise.
+
+    Args:
+        df (pd.DataFrame): The stats.
+
+    Returns:
+        List[str]: The group keys.
+    """
+    return SNAPSHOT_KEYS if "snapshot_date" in df.columns else SEASON_KEYS
+
+
+def compute_league_features(df: pd.DataFrame, stats: List[str] = FEATURE_STATS, keys: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Computes the league-relative features of the stats: percentile, z-score and ratio to
+    the league mean of each player within their group. All the stats of a group are
+    transformed at once, with one groupby.
+
+    Constant stats get a z-score of 0, as StandardScaler leaves constant columns unscaled.
+    Null stats get null features.
+
+    Args:
+        df (pd.DataFrame): One row per player of each group (stints consolidated).
+        stats (List[str]): The stats. Missing ones are skipped.
+        keys (List[str], optional): The group keys (see group_keys).
+
+    Returns:
+        pd.DataFrame: The feature columns, with the index of `df`.
+    """
+    keys = keys or group_keys(df)
+    stats = [stat for stat in stats if stat in df.columns]
+
+    values = df[stats].astype("float64")
+    grouped = values.groupby([df[key] for key in keys], sort=False)
+
+    mean = grouped.transform("mean")
+    std = grouped.transform("std", ddof=0)
+
+    features = {
+        "pctl": grouped.rank(pct=True),
+        "z": ((values - mean) / std.where(std > 0)).mask(std.eq(0) & values.notna(), 0.0),
+        "rel": values / mean.where(mean != 0),
+    }
+
+    return pd.concat(
+        [features[suffix].add_suffix(f"_{suffix}") for suffix in TRANSFORMS],
+        axis=1,
+    )
+
+
+def league_feature_columns(stats: List[str] = FEATURE_STATS) -> List[str]:
+    """
+    Columns of the league features of the stats (e.g., PTS_PERGAME_pctl).
+
+    Args:
+        stats (List[str]): The stats.
+
+    Returns:
+        List[str]: The feature columns.
+    """
+    return [f"{stat}_{suffix}" for suffix in TRANSFORMS for stat in stats]
+
+
+def daily_features_path(day: str, path: str = FEATURE_STORE_PATH) -> str:
+    """
+    Path of the league features of a daily snapshot.
+
+    Args:
+        day (str): The day of the snapshot (e.g., "2024_01_31", see DAY_FORMAT).
+        path (str): The root of the feature set.
+
+    Returns:
+        str: The path of the parquet file.
+    """
+    return f"{path.rstrip('/')}/daily/{day}.parquet"
+
+
+def feature_set_definition(stats: List[str] = FEATURE_STATS) -> dict:
+    """
+    Describes the feature set, written next to the features.
+
+    Args:
+        stats (List[str]): The stats.
+
+    Returns:
+        dict: The version, stats, transforms and group keys of the feature set.
+    """
+    return {
+        "version": FEATURE_SET_VERSION,
+        "stats": stats,
+        "transforms": TRANSFORMS,
+        "keys": {"historical": SEASON_KEYS, "daily": SNAPSHOT_KEYS},
+        "written_at": datetime.now().isoformat(timespec="seconds"),
+    }
+
+
+
+#########################################################
+#                  TASKS DEFINITION                     #
+#########################################################
+
+@task(
+    name="Build League Features",
+    description="Compute percentiles, z-scores and league-relative stats within each season or snapshot",
+    tags=["NBA", "Stats", "Features", "Transform"],
+)
+def build_league_features(df: pd.DataFrame, id_columns: List[str]) -> pd.DataFrame:
+    """
+    Builds the league features of the players. Traded players are compared through their
+    season totals, so each player counts once in the league. The features are named
+    after the scoring schema of the models (see tasks.scoring_schema).
+
+    Args:
+        df (pd.DataFrame): The stats, one row per player or with the TOT rows and the stints of traded players.
+        id_columns (List[str]): The columns identifying a row of the features, in the scoring schema.
+
+    Returns:
+        pd.DataFrame: The id columns and the feature columns.
+    """
+    keys = group_keys(df)
+
+    # The processed seasons are already consolidated
+    players = df
+    if df.duplicated(keys + ["Player"]).any():
+        players = consolidate_player_stints(df, keys=keys + ["Player"])
+
+    players = to_scoring_schema(players)
+
+    df_features = pd.concat(
+        [players[id_columns], compute_league_features(players, keys=keys)],
+        axis=1,
+    ).reset_index(drop=True)
+
+    print(f"Built {df_features.shape[1] - len(id_columns)} league features for {len(df_features)} players.")
+
+    return df_features
+
+
+@task(
+    name="Load League Features",
+    description="Save the league features to the versioned feature set in S3",
+    tags=["NBA", "S3", "Features", "Ingestion"],
+)
+def load_league_features(df_features: pd.DataFrame, day: Optional[str] = None, path: str = FEATURE_STORE_PATH) -> None:
+    """
+    Saves the league features to the feature set: the processed seasons to
+    `historical/`, partitioned by season (only the seasons present are replaced), and a
+    daily snapshot to `daily/{day}.parquet`. The definition of the feature set is written
+    to `_feature_set.json`.
+
+    Args:
+        df_features (pd.DataFrame): The features.
+        day (str, optional): The day of a daily snapshot (e.g., "2024_01_31").
+        path (str): The root of the feature set.
+
+    Returns:
+        None
+    """
+    path = path.rstrip("/")
+
+    if day is None:
+        write_partitioned(df_features, f"{path}/historical/", partition_cols=["season"])
+    else:
+        write_parquet(df_features, daily_features_path(day, path))
+
+    write_manifest(feature_set_definition(), f"{path}/_feature_set.json")
+
+    print(f"League features saved to {path}.")
@@ -0,0 +1,111 @@
+#########################################################
+#                IMPORT LIBRARIES                       #
+#########################################################
+
+import pandas as pd
+from functools import lru_cache
+
+
+#########################################################
+#                 GLOBAL VARIABLES                      #
+#########################################################
+
+# Bump when the table below changes
+FRANCHISES_VERSION = "2023.1"
+
+# Team names as published in basketball-reference.com standings and their abbreviations.
+# Seasons are identified by the year they end in ("2023" == "2022-23"), None means open-ended.
+FRANCHISES = [
+    # (team, abbreviation, first_season, last_season)
+    ("Atlanta Hawks",                      "ATL", None, None),
+    ("Boston Celtics",                     "BOS", None, None),
+    ("New Jersey Nets",                    "NJN", 1978, 2012),
+    ("Brooklyn Nets",                      "BRK", 2013, None),
+    ("Charlotte Hornets",                  "CHH", 1989, 2002),
+    ("Charlotte Bobcats",                  "CHA", 2005, 2014),
+    ("Charlotte Hornets",                  "CHO", 2015, None),
+    ("Chicago Bulls",                      "CHI", None, None),
+    ("Cleveland Cavaliers",                "CLE", None, None),
+    ("Dallas Mavericks",                   "DAL", 1981, None),
+    ("Denver Nuggets",                     "DEN", None, None),
+    ("Detroit Pistons",                    "DET", None, None),
+    ("Golden State Warriors",              "GSW", None, None),
+    ("Houston Rockets",                    "HOU", None, None),
+    ("Indiana Pacers",                     "IND", None, None),
+    ("San Diego Clippers",                 "SDC", 1979, 1984),
+    ("Los Angeles Clippers",               "LAC", 1985, None),
+    ("Los Angeles Lakers",                 "LAL", None, None),
+    ("Vancouver Grizzlies",                "VAN", 1996, 2001),
+    ("Memphis Grizzlies",                  "MEM", 2002, None),
+    ("Miami Heat",                         "MIA", 1989, None),
+    ("Milwaukee Bucks",                    "MIL", None, None),
+    ("Minnesota Timberwolves",             "MIN", 1990, None),
+    ("New Orleans Hornets",                "NOH", 2003, 2005),
+    ("New Orleans/Oklahoma City Hornets",  "NOK", 2006, 2007),
+    ("New Orleans Hornets",                "NOH", 2008, 2013),
+    ("New Orleans Pelicans",               "NOP", 2014, None),
+    ("New York Knicks",                    "NYK", None, None),
+    ("Seattle SuperSonics",                "SEA", None, 2008),
+    ("Oklahoma City Thunder",              "OKC", 2009, None),
+    ("Orlando Magic",                      "ORL", 1990, None),
+    ("Philadelphia 76ers",                 "PHI", None, None),
+    ("Phoenix Suns",                       "PHO", None, None),
+    ("Portland Trail Blazers",             "POR", None, None),
+    ("Kansas City Kings",                  "KCK", 1976, 1985),
+    ("Sacramento Kings",                   "SAC", 1986, None),
+    ("San Antonio Spurs",                  "SAS", None, None),
+    ("Toronto Raptors",                    "TOR", 1996, None),
+    ("Utah Jazz",                          "UTA", 1980, None),
+    ("Washington Bullets",                 "WSB", 1975, 1997),
+    ("Washington Wizards",                 "WAS", 1998, None),
+]
+
+
+#########################################################
+#                  FRANCHISE LOOKUP                     #
+#########################################################
+
+@lru_cache(maxsize=None)
+def franchise_lookup(season: int) -> pd.Series:
+    """
+    Builds the team name -> abbreviation lookup for a season.
+
+    Args:
+        season (int): The NBA season as the year it ends in (e.g., 2023 for 2022-23).
+
+    Returns:
+        pd.Series: The abbreviations indexed by team name.
+    """
+    table = pd.DataFrame(FRANCHISES, columns=["team", "Tm", "first_season", "last_season"])
+
+    is_active = (
+        (table["first_season"].isna() | (table["first_season"] <= season))
+        & (table["last_season"].isna() | (table["last_season"] >= season))
+    )
+
+    return table.loc[is_active].set_index("team")["Tm"]
+
+
+def resolve_team_abbreviations(teams: pd.Series, season: str) -> pd.Series:
+    """
+    Resolves team names to their abbreviation in the given season.
+
+    Args:
+        teams (pd.Series): Team names as published in the standings.
+        season (str): The NBA season in the format "YYYY" (e.g., "2023" == "2022-23").
+
+    Returns:
+        pd.Series: The team abbreviations, aligned with `teams`.
+
+    Raises:
+        ValueError: If a team name is not in the franchise table for that season.
+    """
+    abbreviations = teams.map(franchise_lookup(int(season)))
+
+    if abbreviations.isna().any():
+        unknown = list(teams[abbreviations.isna()].unique())
+        raise ValueError(
+            f"Unknown teams for season {season} in franchise table {FRANCHISES_VERSION}: {unknown}"
+        )
+
+    return abbreviations
@@ -0,0 +1,161 @@
+#########################################################
+#                IMPORT LIBRARIES                       #
+#########################################################
+
+import io
+import requests
+import pandas as pd
+from lxml import etree
+
+
+#########################################################
+#                 GLOBAL VARIABLES                      #
+#########################################################
+
+BREF_STATS_URL = "https://www.basketball-reference.com/leagues/NBA_{season}_{info}.html"
+REQUEST_HEADERS = {"User-Agent": "Mozilla/5.0 (compatible; nba-mvp-pipeline)"}
+REQUEST_TIMEOUT = 30
+
+# Player slug of a row (e.g., "jamesle01" for LeBron James), the stable identifier of the
+# player across seasons and name spellings
+SLUG_ATTRIBUTE = "data-append-csv"
+SLUG_COLUMN = "player_slug"
+
+
+#########################################################
+#                 HELPER FUNCTIONS                      #
+#########################################################
+
+def fetch_html(url: str) -> str:
+    """
+    Downloads a page.
+
+    Args:
+        url (str): The page URL.
+
+    Returns:
+        str: The page HTML.
+    """
+    response = requests.get(url, headers=REQUEST_HEADERS, timeout=REQUEST_TIMEOUT)
+    response.raise_for_status()
+    response.encoding = "utf-8"
+
+    return response.text
+
+
+def extract_table_markup(html: str, table_id: str) -> str:
+    """
+    Slices the markup of a single table out of a page, without parsing the page.
+
+    basketball-reference.com ships most secondary tables inside HTML comments. Slicing
+    by the table id finds them whether they are commented out or not.
+
+    Args:
+        html (str): The page HTML.
+        table_id (str): The id of the table element (e.g., "per_game_stats").
+
+    Returns:
+        str: The markup from `<table` to `</table>`.
+
+    Raises:
+        ValueError: If the page has no table with that id.
+    """
+    position = html.find(f'id="{table_id}"')
+
+    if position == -1:
+        raise ValueError(f"Table '{table_id}' not found in page.")
+
+    start = html.rfind("<table", 0, position)
+    end = html.find("</table>", position) + len("</table>")
+
+    return html[start:end]
+
+
+def _to_typed_column(values: pd.Series) -> pd.Series:
+    # Keep a column numeric only if every non-empty cell parses as a number
+    numeric = pd.to_numeric(values, errors="coerce")
+
+    if numeric.notna().sum() == values.notna().sum():
+        return numeric
+    return values.astype("string")
+
+
+#########################################################
+#                   TABLE EXTRACTION                    #
+#########################################################
+
+def parse_table(markup: str) -> pd.DataFrame:
+    """
+    Parses a basketball-reference.com table into a typed DataFrame.
+
+    Rows are streamed with `lxml.etree.iterparse` and cleared once read. Only the last
+    header row is used for column names (group headers are skipped), the header rows
+    repeated inside the body and spacer columns are dropped, and numeric columns are
+    returned as numbers. Tables of players get a 'player_slug' column, the slug of the
+    player cell of each row (empty for rows without player, e.g. league averages).
+
+    Args:
+        markup (str): The table markup.
+
+    Returns:
+        pd.DataFrame: The table.
+    """
+    header, rows, slugs = None, [], []
+
+    rows_iterator = etree.iterparse(
+        io.BytesIO(markup.encode("utf-8")), events=("end",), tag="tr", html=True, encoding="utf-8"
+    )
+
+    for _, row in rows_iterator:
+        section = row.getparent().tag
+        classes = row.get("class", "")
+        cells = ["".join(cell.itertext()).strip() for cell in row if cell.tag in ("th", "td")]
+
+        if section == "thead":
+            if "over_header" not in classes:
+                header = cells
+        elif "thead" not in classes:
+            rows.append(cells)
+            slugs.append(next((cell.get(SLUG_ATTRIBUTE) for cell in row if cell.get(SLUG_ATTRIBUTE)), None))
+
+        row.clear()
+
+    df = pd.DataFrame(rows, columns=header).replace({"": None})
+
+    # Drop spacer columns, they have no header
+    df = df.loc[:, [column != "" for column in df.columns]]
+
+    df = df.apply(_to_typed_column)
+
+    if any(slugs):
+        df[SLUG_COLUMN] = pd.Series(slugs, index=df.index, dtype="string")
+
+    return df
+
+
+def read_html_table(url: str, table_id: str) -> pd.DataFrame:
+    """
+    Downloads a page and extracts a single table by its element id.
+
+    Args:
+        url (str): The page URL.
+        table_id (str): The id of the table element (e.g., "mvp", "advanced_stats").
+
+    Returns:
+        pd.DataFrame: The table.
+    """
+    return parse_table(extract_table_markup(fetch_html(url), table_id))
+
+
+def read_bref_stats(season: str, info: str) -> pd.DataFrame:
+    """
+    Gets the league-wide player stats table of a season from basketball-reference.com.
+
+    Args:
+        season (str): The NBA season in the format "YYYY" (e.g., "2023" == "2022-23").
+        info (str): The type of statistics ("per_game", "totals" or "advanced").
+
+    Returns:
+        pd.DataFrame: The player stats, one row per player and team.
+    """
+    return read_html_table(BREF_STATS_URL.format(season=season, info=info), f"{info}_stats")
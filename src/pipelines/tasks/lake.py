@@ -0,0 +1,218 @@
+#########################################################
+#                IMPORT LIBRARIES                       #
+#########################################################
+
+import os
+import boto3
+import duckdb
+import pandas as pd
+from tasks.compaction import live_snapshot_files
+
+
+#########################################################
+#                 GLOBAL VARIABLES                      #
+#########################################################
+
+# Root of the Parquet lake: the S3 bucket or a local mirror of it (e.g. `aws s3 sync`)
+LAKE_ROOT = os.environ.get("NBA_LAKE_ROOT", "s3://nba-mvp-pipeline")
+
+# Views over the Parquet datasets, in creation order. Datasets with a `files` function
+# read the files it lists instead of the glob of `path`.
+DATASET_VIEWS = {
+    # Compacted snapshots and daily snapshots not compacted yet (see compact_snapshots.py)
+    "players_daily": {"path": "data/raw/players/*.parquet", "hive_partitioning": False, "files": live_snapshot_files},
+    "historical":    {"path": "data/raw/historical/*.parquet", "hive_partitioning": False},
+    "mvp":           {"path": "data/raw/mvp/mvp.parquet", "hive_partitioning": False},
+    "stats_mvp":     {"path": "data/processed/mvp/stats_mvp/*/*.parquet", "hive_partitioning": True},
+}
+
+# Views derived from the dataset views
+DERIVED_VIEWS = {
+    # Last snapshot of each season
+    "latest_players": """
+        SELECT * FROM players_daily
+        QUALIFY snapshot_date = max(snapshot_date) OVER (PARTITION BY season)
+    """,
+    # One row per player and team for every season: completed seasons from the historical
+    # data, the current season from its last snapshot
+    "season_stats": """
+        SELECT * FROM historical
+        UNION ALL BY NAME
+        SELECT * EXCLUDE (snapshot_date) FROM latest_players
+        WHERE season NOT IN (SELECT DISTINCT season FROM historical)
+    """,
+}
+
+# Named queries. Identifiers in braces are validated column names, $names are bound parameters.
+QUERIES = {
+    "season_leaders": {
+        "description": "Top players of a season for a stat",
+        "params": {"season": None, "stat": "PTS_per_game", "limit": 10},
+        "sql": """
+            SELECT season, Player, Tm, {stat}
+            FROM season_stats
+            WHERE season = $season AND Tm != 'TOT'
+            ORDER BY {stat} DESC NULLS LAST
+            LIMIT $limit
+        """,
+    },
+    "player_history": {
+        "description": "Daily snapshot history of a player",
+        "params": {"player": None},
+        "sql": """
+            SELECT snapshot_date, season, Tm, G_advanced, MP_per_game, PTS_per_game, TRB_per_game,
+                   AST_per_game, PER_advanced, WS_advanced, VORP_advanced, "W/L%_team"
+            FROM players_daily
+            WHERE Player = $player
+            ORDER BY snapshot_date
+        """,
+    },
+    "mvp_share_vs_stats": {
+        "description": "MVP vote share against the main stats of every player who received votes",
+        "params": {"season": None},
+        "sql": """
+            SELECT season, Player, Tm, Share, PTS_per_game, TRB_per_game, AST_per_game,
+                   PER_advanced, WS_advanced, "WS/48_advanced", VORP_advanced, BPM_advanced, "W/L%_team"
+            FROM stats_mvp
+            WHERE Share > 0 AND ($season IS NULL OR season = $season)
+            ORDER BY season, Share DESC
+        """,
+    },
+    "mvp_winners": {
+        "description": "MVP of each season with their stats",
+        "params": {},
+        "sql": """
+            SELECT season, Player, Tm, Share, PTS_per_game, TRB_per_game, AST_per_game,
+                   PER_advanced, WS_advanced, VORP_advanced
+            FROM stats_mvp
+            QUALIFY row_number() OVER (PARTITION BY season ORDER BY Share DESC) = 1
+            ORDER BY season
+        """,
+    },
+}
+
+
+#########################################################
+#                 HELPER FUNCTIONS                      #
+#########################################################
+
+def configure_s3(con: duckdb.DuckDBPyConnection) -> None:
+    """
+    Lets a DuckDB connection read from S3 with the credentials of the default boto3 session.
+
+    Args:
+        con (duckdb.DuckDBPyConnection): The connection.
+
+    Returns:
+        None
+    """
+    con.execute("INSTALL httpfs; LOAD httpfs;")
+
+    session = boto3.Session()
+    credentials = session.get_credentials().get_frozen_credentials()
+
+    con.execute(f"SET s3_region = '{session.region_name or 'us-east-1'}'")
+    con.execute(f"SET s3_access_key_id = '{credentials.access_key}'")
+    con.execute(f"SET s3_secret_access_key = '{credentials.secret_key}'")
+    if credentials.token:
+        con.execute(f"SET s3_session_token = '{credentials.token}'")
+
+
+def quote_identifier(name: str) -> str:
+    """
+    Quotes a column name for DuckDB (e.g., W/L%_team -> "W/L%_team").
+
+    Args:
+        name (str): The column name.
+
+    Returns:
+        str: The quoted column name.
+    """
+    return '"' + name.replace('"', '""') + '"'
+
+
+#########################################################
+#                  LAKE CONNECTION                      #
+#########################################################
+
+def connect(root: str = LAKE_ROOT, database: str = ":memory:") -> duckdb.DuckDBPyConnection:
+    """
+    Opens an embedded DuckDB connection with a view over each Parquet dataset of the lake.
+    Views are lazy: files are only scanned by the queries that use them.
+
+    Args:
+        root (str): Root of the lake, an S3 bucket path or a local directory.
+        database (str): DuckDB database file (in memory by default).
+
+    Returns:
+        duckdb.DuckDBPyConnection: The connection.
+    """
+    con = duckdb.connect(database)
+
+    if root.startswith("s3://"):
+        configure_s3(con)
+
+    root = root.rstrip("/")
+
+    for view, dataset in DATASET_VIEWS.items():
+        if "files" in dataset:
+            path = "[" + ", ".join(f"'{file}'" for file in dataset["files"](root)) + "]"
+        else:
+            path = f"'{root}/{dataset['path']}'"
+        hive_partitioning = str(dataset["hive_partitioning"]).lower()
+        try:
+            con.execute(f"""
+                CREATE OR REPLACE VIEW {view} AS
+                SELECT * FROM read_parquet({path}, hive_partitioning = {hive_partitioning}, union_by_name = true)
+            """)
+        except duckdb.Error as e:
+            print(f"Skipping view {view}: {str(e).splitlines()[0]}")
+
+    for view, sql in DERIVED_VIEWS.items():
+        try:
+            con.execute(f"CREATE OR REPLACE VIEW {view} AS {sql}")
+        except duckdb.Error as e:
+            print(f"Skipping view {view}: {str(e).splitlines()[0]}")
+
+    return con
+
+
+def run_query(con: duckdb.DuckDBPyConnection, name: str, **params) -> pd.DataFrame:
+    """
+    Runs a named query.
+
+    Args:
+        con (duckdb.DuckDBPyConnection): A connection returned by `connect`.
+        name (str): The name of the query (see QUERIES).
+        **params: The query parameters. Missing ones take the defaults of the query.
+
+    Returns:
+        pd.DataFrame: The query result.
+
+    Raises:
+        ValueError: If the query, a parameter or a stat column is unknown, or a required parameter is missing.
+    """
+    if name not in QUERIES:
+        raise ValueError(f"Unknown query '{name}'. Available queries: {list(QUERIES)}")
+
+    query = QUERIES[name]
+
+    unknown = set(params) - set(query["params"])
+    if unknown:
+        raise ValueError(f"Unknown parameters for '{name}': {sorted(unknown)}")
+
+    values = {**query["params"], **params}
+    sql = query["sql"]
+
+    # Stat names are identifiers, not values: check them against the columns of the view
+    if "stat" in values:
+        columns = {row[0] for row in con.execute("DESCRIBE season_stats").fetchall()}
+        if values["stat"] not in columns:
+            raise ValueError(f"Unknown stat '{values['stat']}'.")
+        sql = sql.replace("{stat}", quote_identifier(values.pop("stat")))
+
+    missing = [param for param in values if values[param] is None and f"${param} IS NULL" not in sql]
+    if missing:
+        raise ValueError(f"Missing parameters for '{name}': {missing}")
+
+    return con.execute(sql, values).df()
@@ -0,0 +1,106 @@
+#########################################################
+#                IMPORT LIBRARIES                       #
+#########################################################
+
+import hashlib
+import json
+import boto3
+import pandas as pd
+import awswrangler as wr
+from typing import Dict, List
+
+
+#########################################################
+#                 HELPER FUNCTIONS                      #
+#########################################################
+
+def split_s3_path(path: str):
+    """
+    Splits an S3 path into bucket and key.
+
+    Args:
+        path (str): The S3 path ("s3://bucket/key").
+
+    Returns:
+        tuple: The bucket name and the object key.
+    """
+    bucket, _, key = path.replace("s3://", "", 1).partition("/")
+    return bucket, key
+
+
+def hash_dataframe(df: pd.DataFrame) -> str:
+    """
+    Computes a content hash of a DataFrame, independent of its index.
+
+    Args:
+        df (pd.DataFrame): The DataFrame to hash.
+
+    Returns:
+        str: The SHA-256 hex digest of the DataFrame rows.
+    """
+    row_hashes = pd.util.hash_pandas_object(df, index=False).values
+    return hashlib.sha256(row_hashes.tobytes()).hexdigest()
+
+
+def get_object_versions(paths: List[str]) -> Dict[str, str]:
+    """
+    Gets the ETag of each S3 object without downloading it.
+
+    Args:
+        paths (List[str]): The S3 paths of the objects.
+
+    Returns:
+        dict: A dictionary mapping each existing path to its ETag. Missing objects are left out.
+    """
+    descriptions = wr.s3.describe_objects(path=paths)
+
+    return {path: description["ETag"].strip('"') for path, description in descriptions.items()}
+
+
+#########################################################
+#                  READ/WRITE MANIFEST                  #
+#########################################################
+
+def read_manifest(path: str) -> dict:
+    """
+    Reads a JSON manifest from S3.
+
+    Args:
+        path (str): The S3 path of the manifest.
+
+    Returns:
+        dict: The manifest, or an empty dictionary if it does not exist yet.
+    """
+    bucket, key = split_s3_path(path)
+    s3_client = boto3.client("s3")
+
+    try:
+        response = s3_client.get_object(Bucket=bucket, Key=key)
+    except s3_client.exceptions.NoSuchKey:
+        print(f"No manifest found at {path}.")
+        return {}
+
+    return json.loads(response["Body"].read())
+
+
+def write_manifest(manifest: dict, path: str) -> None:
+    """
+    Writes a JSON manifest to S3. A single PUT replaces the object atomically.
+
+    Args:
+        manifest (dict): The manifest to write.
+        path (str): The S3 path of the manifest.
+
+    Returns:
+        None
+    """
+    bucket, key = split_s3_path(path)
+
+    boto3.client("s3").put_object(
+        Bucket=bucket,
+        Key=key,
+        Body=json.dumps(manifest, indent=2, sort_keys=True).encode("utf-8"),
+        ContentType="application/json",
+    )
+
+    print(f"Manifest written to {path}.")
@@ -0,0 +1,210 @@
+#########################################################
+#                IMPORT LIBRARIES                       #
+#########################################################
+
+# Also packaged into the load_db Lambda (infrastructure/modules/lambda/main.tf): this
+# module must only depend on pyarrow and the standard library.
+
+import io
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as csv
+
+
+#########################################################
+#                 HELPER FUNCTIONS                      #
+#########################################################
+
+def to_copy_csv(table: pa.Table) -> io.BytesIO:
+    """
+    Encodes an Arrow table as the CSV read by `COPY ... FROM STDIN WITH (FORMAT csv)`.
+    Nulls are written as unquoted empty fields, which COPY loads as NULL, and timestamps
+    are truncated to the microseconds of Postgres.
+
+    Args:
+        table (pa.Table): The table.
+
+    Returns:
+        io.BytesIO: The CSV rows, without header, positioned at the start.
+    """
+    for i, field in enumerate(table.schema):
+        if pa.types.is_timestamp(field.type) and field.type.unit == "ns":
+            table = table.set_column(i, field.name, pc.cast(table.column(i), pa.timestamp("us", field.type.tz), safe=False))
+
+    buffer = io.BytesIO()
+    csv.write_csv(table, buffer, write_options=csv.WriteOptions(include_header=False))
+    buffer.seek(0)
+
+    return buffer
+
+
+def copy_statement(schema: str, table_name: str, columns) -> str:
+    """
+    Builds the COPY statement that loads CSV rows into the given columns of a table.
+
+    Args:
+        schema (str): The database schema.
+        table_name (str): The table.
+        columns (List[str]): The columns, in the order of the CSV fields.
+
+    Returns:
+        str: The COPY statement.
+    """
+    return f'COPY {schema}.{table_name} ({column_list(columns)}) FROM STDIN WITH (FORMAT csv)'
+
+
+def column_list(columns) -> str:
+    """
+    Quotes and joins column names for a SQL statement (e.g., W/L%_team -> "W/L%_team").
+
+    Args:
+        columns (List[str]): The columns.
+
+    Returns:
+        str: The comma-separated quoted columns.
+    """
+    return ", ".join('"{}"'.format(column.replace('"', '""')) for column in columns)
+
+
+def create_staging_table(cursor, schema: str, table_name: str) -> str:
+    """
+    Creates a temporary table with the columns of a table, dropped when the transaction
+    commits. Rows are copied there first and inserted with `insert_staged_rows`.
+
+    Args:
+        cursor (psycopg2.extensions.cursor): The cursor of the transaction.
+        schema (str): The database schema.
+        table_name (str): The table.
+
+    Returns:
+        str: The name of the staging table, in the `pg_temp` schema.
+    """
+    staging_table = f"{table_name}_staging"
+    cursor.execute(
+        f"CREATE TEMP TABLE {staging_table} (LIKE {schema}.{table_name} INCLUDING DEFAULTS) ON COMMIT DROP"
+    )
+    return staging_table
+
+
+def delete_replaced_snapshots(cursor, schema: str, table_name: str, staging_table: str) -> int:
+    """
+    Deletes the earlier snapshots of the same day as the staged rows, in each of their
+    seasons: a snapshot refreshed during the day (see the StatsRefresh flow) replaces the
+    rows of the day instead of adding a snapshot. Rows of the staged snapshot itself are
+    kept, so the batches of one file can be staged one after the other.
+
+    Args:
+        cursor (psycopg2.extensions.cursor): The cursor of the transaction.
+        schema (str): The database schema.
+        table_name (str): The table, with 'season' and 'snapshot_date' columns.
+        staging_table (str): The staging table (see create_staging_table).
+
+    Returns:
+        int: The number of rows deleted.
+    """
+    cursor.execute(
+        f"DELETE FROM {schema}.{table_name} AS stats "
+        f"USING (SELECT DISTINCT season, snapshot_date FROM pg_temp.{staging_table}) AS staged "
+        "WHERE stats.season = staged.season "
+        "AND stats.snapshot_date >= date_trunc('day', staged.snapshot_date) "
+        "AND stats.snapshot_date < staged.snapshot_date"
+    )
+    return cursor.rowcount
+
+
+def insert_staged_rows(cursor, table: pa.Table, schema: str, table_name: str, staging_table: str, replace_day: bool = False) -> int:
+    """
+    Copies the rows into the staging table and inserts them into the table, skipping the
+    rows whose primary key is already there. The staging table is emptied afterwards, so
+    it can take the next batch of the same transaction.
+
+    Args:
+        cursor (psycopg2.extensions.cursor): The cursor of the transaction.
+        table (pa.Table): The rows to load, with the names of the table columns.
+        schema (str): The database schema.
+        table_name (str): The table.
+        staging_table (str): The staging table (see create_staging_table).
+        replace_day (bool): Whether the rows replace the earlier snapshots of their day
+            (see delete_replaced_snapshots).
+
+    Returns:
+        int: The number of rows inserted.
+    """
+    columns = column_list(table.column_names)
+
+    cursor.copy_expert(copy_statement("pg_temp", staging_table, table.column_names), to_copy_csv(table))
+    if replace_day:
+        delete_replaced_snapshots(cursor, schema, table_name, staging_table)
+    cursor.execute(
+        f"INSERT INTO {schema}.{table_name} ({columns}) "
+        f"SELECT {columns} FROM pg_temp.{staging_table} ON CONFLICT DO NOTHING"
+    )
+    inserted = cursor.rowcount
+    cursor.execute(f"TRUNCATE pg_temp.{staging_table}")
+
+    return inserted
+
+
+#########################################################
+#                  COPY INTO POSTGRES                   #
+#########################################################
+
+def copy_arrow_table(table: pa.Table, engine, schema: str, table_name: str) -> int:
+    """
+    Bulk-loads an Arrow table into a Postgres table with COPY, in one transaction. The
+    rows go from the Arrow buffers to the CSV stream without a pandas DataFrame.
+
+    Args:
+        table (pa.Table): The rows to load, with the names of the table columns.
+        engine (sqlalchemy.engine.Engine): The database engine (psycopg2 driver).
+        schema (str): The database schema.
+        table_name (str): The table.
+
+    Returns:
+        int: The number of rows loaded.
+    """
+    connection = engine.raw_connection()
+    try:
+        with connection.cursor() as cursor:
+            cursor.copy_expert(copy_statement(schema, table_name, table.column_names), to_copy_csv(table))
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        connection.close()
+
+    return table.num_rows
+
+
+def insert_arrow_table(table: pa.Table, engine, schema: str, table_name: str, replace_day: bool = False) -> int:
+    """
+    Bulk-loads an Arrow table into a Postgres table, skipping the rows whose primary key
+    is already there, in one transaction. The rows are copied into a temporary staging
+    table and inserted with ON CONFLICT DO NOTHING, so loading the same snapshot twice
+    (e.g., a retry) is harmless.
+
+    Args:
+        table (pa.Table): The rows to load, with the names of the table columns.
+        engine (sqlalchemy.engine.Engine): The database engine (psycopg2 driver).
+        schema (str): The database schema.
+        table_name (str): The table.
+        replace_day (bool): Whether the rows replace the earlier snapshots of their day,
+            in the same transaction (see delete_replaced_snapshots).
+
+    Returns:
+        int: The number of rows inserted.
+    """
+    connection = engine.raw_connection()
+    try:
+        with connection.cursor() as cursor:
+            staging_table = create_staging_table(cursor, schema, table_name)
+            inserted = insert_staged_rows(cursor, table, schema, table_name, staging_table, replace_day)
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        connection.close()
+
+    return inserted
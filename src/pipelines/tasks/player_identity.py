@@ -0,0 +1,281 @@
+#########################################################
+#                IMPORT LIBRARIES                       #
+#########################################################
+
+import hashlib
+import json
+import re
+import unicodedata
+import numpy as np
+import pandas as pd
+import awswrangler as wr
+from typing import List, Tuple
+from tasks.html_tables import SLUG_COLUMN
+
+
+#########################################################
+#                 GLOBAL VARIABLES                      #
+#########################################################
+
+PLAYER_INDEX_PATH = "s3://nba-mvp-pipeline/data/reference/players/player_index.parquet"
+
+# Different spellings of the same player, keyed by normalized name
+KNOWN_ALIASES = {
+    "nene hilario": "nene",
+    "metta world peace": "ron artest",
+    "metta sandiford-artest": "ron artest",
+    "mo williams": "maurice williams",
+    "lou williams": "louis williams",
+    "ish smith": "ishmael smith",
+}
+
+# Characters removed from names before comparing them. Generational suffixes are kept
+# (Gary Payton and Gary Payton II are different players), only their spelling is
+# normalized ("Jr." -> "jr", "III" -> "iii")
+PUNCTUATION = re.compile(r"[*.,'’`]")
+WHITESPACE = re.compile(r"\s+")
+
+
+#########################################################
+#                 NAME NORMALIZATION                    #
+#########################################################
+
+def normalize_player_name(name: str) -> str:
+    """
+    Normalizes a player name into the key used by the player index.
+
+    Accents are folded ("Nikola Jokić" -> "nikola jokic"), case and punctuation are dropped
+    ("Jr." -> "jr") and known aliases are resolved to a single spelling.
+
+    Args:
+        name (str): The player name as published by basketball-reference.com.
+
+    Returns:
+        str: The normalized player key.
+    """
+    # Fold accents: decompose characters and drop the combining marks
+    folded = unicodedata.normalize("NFKD", str(name))
+    folded = "".join(char for char in folded if not unicodedata.combining(char))
+
+    key = WHITESPACE.sub(" ", PUNCTUATION.sub("", folded.lower())).strip()
+
+    return KNOWN_ALIASES.get(key, key)
+
+
+def normalize_player_names(names: pd.Series) -> pd.Series:
+    """
+    Normalizes a Series of player names. Each distinct name is normalized only once.
+
+    Args:
+        names (pd.Series): The player names.
+
+    Returns:
+        pd.Series: The normalized player keys, aligned with `names`.
+    """
+    codes, uniques = pd.factorize(names)
+    keys = np.array([normalize_player_name(name) for name in uniques], dtype=object)
+
+    return pd.Series(keys[codes], index=names.index, name="player_key")
+
+
+def identity_rules_hash() -> str:
+    """
+    Hashes the rules that turn names into player keys: the known aliases and the
+    characters dropped. Changing them can change the ID resolved for any name.
+
+    Returns:
+        str: The SHA-256 hex digest of the rules.
+    """
+    rules = {"aliases": KNOWN_ALIASES, "punctuation": PUNCTUATION.pattern, "whitespace": WHITESPACE.pattern}
+    return hashlib.sha256(json.dumps(rules, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+#########################################################
+#                   PLAYER INDEX                        #
+#########################################################
+
+def empty_player_index() -> pd.DataFrame:
+    """
+    Creates an empty player index.
+
+    Returns:
+        pd.DataFrame: The index, with 'player_id', 'player_slug' and 'player_key' columns.
+    """
+    return pd.DataFrame({
+        "player_id": pd.Series(dtype="int32"),
+        SLUG_COLUMN: pd.Series(dtype="string"),
+        "player_key": pd.Series(dtype="string"),
+    })
+
+
+def read_player_index(path: str = PLAYER_INDEX_PATH) -> pd.DataFrame:
+    """
+    Reads the persisted player index. Indexes written before the player slugs were
+    scraped get an empty 'player_slug' column.
+
+    Args:
+        path (str): The S3 path of the player index.
+
+    Returns:
+        pd.DataFrame: The index with 'player_id', 'player_slug' and 'player_key' columns (empty on first run).
+    """
+    if not wr.s3.does_object_exist(path):
+        print(f"No player index found at {path}, starting a new one.")
+        return empty_player_index()
+
+    index = wr.s3.read_parquet(path)
+    if SLUG_COLUMN not in index.columns:
+        index[SLUG_COLUMN] = pd.Series(pd.NA, index=index.index, dtype="string")
+
+    return index[empty_player_index().columns]
+
+
+def player_columns(df: pd.DataFrame, column: str = "Player") -> List[str]:
+    """
+    Columns identifying the players of a DataFrame: the name, and the basketball-reference
+    slug when the data was scraped with it.
+
+    Args:
+        df (pd.DataFrame): The DataFrame with player names.
+        column (str): The column with the player names.
+
+    Returns:
+        List[str]: The columns.
+    """
+    return [column] + ([SLUG_COLUMN] if SLUG_COLUMN in df.columns else [])
+
+
+def update_player_index(index: pd.DataFrame, players: pd.DataFrame, column: str = "Player") -> Tuple[pd.DataFrame, int]:
+    """
+    Adds the players not yet in the index. A player is identified by their
+    basketball-reference slug, so players sharing a name get different IDs. Rows without
+    a slug (data scraped before the slugs were) are identified by their normalized name.
+
+    Existing IDs never change: an entry added from a name without slug takes the slug of
+    the first player with that name seen with one. New players get the next IDs in
+    alphabetical order of their slugs, then of their keys.
+
+    Args:
+        index (pd.DataFrame): The current player index.
+        players (pd.DataFrame): The players to resolve, with the names and, if available, the slugs.
+        column (str): The column with the player names.
+
+    Returns:
+        tuple: The updated index and the number of players added.
+    """
+    index = index.copy()
+
+    slugs = players[SLUG_COLUMN] if SLUG_COLUMN in players.columns else pd.Series(pd.NA, index=players.index, dtype="string")
+    players = pd.DataFrame({
+        SLUG_COLUMN: slugs.astype("string").values,
+        "player_key": normalize_player_names(players[column]).astype("string").values,
+    }).drop_duplicates()
+
+    with_slug = players[players[SLUG_COLUMN].notna()].drop_duplicates(SLUG_COLUMN)
+    new_slugs = with_slug[~with_slug[SLUG_COLUMN].isin(index[SLUG_COLUMN])].sort_values(SLUG_COLUMN)
+
+    # Entries added from names without slug take the slug of their first match
+    unclaimed = index[index[SLUG_COLUMN].isna()].drop_duplicates("player_key")
+    claims = new_slugs.drop_duplicates("player_key").merge(unclaimed[["player_key"]], on="player_key")
+    if not claims.empty:
+        slug_by_key = pd.Series(claims[SLUG_COLUMN].values, index=claims["player_key"].values)
+        is_claimed = index[SLUG_COLUMN].isna() & index["player_key"].isin(slug_by_key.index)
+        index.loc[is_claimed, SLUG_COLUMN] = index.loc[is_claimed, "player_key"].map(slug_by_key).values
+        new_slugs = new_slugs[~new_slugs[SLUG_COLUMN].isin(claims[SLUG_COLUMN])]
+
+    without_slug = players.loc[players[SLUG_COLUMN].isna(), ["player_key"]].drop_duplicates()
+    new_keys = without_slug[~without_slug["player_key"].isin(index["player_key"]) & ~without_slug["player_key"].isin(new_slugs["player_key"])]
+    new_keys = new_keys.sort_values("player_key").assign(**{SLUG_COLUMN: pd.NA})
+
+    new_players = pd.concat([new_slugs, new_keys[[SLUG_COLUMN, "player_key"]]], ignore_index=True)
+
+    if new_players.empty:
+        return index, len(claims)
+
+    next_id = int(index["player_id"].max()) + 1 if not index.empty else 1
+    new_players.insert(0, "player_id", np.arange(next_id, next_id + len(new_players), dtype="int32"))
+
+    index = pd.concat([index, new_players.astype(index.dtypes.to_dict())], ignore_index=True)
+
+    return index, len(new_players) + len(claims)
+
+
+def write_player_index(index: pd.DataFrame, path: str = PLAYER_INDEX_PATH) -> None:
+    """
+    Persists the player index to S3.
+
+    Args:
+        index (pd.DataFrame): The player index.
+        path (str): The S3 path of the player index.
+
+    Returns:
+        None
+    """
+    wr.s3.to_parquet(df=index, path=path)
+    print(f"Player index with {len(index)} players saved to {path}.")
+
+
+def lookup_player_ids(df: pd.DataFrame, index: pd.DataFrame, column: str = "Player") -> pd.Series:
+    """
+    Looks the players up in the player index: by slug, or by normalized name for the rows
+    without slug.
+
+    Args:
+        df (pd.DataFrame): The DataFrame with player names.
+        index (pd.DataFrame): The player index.
+        column (str): The column with the player names.
+
+    Returns:
+        pd.Series: The 'player_id' of each row, null for players missing from the index and
+            for names without slug shared by several players.
+    """
+    keys = normalize_player_names(df[column])
+    player_ids = pd.Series(np.nan, index=df.index, name="player_id")
+
+    has_slug = df[SLUG_COLUMN].notna() if SLUG_COLUMN in df.columns else pd.Series(False, index=df.index)
+    if has_slug.any():
+        ids_by_slug = index.dropna(subset=[SLUG_COLUMN]).set_index(SLUG_COLUMN)["player_id"]
+        player_ids[has_slug] = df.loc[has_slug, SLUG_COLUMN].map(ids_by_slug)
+
+    # Names shared by players with different IDs cannot be resolved without the slug
+    ids_per_key = index.groupby("player_key")["player_id"].nunique()
+    ids_by_key = index.drop_duplicates("player_key").set_index("player_key")["player_id"]
+    ids_by_key = ids_by_key[ids_per_key.reindex(ids_by_key.index).eq(1)]
+    player_ids[~has_slug] = keys[~has_slug].map(ids_by_key)
+
+    return player_ids.astype("Int32")
+
+
+def assign_player_ids(df: pd.DataFrame, index: pd.DataFrame, column: str = "Player") -> pd.DataFrame:
+    """
+    Adds a 'player_id' column resolved from the player slugs, or from the normalized names
+    for the rows without slug (see lookup_player_ids).
+
+    Args:
+        df (pd.DataFrame): The DataFrame with player names.
+        index (pd.DataFrame): The player index, which must contain every player in `df`.
+        column (str): The column with the player names.
+
+    Returns:
+        pd.DataFrame: A copy of the DataFrame with the added 'player_id' column.
+
+    Raises:
+        ValueError: If players are missing from the index, or a name without slug matches several players.
+    """
+    df = df.copy()
+    player_ids = lookup_player_ids(df, index, column)
+
+    ids_per_key = index.groupby("player_key")["player_id"].nunique()
+    has_slug = df[SLUG_COLUMN].notna() if SLUG_COLUMN in df.columns else pd.Series(False, index=df.index)
+    ambiguous = ~has_slug & normalize_player_names(df[column]).isin(ids_per_key.index[ids_per_key > 1])
+    if ambiguous.any():
+        names = df.loc[ambiguous, column].unique()
+        raise ValueError(f"Player names shared by several players, rescrape them with their slugs: {list(names)}")
+
+    if player_ids.isna().any():
+        missing = df.loc[player_ids.isna(), column].unique()
+        raise ValueError(f"Players missing from the player index: {list(missing)}")
+
+    df["player_id"] = player_ids.astype("int32")
+
+    return df
@@ -0,0 +1,212 @@
+#########################################################
+#                IMPORT LIBRARIES                       #
+#########################################################
+
+import cProfile
+import io
+import json
+import os
+import pstats
+import shutil
+import signal
+import subprocess
+import sys
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+
+
+#########################################################
+#                 GLOBAL VARIABLES                      #
+#########################################################
+
+# Environment switches (the `--profile` CLI flag is equivalent to NBA_PROFILE=cprofile)
+PROFILE_ENV     = "NBA_PROFILE"      # "cprofile" / "1" or "py-spy"
+PROFILE_DIR_ENV = "NBA_PROFILE_DIR"  # Where profiles are written
+PROFILE_TOP_ENV = "NBA_PROFILE_TOP"  # Number of hotspots to log
+
+DEFAULT_PROFILE_DIR = "profiles"
+DEFAULT_TOP_N       = 25
+
+
+#########################################################
+#                 HELPER FUNCTIONS                      #
+#########################################################
+
+def get_profile_mode(argv=None):
+    """
+    Resolves the profiling mode from the command line or the environment.
+
+    Args:
+        argv (List[str], optional): Command line arguments (defaults to sys.argv).
+
+    Returns:
+        str: "cprofile", "py-spy" or None when profiling is disabled.
+    """
+    argv = sys.argv if argv is None else argv
+
+    if "--profile" in argv:
+        return "cprofile"
+
+    mode = os.environ.get(PROFILE_ENV, "").strip().lower()
+
+    if mode in ("", "0", "false", "off"):
+        return None
+    if mode in ("py-spy", "pyspy"):
+        return "py-spy"
+    return "cprofile"
+
+
+def summarize_profile(stats_path, top_n=DEFAULT_TOP_N):
+    """
+    Builds a top-N hotspot summary from a pstats file, sorted by cumulative and own time.
+
+    Args:
+        stats_path (str): Path to the pstats file.
+        top_n (int): Number of functions to include in each ranking.
+
+    Returns:
+        str: The formatted summary.
+    """
+    buffer = io.StringIO()
+    stats = pstats.Stats(stats_path, stream=buffer).strip_dirs()
+
+    buffer.write(f"Top {top_n} functions by cumulative time:\n")
+    stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(top_n)
+
+    buffer.write(f"Top {top_n} functions by own time:\n")
+    stats.sort_stats(pstats.SortKey.TIME).print_stats(top_n)
+
+    return buffer.getvalue()
+
+
+def summarize_speedscope(speedscope_path, top_n=DEFAULT_TOP_N):
+    """
+    Builds a top-N hotspot summary from a py-spy speedscope file, sorted by the share of
+    samples each function is on the stack (cumulative) and on top of it (own).
+
+    Args:
+        speedscope_path (str): Path to the speedscope file.
+        top_n (int): Number of functions to include in each ranking.
+
+    Returns:
+        str: The formatted summary.
+    """
+    with open(speedscope_path) as file:
+        speedscope = json.load(file)
+
+    frames = [
+        f"{frame['name']} ({os.path.basename(frame.get('file') or '?')}:{frame.get('line', '?')})"
+        for frame in speedscope["shared"]["frames"]
+    ]
+
+    cumulative, own = Counter(), Counter()
+    total = 0
+
+    # One profile per thread, each sample a stack of frame indexes from the root to the leaf
+    for profile in speedscope["profiles"]:
+        for stack, weight in zip(profile["samples"], profile["weights"]):
+            total += weight
+            for index in set(stack):
+                cumulative[frames[index]] += weight
+            if stack:
+                own[frames[stack[-1]]] += weight
+
+    buffer = io.StringIO()
+
+    for title, counts in (("cumulative", cumulative), ("own", own)):
+        buffer.write(f"Top {top_n} functions by {title} samples ({total} samples):\n")
+        for frame, weight in counts.most_common(top_n):
+            buffer.write(f"{weight / max(total, 1):8.1%}  {frame}\n")
+
+    return buffer.getvalue()
+
+
+@contextmanager
+def _cprofile(output_base, top_n):
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+
+        stats_path = f"{output_base}.pstats"
+        profiler.dump_stats(stats_path)
+
+        print(f"Profile written to {stats_path}")
+        print(summarize_profile(stats_path, top_n))
+
+
+@contextmanager
+def _pyspy(output_base, top_n):
+    pyspy = shutil.which("py-spy")
+
+    # Fall back to the deterministic profiler when py-spy is not available
+    if pyspy is None:
+        print("py-spy not found on PATH, falling back to cProfile.")
+        with _cprofile(output_base, top_n):
+            yield
+        return
+
+    speedscope_path = f"{output_base}.speedscope.json"
+
+    # Attach the sampling profiler to the current process
+    sampler = subprocess.Popen(
+        [pyspy, "record", "--pid", str(os.getpid()), "--format", "speedscope",
+         "--output", speedscope_path, "--nonblocking"],
+    )
+    time.sleep(0.5)  # Give py-spy time to attach before the run starts
+    try:
+        yield
+    finally:
+        # SIGINT makes py-spy stop sampling and flush its output
+        sampler.send_signal(signal.SIGINT)
+        sampler.wait()
+        print(f"Speedscope profile written to {speedscope_path}")
+
+        if os.path.exists(speedscope_path):
+            print(summarize_speedscope(speedscope_path, top_n))
+
+
+#########################################################
+#                  PROFILING CONTEXT                    #
+#########################################################
+
+@contextmanager
+def profile_run(name, output_dir=None, mode=None, top_n=None):
+    """
+    Wraps a flow run in a profiler when profiling is enabled.
+
+    With `--profile` or NBA_PROFILE=cprofile the run is profiled deterministically and a
+    `.pstats` file is written together with a top-N hotspot summary in the logs.
+    With NBA_PROFILE=py-spy the run is sampled by py-spy and a speedscope file is written,
+    together with a top-N summary of the sampled hotspots.
+    Without either switch this is a no-op.
+
+    Args:
+        name (str): Name of the run, used as the profile file prefix.
+        output_dir (str, optional): Directory for profile files (defaults to NBA_PROFILE_DIR or `profiles/`).
+        mode (str, optional): Overrides the mode resolved by `get_profile_mode`.
+        top_n (int, optional): Number of hotspots to log (defaults to NBA_PROFILE_TOP or 25).
+
+    Yields:
+        None
+    """
+    mode = mode or get_profile_mode()
+
+    if mode is None:
+        yield
+        return
+
+    output_dir = output_dir or os.environ.get(PROFILE_DIR_ENV, DEFAULT_PROFILE_DIR)
+    top_n = top_n or int(os.environ.get(PROFILE_TOP_ENV, DEFAULT_TOP_N))
+    os.makedirs(output_dir, exist_ok=True)
+
+    output_base = os.path.join(output_dir, f"{name}_{datetime.now().strftime('%Y_%m_%d_%Hh%Mm%Ss')}")
+    print(f"Profiling {name} with {mode}...")
+
+    profiler = _pyspy if mode == "py-spy" else _cprofile
+    with profiler(output_base, top_n):
+        yield
@@ -0,0 +1,105 @@
+#########################################################
+#                IMPORT LIBRARIES                       #
+#########################################################
+
+# Also imported by the models (machine_learning/): this module must only depend on pandas.
+
+import pandas as pd
+from typing import List
+
+
+#########################################################
+#                 GLOBAL VARIABLES                      #
+#########################################################
+
+# Columns of the pipeline data (processed seasons and daily snapshots) named differently
+# in the scoring schema of the models (e.g., PTS_PERGAME, see machine_learning/get_scores.py)
+SCORING_NAMES = {
+    "Player": "PLAYER",
+    "Tm": "TEAM",
+    "Pos": "POS",
+    "Age": "AGE",
+    "G_advanced": "G",
+    "GS_totals": "GS",
+    "MP": "MP_TOTAL",
+    "FG%_totals": "FG%",
+    "3P%_totals": "3P%",
+    "2P%_totals": "2P%",
+    "eFG%_totals": "eFG%",
+    "FT%_totals": "FT%",
+    "W/L%_team": "PCT",
+    "Seed_team": "SEED",
+}
+
+# Suffix of the pipeline columns -> suffix of the scoring schema, for the other stats
+SCORING_SUFFIXES = {
+    "_per_game": "_PERGAME",
+    "_totals": "_TOTAL",
+    "_advanced": "_ADVANCED",
+    "_team": "_TEAM",
+}
+
+# Identifiers kept as they are (e.g., the season and player_id the processed seasons join on)
+KEPT_COLUMNS = ["season", "snapshot_date", "player_id", "player_slug", "Share"]
+
+
+#########################################################
+#                 HELPER FUNCTIONS                      #
+#########################################################
+
+def scoring_name(column: str) -> str:
+    """
+    Name of a pipeline column in the scoring schema (e.g., PTS_per_game -> PTS_PERGAME).
+
+    Args:
+        column (str): The column of the pipeline data.
+
+    Returns:
+        str: The column of the scoring schema. Columns without a mapping keep their name.
+    """
+    if column in KEPT_COLUMNS:
+        return column
+    if column in SCORING_NAMES:
+        return SCORING_NAMES[column]
+
+    for suffix, scoring_suffix in SCORING_SUFFIXES.items():
+        if column.endswith(suffix):
+            return column[: -len(suffix)] + scoring_suffix
+
+    return column
+
+
+def scoring_names(columns) -> List[str]:
+    """
+    Names of pipeline columns in the scoring schema (see scoring_name).
+
+    Args:
+        columns (List[str]): The columns of the pipeline data.
+
+    Returns:
+        List[str]: The columns of the scoring schema, in the same order.
+    """
+    return [scoring_name(column) for column in columns]
+
+
+def to_scoring_schema(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Renames the columns of the pipeline data to the scoring schema the models are trained
+    and scored with, and adds the games played by the team ('G_TEAM'), which the season
+    projection of the scoring uses. Frames already in the scoring schema are returned as they are.
+
+    Args:
+        df (pd.DataFrame): Processed seasons or a daily snapshot of the pipeline.
+
+    Returns:
+        pd.DataFrame: A copy of the data in the scoring schema.
+    """
+    if "PLAYER" in df.columns:
+        return df.copy()
+
+    df = df.rename(columns=scoring_name)
+
+    if "G_TEAM" not in df.columns and {"W_TEAM", "L_TEAM"} <= set(df.columns):
+        df["G_TEAM"] = df["W_TEAM"] + df["L_TEAM"]
+
+    return df
@@ -0,0 +1,133 @@
+#########################################################
+#                IMPORT LIBRARIES                       #
+#########################################################
+
+import numpy as np
+import pandas as pd
+from typing import Iterable, List
+
+
+#########################################################
+#                 GLOBAL VARIABLES                      #
+#########################################################
+
+# Team of the season totals of a player who played for more than one team
+TOTAL_TEAM = "TOT"
+
+# Minutes played in the season (advanced table), the weight of each stint
+MINUTES_COLUMN = "MP_advanced"
+
+# Keys of a player-season
+STINT_KEYS = ["season", "Player"]
+
+
+#########################################################
+#                 HELPER FUNCTIONS                      #
+#########################################################
+
+def is_total_mask(df: pd.DataFrame) -> np.ndarray:
+    """
+    Flags the TOT rows.
+
+    Args:
+        df (pd.DataFrame): The stats, with a 'Tm' column.
+
+    Returns:
+        np.ndarray: True for the season totals of the players who played for more than one team.
+    """
+    return (df["Tm"] == TOTAL_TEAM).fillna(False).to_numpy(dtype=bool)
+
+
+def team_columns(columns: Iterable[str]) -> List[str]:
+    """
+    Finds the team-context columns merged from the standings (e.g., W/L%_team, SRS_team).
+
+    Args:
+        columns (Iterable[str]): The column names.
+
+    Returns:
+        List[str]: The team-context columns.
+    """
+    return [column for column in columns if column.endswith("_team") or column == "Seed"]
+
+
+def weighted_team_context(stints: pd.DataFrame, keys: List[str], columns: List[str], weight: str = MINUTES_COLUMN) -> pd.DataFrame:
+    """
+    Averages the team-context columns of the stints of each player-season, weighted by
+    the minutes played in each stint. Players without minutes get the plain average.
+
+    Args:
+        stints (pd.DataFrame): One row per player, season and team (no TOT rows).
+        keys (List[str]): The keys of a player-season.
+        columns (List[str]): The team-context columns.
+        weight (str): The column of the minutes played.
+
+    Returns:
+        pd.DataFrame: The averages, indexed by the keys.
+    """
+    if weight in stints.columns:
+        weights = stints[weight].fillna(0).astype("float64")
+    else:
+        weights = pd.Series(0.0, index=stints.index)
+    values = stints[columns].astype("float64")
+
+    groups = [stints[key] for key in keys]
+    total_weights = weights.groupby(groups).sum()
+
+    weighted = values.mul(weights, axis=0).groupby(groups).sum(min_count=1).div(total_weights.where(total_weights > 0), axis=0)
+
+    return weighted.fillna(values.groupby(groups).mean())
+
+
+#########################################################
+#                STINT CONSOLIDATION                    #
+#########################################################
+
+def consolidate_player_stints(df: pd.DataFrame, keys: List[str] = STINT_KEYS, weight: str = MINUTES_COLUMN) -> pd.DataFrame:
+    """
+    Consolidates the stints of the players who played for more than one team into one
+    row per player-season: the TOT row (the season totals), with the team-context
+    columns averaged over the stints, weighted by minutes played. Rounded for integer
+    columns (e.g., Seed). Players with a single team are kept as they are.
+
+    Args:
+        df (pd.DataFrame): One row per player, season and team, and a TOT row per traded player.
+        keys (List[str]): The keys of a player-season.
+        weight (str): The column of the minutes played.
+
+    Returns:
+        pd.DataFrame: One row per player-season, in the order of `df`.
+    """
+    is_total = is_total_mask(df)
+
+    # Drop the stints of the players with a TOT row
+    total_keys = pd.MultiIndex.from_frame(df.loc[is_total, keys])
+    keep = is_total | ~pd.MultiIndex.from_frame(df[keys]).isin(total_keys)
+
+    consolidated = df[keep].copy()
+
+    columns = team_columns(df.columns)
+    if not is_total.any() or not columns:
+        return consolidated
+
+    # Team context of the TOT rows from their stints
+    context = weighted_team_context(df[~is_total], keys, columns, weight)
+
+    is_total = is_total[keep]
+    totals = consolidated.loc[is_total]
+    values = (
+        context.reindex(pd.MultiIndex.from_frame(totals[keys]))
+        .set_axis(totals.index)
+        .fillna(totals[columns].astype("float64"))
+    )
+
+    for column in columns:
+        if pd.api.types.is_integer_dtype(consolidated[column].dtype):
+            consolidated.loc[is_total, column] = np.rint(values[column]).astype(consolidated[column].dtype)
+        else:
+            consolidated.loc[is_total, column] = values[column].astype(consolidated[column].dtype)
+
+    print(f"Consolidated the stints of {is_total.sum()} players who played for more than one team.")
+
+    return consolidated
+
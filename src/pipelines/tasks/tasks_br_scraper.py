@@ -7,7 +7,12 @@ from prefect import task
 import pandas as pd
 import awswrangler as wr
 from functools import reduce
-from typing import List
+from typing import List, Optional
+from tasks.arrow_backend import arrow_backend_enabled, arrow_dtype, read_parquet, write_parquet
+from tasks.cache import cached
+from tasks.franchises import resolve_team_abbreviations
+from tasks.html_tables import SLUG_COLUMN, read_bref_stats
+from tasks.validation import STATS_RULES, validate, raise_for_report
 
 
 #########################################################
@@ -19,6 +24,7 @@ from typing import List
     description="Get stats from basketball-reference.com",
     tags=["NBA", "Basketball-Reference", "Stats", "Extraction"],
 )
+@cached()
 def get_stats(season: str = "2023", info: str = "totals") -> pd.DataFrame:
     """
     Get player statistics from basketball-reference.com.
@@ -31,8 +37,8 @@ def get_stats(season: str = "2023", info: str = "totals") -> pd.DataFrame:
         pd.DataFrame: A DataFrame containing player statistics.
     """
 
-    # Get player statistics
-    df = nba.get_stats(season=season, info=info)
+    # Get player statistics (only the stats table is parsed)
+    df = read_bref_stats(season=season, info=info)
 
     # Define a dictionary to map "info" to columns to drop
     columns_to_drop_mapping = {
@@ -41,7 +47,7 @@ def get_stats(season: str = "2023", info: str = "totals") -> pd.DataFrame:
     }
 
     # Drop unnecessary columns based on selected info
-    columns_to_drop = columns_to_drop_mapping.get(info, []) + ['Season']
+    columns_to_drop = columns_to_drop_mapping.get(info, []) + ['Rk']
     df = df.drop(columns=columns_to_drop)
 
     # Rename columns based on selected info
@@ -55,8 +61,8 @@ def get_stats(season: str = "2023", info: str = "totals") -> pd.DataFrame:
         columns_to_exclude = ["Player", "Tm", "Pos", "Age", "Season"]
         new_column_suffix = "_advanced"
 
-    # Rename columns
-    df = df.rename(columns={i: f"{i}{new_column_suffix}" for i in df.columns if i not in columns_to_exclude})
+    # Rename columns (the player slug identifies the player in every table)
+    df = df.rename(columns={i: f"{i}{new_column_suffix}" for i in df.columns if i not in columns_to_exclude + [SLUG_COLUMN]})
 
     # Remove * from Player column
     df['Player'] = df['Player'].str.replace("*", "")
@@ -77,40 +83,23 @@ def get_stats(season: str = "2023", info: str = "totals") -> pd.DataFrame:
     description="Get team standings from basketball-reference.com",
     tags=["NBA", "Basketball-Reference", "Stats", "Extraction"],
 )
+@cached()
 def get_standings(season: str = "2023", info: str = "total") -> pd.DataFrame:
     df = nba.get_standings(season=season, info=info)
 
     # Remove * from Team column
-    df['Tm'] = df['Tm'].str.replace("*", "")
-
-    dict_teams = {'Utah Jazz':'UTA','Phoenix Suns':'PHO',
-                'Philadelphia 76ers':'PHI','Brooklyn Nets':'BRK',
-                'Denver Nuggets':'DEN','Los Angeles Clippers':'LAC',
-                'Milwaukee Bucks':'MIL','Dallas Mavericks':'DAL',
-                'Los Angeles Lakers':'LAL','Portland Trail Blazers':'POR',
-                'Atlanta Hawks':'ATL','New York Knicks':'NYK',
-                'Miami Heat':'MIA','Golden State Warriors':'GSW',
-                'Memphis Grizzlies':'MEM','Boston Celtics':'BOS',
-                'Washington Wizards':'WAS','Indiana Pacers':'IND',
-                'Charlotte Hornets':'CHO','Charlotte Bobcats':'CHA',
-                'San Antonio Spurs':'SAS','Chicago Bulls':'CHI',
-                'New Orleans Pelicans':'NOP','Sacramento Kings':'SAC',
-                'Toronto Raptors':'TOR','Minnesota Timberwolves':'MIN',
-                'Cleveland Cavaliers':'CLE','Oklahoma City Thunder':'OKC',
-                'Orlando Magic':'ORL','Detroit Pistons':'DET',
-                'Houston Rockets':'HOU','New Jersey Nets':'NJN',
-                'New Orleans Hornets':'NOH','Seattle SuperSonics':'SEA'}
-
-    # Replace team names with abbreviations
-    df['Tm'] = df['Tm'].replace(dict_teams)
+    df['Tm'] = df['Tm'].str.replace("*", "").str.strip()
+
+    # Remove division and conference header rows, they are the only rows without a record
+    df = df[pd.to_numeric(df['W'], errors='coerce').notna()].copy()
+
+    # Replace team names with the abbreviations used in that season
+    df['Tm'] = resolve_team_abbreviations(df['Tm'], season)
 
     # Add sufix _team to columns except for Tm and Seed
     columns_to_exclude = ["Tm", "Seed"]
     df = df.rename(columns={i: f"{i}_team" for i in df.columns if i not in columns_to_exclude})
 
-    # Remove rows with Tm in ['Southwest Division', 'Atlantic Division', 'Central Division', 'Southeast Division', 'Northwest Division', 'Pacific Division']
-    df = df[~df['Tm'].isin(['Southwest Division', 'Atlantic Division', 'Central Division', 'Southeast Division', 'Northwest Division', 'Pacific Division'])]
-
     # Reset index
     df = df.reset_index(drop=True)
 
@@ -130,27 +119,32 @@ def get_standings(season: str = "2023", info: str = "total") -> pd.DataFrame:
     description="Check player uniqueness and duplicates.",
     tags=["NBA", "Basketball-Reference", "Stats", "Test", "Data Quality"],
 )
-def check_players_and_duplicates(dataframes:List[pd.DataFrame]) -> None:
-    
-    # Check player uniqueness and DataFrame shapes
-    players_sets = [set(df['Player']) for df in dataframes]
+def check_players_and_duplicates(dataframes: List[pd.DataFrame], previous_row_count: Optional[int] = None) -> List[pd.DataFrame]:
+    """
+    Validate the player statistics DataFrames against the data quality rules (see
+    `tasks.validation.STATS_RULES`): unique (Player, Tm) keys, the same players in every
+    DataFrame, value ranges, null rates and drops of the number of players.
+
+    Args:
+        dataframes (List[pd.DataFrame]): The DataFrames to check, any number of them.
+        previous_row_count (int, optional): Number of players in the previous snapshot.
+
+    Returns:
+        List[pd.DataFrame]: The same DataFrames.
+
+    Raises:
+        ValueError: Listing every failed check.
+    """
+    frames = {f"df{i}": df for i, df in enumerate(dataframes, start=1)}
+
+    report = validate(frames, STATS_RULES, previous_row_count=previous_row_count)
+
+    # Logging information
+    print(f"\nDataFrame shapes: {[df.shape for df in dataframes]}")
+    print(f"Data quality report:\n{report.to_string(index=False)}\n")
+
+    raise_for_report(report)
 
-    if players_sets[0] == players_sets[1] == players_sets[2]:
-        print("All players are the same in each DataFrame.")
-    else:
-        raise ValueError("Players are not the same in each DataFrame.")
-    
-    # Logging information    
-    print(f"\nDataFrame shape:\ndf1: {dataframes[0].shape}\ndf2: {dataframes[1].shape}\ndf3: {dataframes[2].shape}\n")
-    print(f"DataFrame Unique Players:\ndf1: {len(players_sets[0])}\ndf2: {len(players_sets[1])}\ndf3: {len(players_sets[2])}\n")
-
-    # Check for duplicates
-    for i, df in enumerate(dataframes, start=1):
-        if df.duplicated(subset=["Player", "Tm"]).any():
-            raise ValueError(f"df{i} has duplicates.")
-        else:
-            print(f"df{i} has no duplicates.")
-    
     return dataframes
 
 #########################################################
@@ -162,6 +156,7 @@ def check_players_and_duplicates(dataframes:List[pd.DataFrame]) -> None:
     description="Merge totals, per_game, and advanced DataFrames into one.",
     tags=["NBA", "Basketball-Reference", "Stats", "Transformation"],
 )
+@cached()
 def merge_dfs(dataframes: List[pd.DataFrame]) -> pd.DataFrame:
     """
     Merge player statistics DataFrames into one.
@@ -172,8 +167,9 @@ def merge_dfs(dataframes: List[pd.DataFrame]) -> pd.DataFrame:
     Returns:
         pd.DataFrame: A merged DataFrame.
     """
-    # Merge DataFrames on Player and Tm
-    df = reduce(lambda left, right: pd.merge(left, right, on=["Player", "Tm"]), dataframes)
+    # Merge DataFrames on Player and Tm, and on the player slug when the tables have it
+    keys = ["Player", "Tm"] + ([SLUG_COLUMN] if all(SLUG_COLUMN in df.columns for df in dataframes) else [])
+    df = reduce(lambda left, right: pd.merge(left, right, on=keys), dataframes)
 
     # Logging information
     print(f"Shape: {df.shape}\nColumns: {list(df.columns)}\nHead:\n{df.head()}")
@@ -190,6 +186,7 @@ def merge_dfs(dataframes: List[pd.DataFrame]) -> pd.DataFrame:
     description="Merge standings and stats DataFrames into one.",
     tags=["NBA", "Basketball-Reference", "Stats", "Transformation"],
 )
+@cached()
 def merge_standings_and_stats(standings_df: pd.DataFrame, stats_df: pd.DataFrame) -> pd.DataFrame:
     """
     Merge standings and stats DataFrames into one.
@@ -279,6 +276,8 @@ def add_season_column(df: pd.DataFrame, season: str) -> pd.DataFrame:
 def define_column_data_types(dataframe, column_data_types):
     """
     Defines the data type of each specified column in a DataFrame.
+    With the Arrow backend (NBA_ARROW_BACKEND=1) columns are cast to the Arrow-backed
+    equivalent of their data type (e.g., "string" -> "string[pyarrow]").
     
     Args:
         dataframe (pd.DataFrame): The DataFrame to be modified.
@@ -287,8 +286,10 @@ def define_column_data_types(dataframe, column_data_types):
     Returns:
         pd.DataFrame: The modified DataFrame with the defined column data types.
     """
+    arrow = arrow_backend_enabled()
     for column, data_type in column_data_types.items():
         if column in dataframe.columns:
+            data_type = arrow_dtype(data_type) if arrow else data_type
             dataframe[column].fillna(0, inplace=True)                 # This is temporary until I figure out how to deal with NaNs
             dataframe[column] = dataframe[column].astype(data_type)
             print(f"Column '{column}' data type changed to '{data_type}'.")
@@ -322,11 +323,51 @@ def load_data(df: pd.DataFrame, bucket_name: str, current_day: str) -> None:
     # Construct the S3 path for saving parquet file
     s3_path = f"s3://{bucket_name}/data/raw/players/{current_day}.parquet"
 
-    wr.s3.to_parquet(df=df, path=s3_path)
+    write_parquet(df, s3_path)
 
     # Logging information
     print("Data saved to S3 bucket.")
 
+#########################################################
+#            Size of the Previous Snapshot              #
+#########################################################
+
+@task(
+    name="Get Previous Snapshot Size",
+    description="Count the players of the previous daily snapshot in S3.",
+    tags=["NBA", "Basketball-Reference", "Stats", "Data Quality"],
+)
+def get_previous_snapshot_size(bucket_name: str, season: str, current_day: str) -> Optional[int]:
+    """
+    Count the players of the last daily snapshot saved before the current day, to check
+    the drift of the new one.
+
+    Args:
+        bucket_name (str): The S3 bucket name.
+        season (str): The NBA season ("2023").
+        current_day (str): The current day, as in the parquet file name.
+
+    Returns:
+        Optional[int]: The number of players, or None if there is no earlier snapshot of the season.
+    """
+    paths = wr.s3.list_objects(f"s3://{bucket_name}/data/raw/players/", suffix=".parquet")
+    previous = sorted(path for path in paths if path.rsplit("/", 1)[-1] < f"{current_day}.parquet")
+
+    if not previous:
+        print("No previous snapshot.")
+        return None
+
+    df = read_parquet(previous[-1], columns=["Player", "season"])
+
+    # A snapshot of the previous season is not comparable
+    if not (df["season"] == f"{str(int(season)-1)}-{season[2:]}").all():
+        print(f"Previous snapshot {previous[-1]} is from another season.")
+        return None
+
+    print(f"Previous snapshot {previous[-1]} has {df['Player'].nunique()} players.")
+    return df["Player"].nunique()
+
+
 #########################################################
 #          Ingest Historical Data into S3 Bucket        #
 #########################################################
@@ -341,7 +382,7 @@ def load_historical_data(df: pd.DataFrame, bucket_name: str, season: str) -> Non
     # Construct the S3 path for saving parquet file
     s3_path = f"s3://{bucket_name}/data/raw/historical/{season}.parquet"
 
-    wr.s3.to_parquet(df=df, path=s3_path)
+    write_parquet(df, s3_path)
 
     # Logging information
     print("Historical data saved to S3 bucket.")
@@ -0,0 +1,175 @@
+#########################################################
+#                IMPORT LIBRARIES                       #
+#########################################################
+
+import pandas as pd
+from typing import Dict, List, Optional
+
+
+#########################################################
+#                 GLOBAL VARIABLES                      #
+#########################################################
+
+# Rules of the player stats tables (totals, advanced, per game) of basketball-reference.com.
+# Rules on a column only apply to the frames that have it.
+STATS_RULES = [
+    {"rule": "unique", "columns": ["Player", "Tm"]},
+    {"rule": "same_keys", "columns": ["Player"]},
+    {"rule": "null_rate", "column": "Player", "max": 0.0},
+    {"rule": "null_rate", "column": "Tm", "max": 0.0},
+    {"rule": "range", "column": "Age", "min": 15, "max": 50},
+    # No upper bound: traded players can play more than 82 games (TOT rows)
+    {"rule": "range", "column": "G_advanced", "min": 0},
+    {"rule": "range", "column": "MP_per_game", "min": 0, "max": 48},
+    {"rule": "range", "column": "PTS_per_game", "min": 0, "max": 60},
+    {"rule": "range", "column": "FG%_totals", "min": 0, "max": 1},
+    {"rule": "range", "column": "FT%_totals", "min": 0, "max": 1},
+    # Only drops are flagged: the number of players grows fast in the first weeks of a season
+    {"rule": "row_count_drift", "columns": ["Player"], "max": 0.2},
+]
+
+# Keys shown in the report for each failed check
+SAMPLE_SIZE = 10
+
+
+#########################################################
+#                 HELPER FUNCTIONS                      #
+#########################################################
+
+def _sample(keys: pd.DataFrame) -> str:
+    rows = keys.head(SAMPLE_SIZE).astype(str).agg(" / ".join, axis=1).tolist()
+    more = f" (+{len(keys) - SAMPLE_SIZE} more)" if len(keys) > SAMPLE_SIZE else ""
+    return ", ".join(rows) + more
+
+
+def _result(rule: dict, frame: str, column: str, passed: bool, detail: str) -> dict:
+    return {"rule": rule["rule"], "frame": frame, "column": column, "passed": passed, "detail": detail}
+
+
+def check_unique(rule: dict, frames: Dict[str, pd.DataFrame], **_) -> List[dict]:
+    columns = rule["columns"]
+    results = []
+    for name, df in frames.items():
+        duplicates = df.loc[df.duplicated(subset=columns, keep=False), columns].drop_duplicates()
+        detail = f"{len(duplicates)} duplicated keys: {_sample(duplicates)}" if len(duplicates) else "no duplicated keys"
+        results.append(_result(rule, name, ", ".join(columns), duplicates.empty, detail))
+    return results
+
+
+def check_same_keys(rule: dict, frames: Dict[str, pd.DataFrame], **_) -> List[dict]:
+    columns = rule["columns"]
+
+    # Distinct keys of every frame, stacked: a key seen fewer times than there are frames is
+    # missing somewhere. Null keys are left to the null_rate rules.
+    keys = pd.concat(
+        [df[columns].dropna().drop_duplicates().assign(_frame=name) for name, df in frames.items()],
+        ignore_index=True,
+    )
+    counts = keys.groupby(columns)["_frame"].transform("size")
+    partial = keys[counts < len(frames)]
+    partial_keys = pd.MultiIndex.from_frame(partial[columns].drop_duplicates())
+
+    results = []
+    for name in frames:
+        present = pd.MultiIndex.from_frame(partial.loc[partial["_frame"] == name, columns])
+        missing = partial_keys[~partial_keys.isin(present)].to_frame(index=False)
+        detail = f"{len(missing)} keys missing: {_sample(missing)}" if len(missing) else f"same keys as {len(frames) - 1} other frames"
+        results.append(_result(rule, name, ", ".join(columns), missing.empty, detail))
+    return results
+
+
+def check_range(rule: dict, frames: Dict[str, pd.DataFrame], **_) -> List[dict]:
+    column = rule["column"]
+    results = []
+    for name, df in frames.items():
+        if column not in df.columns:
+            continue
+        values = pd.to_numeric(df[column], errors="coerce")
+        out_of_range = values.notna() & ~values.between(rule.get("min", float("-inf")), rule.get("max", float("inf")))
+        detail = (
+            f"{out_of_range.sum()} values outside [{rule.get('min')}, {rule.get('max')}]: "
+            f"{_sample(df.loc[out_of_range, [column]])}"
+            if out_of_range.any() else "all values in range"
+        )
+        results.append(_result(rule, name, column, not out_of_range.any(), detail))
+    return results
+
+
+def check_null_rate(rule: dict, frames: Dict[str, pd.DataFrame], **_) -> List[dict]:
+    column = rule["column"]
+    results = []
+    for name, df in frames.items():
+        if column not in df.columns:
+            continue
+        null_rate = float(df[column].isna().mean()) if len(df) else 0.0
+        passed = null_rate <= rule["max"]
+        results.append(_result(rule, name, column, passed, f"null rate {null_rate:.1%} (max {rule['max']:.1%})"))
+    return results
+
+
+def check_row_count_drift(rule: dict, frames: Dict[str, pd.DataFrame], previous_row_count: Optional[int] = None, **_) -> List[dict]:
+    # Distinct keys are compared, so rows added by traded players do not count as drift.
+    # Only drops fail: players are added to the tables as they debut.
+    if not previous_row_count:
+        return []
+
+    columns = rule["columns"]
+    results = []
+    for name, df in frames.items():
+        row_count = len(df[columns].drop_duplicates())
+        drop = (previous_row_count - row_count) / previous_row_count
+        detail = f"{row_count} rows vs {previous_row_count} in the previous snapshot ({-drop:+.1%}, max drop {rule['max']:.1%})"
+        results.append(_result(rule, name, ", ".join(columns), drop <= rule["max"], detail))
+    return results
+
+
+CHECKS = {
+    "unique": check_unique,
+    "same_keys": check_same_keys,
+    "range": check_range,
+    "null_rate": check_null_rate,
+    "row_count_drift": check_row_count_drift,
+}
+
+
+#########################################################
+#                 VALIDATION ENGINE                     #
+#########################################################
+
+def validate(frames: Dict[str, pd.DataFrame], rules: List[dict] = STATS_RULES, previous_row_count: Optional[int] = None) -> pd.DataFrame:
+    """
+    Runs every rule over every frame and reports all the results at once.
+
+    Args:
+        frames (Dict[str, pd.DataFrame]): The frames to validate, by name.
+        rules (List[dict]): The rules (see STATS_RULES). Each has a "rule" in CHECKS and its parameters.
+        previous_row_count (int, optional): Number of keys in the previous snapshot, for drift rules.
+
+    Returns:
+        pd.DataFrame: One row per check, with the 'rule', 'frame', 'column', whether it 'passed' and a 'detail'.
+
+    Raises:
+        ValueError: If a rule is unknown.
+    """
+    results = []
+    for rule in rules:
+        if rule["rule"] not in CHECKS:
+            raise ValueError(f"Unknown rule '{rule['rule']}'. Available rules: {list(CHECKS)}")
+        results.extend(CHECKS[rule["rule"]](rule, frames, previous_row_count=previous_row_count))
+
+    return pd.DataFrame(results, columns=["rule", "frame", "column", "passed", "detail"])
+
+
+def raise_for_report(report: pd.DataFrame) -> None:
+    """
+    Raises if any check of a validation report failed.
+
+    Args:
+        report (pd.DataFrame): The output of validate.
+
+    Raises:
+        ValueError: Listing every failed check.
+    """
+    failed = report[~report["passed"]]
+    if not failed.empty:
+        raise ValueError(f"{len(failed)} data quality checks failed:\n{failed.to_string(index=False)}")